@@ -6,7 +6,6 @@
 # TODO FIXED and RAGDOLL types
 # TODO MOTOR type
 # TODO add in language translation support
-# TODO add in Bake to Keyframes operator ?
 # TODO add in Apply Transformation operator ?
 # TODO Collision support for colliding with soft bodies and clothes ?
 
@@ -37,49 +36,73 @@ if bpy.app.version < (2, 91, 0):
 
 from . import armatures
 from . import events
-from . import panels
 from . import properties
 from . import utils
 
 classes = (
-    properties.Dirty,
     properties.Scene,
     properties.Error,
+    properties.PoolObject,
+    properties.Pool,
     properties.Armature,
+    properties.Action,
     properties.Compound,
     properties.Bone,
 
     armatures.Update,
+    armatures.UpdateDirty,
+    armatures.Bake,
+    armatures.ReduceKeyframes,
+    armatures.CacheSimulation,
+    armatures.CancelUpdate,
+    armatures.ExportProfile,
+    armatures.ClearProfile,
     armatures.CleanupArmatures,
     armatures.CopyFromActive,
     armatures.CalculateMass,
     armatures.NewCompound,
     armatures.RemoveCompound,
     armatures.MoveCompound,
-
-    panels.RigidBodyMenu,
-    panels.ArmaturePanel,
-    panels.ArmatureSettingsPanel,
-    panels.BonePanel,
-    panels.SettingsPanel,
-    panels.CompoundList,
-    panels.HitboxesPanel,
-    panels.HitboxesOffsetPanel,
-    panels.HitboxesAdvancedPanel,
-    panels.LimitsPanel,
-    panels.LimitsRotatePanel,
-    panels.LimitsTranslatePanel,
-    panels.SpringsPanel,
-    panels.SpringsRotatePanel,
-    panels.SpringsTranslatePanel,
-    panels.OffsetPanel,
-    panels.AdvancedPanel,
-    panels.AdvancedPhysicsPanel,
-    panels.CollectionsPanel,
-    panels.DeactivationPanel,
-    panels.OverrideIterationsPanel,
 )
 
+# The panels are only imported when Blender has a UI, because
+# background mode (e.g. render farms) never draws them.
+def ui_classes():
+    from . import panels
+
+    return (
+        panels.RigidBodyMenu,
+        panels.ArmaturePanel,
+        panels.ArmatureCachePanel,
+        panels.ArmatureProfilePanel,
+        panels.ArmatureSettingsPanel,
+        panels.BonePanel,
+        panels.SettingsPanel,
+        panels.CompoundList,
+        panels.HitboxesPanel,
+        panels.HitboxesOffsetPanel,
+        panels.HitboxesAdvancedPanel,
+        panels.LimitsPanel,
+        panels.LimitsRotatePanel,
+        panels.LimitsTranslatePanel,
+        panels.SpringsPanel,
+        panels.SpringsRotatePanel,
+        panels.SpringsTranslatePanel,
+        panels.OffsetPanel,
+        panels.AdvancedPanel,
+        panels.AdvancedPhysicsPanel,
+        panels.CollectionsPanel,
+        panels.DeactivationPanel,
+        panels.OverrideIterationsPanel,
+    )
+
+def all_classes():
+    if bpy.app.background:
+        return classes
+
+    else:
+        return classes + ui_classes()
+
 def register():
     utils.debug("REGISTERING")
 
@@ -88,7 +111,7 @@ def register():
         faulthandler.enable()
 
     from bpy.utils import register_class
-    for cls in classes:
+    for cls in all_classes():
         register_class(cls)
 
     events.register()
@@ -99,5 +122,5 @@ def unregister():
     events.unregister()
 
     from bpy.utils import unregister_class
-    for cls in reversed(classes):
+    for cls in reversed(all_classes()):
         unregister_class(cls)
@@ -1,7 +1,16 @@
 import bpy
+import time
+from bpy_extras.io_utils import ExportHelper
 from . import utils
+from . import profiler
 from . import events
 from . import properties
+from . import topology
+from . import pool
+from . import bake
+from . import keyframes
+from . import cache
+from .transforms import Transforms
 from .bones import (
     active_name, align_constraint, align_hitbox, blank_name, constraint_name,
     delete_parent, get_hitbox, hide_active_bone, is_bone_active, is_bone_enabled,
@@ -9,8 +18,9 @@ from .bones import (
     make_passive_hitbox, remove_active, remove_blank, remove_constraint,
     remove_passive, store_parent, update_constraint, update_hitbox_name,
     update_rigid_body, update_hitbox_shape, passive_name, remove_pose_constraint,
-    update_pose_constraint, copy_properties, make_compound_hitbox, remove_compound,
+    update_pose_constraint, has_pose_constraint, copy_properties, make_compound_hitbox, remove_compound,
     compound_name, make_origin, origin_name, align_origin, remove_origin,
+    armature_name,
 )
 
 
@@ -30,7 +40,7 @@ def root_collection(context):
 def container_collection(context, armature, top):
     collection = top.container
 
-    name = armature.data.name + " [Container]"
+    name = armature_name(armature, "container")
 
     if not collection:
         parent = root_collection(context)
@@ -39,7 +49,7 @@ def container_collection(context, armature, top):
         top.container = collection
 
     else:
-        collection.name = name
+        utils.set_name(collection, name)
 
     return collection
 
@@ -54,14 +64,14 @@ def child_collection(context, armature, top, name):
 def actives_collection(context, armature, top):
     collection = top.actives
 
-    name = armature.data.name + " [Actives]"
+    name = armature_name(armature, "actives")
 
     if not collection:
         collection = child_collection(context, armature, top, name)
         top.actives = collection
 
     else:
-        collection.name = name
+        utils.set_name(collection, name)
 
     return collection
 
@@ -69,14 +79,14 @@ def actives_collection(context, armature, top):
 def passives_collection(context, armature, top):
     collection = top.passives
 
-    name = armature.data.name + " [Passives]"
+    name = armature_name(armature, "passives")
 
     if not collection:
         collection = child_collection(context, armature, top, name)
         top.passives = collection
 
     else:
-        collection.name = name
+        utils.set_name(collection, name)
 
     return collection
 
@@ -84,14 +94,14 @@ def passives_collection(context, armature, top):
 def compounds_collection(context, armature, top):
     collection = top.compounds
 
-    name = armature.data.name + " [Compounds]"
+    name = armature_name(armature, "compounds")
 
     if not collection:
         collection = child_collection(context, armature, top, name)
         top.compounds = collection
 
     else:
-        collection.name = name
+        utils.set_name(collection, name)
 
     return collection
 
@@ -99,14 +109,14 @@ def compounds_collection(context, armature, top):
 def origins_collection(context, armature, top):
     collection = top.origins
 
-    name = armature.data.name + " [Origins]"
+    name = armature_name(armature, "origins")
 
     if not collection:
         collection = child_collection(context, armature, top, name)
         top.origins = collection
 
     else:
-        collection.name = name
+        utils.set_name(collection, name)
 
     return collection
 
@@ -114,14 +124,14 @@ def origins_collection(context, armature, top):
 def blanks_collection(context, armature, top):
     collection = top.blanks
 
-    name = armature.data.name + " [Blanks]"
+    name = armature_name(armature, "blanks")
 
     if not collection:
         collection = child_collection(context, armature, top, name)
         top.blanks = collection
 
     else:
-        collection.name = name
+        utils.set_name(collection, name)
 
     return collection
 
@@ -129,20 +139,21 @@ def blanks_collection(context, armature, top):
 def constraints_collection(context, armature, top):
     collection = top.constraints
 
-    name = armature.data.name + " [Joints]"
+    name = armature_name(armature, "constraints")
 
     if not collection:
         collection = child_collection(context, armature, top, name)
         top.constraints = collection
 
     else:
-        collection.name = name
+        utils.set_name(collection, name)
 
     return collection
 
 
+# The objects are removed while looping, so it must loop over a copy
 def remove_orphans(collection, exists):
-    for object in collection.objects:
+    for object in list(collection.objects):
         if object.name not in exists:
             utils.remove_object(object)
 
@@ -150,19 +161,19 @@ def remove_orphans(collection, exists):
 
 
 def remove_collection_orphans(collection, exists):
-    for sub in collection.children:
+    for sub in list(collection.children):
         if sub.name not in exists:
             utils.remove_collection_recursive(sub)
 
     return utils.safe_remove_collection(collection)
 
 
-def make_root_body(context, armature, top):
-    name = armature.data.name + " [Root]"
+def make_root_body(context, rigid_bodies, armature, top):
+    name = armature_name(armature, "root_body")
 
     if not top.root_body:
         top.root_body = make_empty_rigid_body(
-            context,
+            rigid_bodies,
             name=name,
             collection=blanks_collection(context, armature, top),
             parent=armature,
@@ -170,7 +181,7 @@ def make_root_body(context, armature, top):
         )
 
     else:
-        top.root_body.name = name
+        utils.set_name(top.root_body, name)
 
     return top.root_body
 
@@ -181,13 +192,106 @@ def remove_root_body(top):
         top.property_unset("root_body")
 
 
-# This must be an operator, because it creates/destroys data blocks (e.g. objects).
-# It must run asynchronously, in a separate tick. This is handled by `events.mark_dirty`.
-class Update(bpy.types.Operator):
-    bl_idname = "rigid_body_bones.update"
-    bl_label = "Update Rigid Body Bones"
-    # TODO use UNDO_GROUPED ?
-    bl_options = {'REGISTER', 'UNDO'}
+# Armatures with at least this many bones are updated over multiple ticks
+SLICED_UPDATE_BONES = 1000
+
+# Number of bones which are updated at once when the update is sliced
+SLICE_BONES = 50
+
+# Maximum time (in seconds) which is spent updating per tick
+SLICE_BUDGET = 0.05
+
+
+# This contains the update logic, it is used by the Update operator and SlicedUpdate.
+class Updater:
+    def __init__(self, context, armature, full=False):
+        self.context = context
+        self.armature = armature
+
+        top = armature.data.rigid_body_bones
+
+
+        # Bone hierarchy, which is shared between updates
+        self.topology = None
+
+        # Data for bones which should have their parent restored
+        self.restore_parents = {}
+
+        # Names of bones which should have their parent removed
+        self.remove_parents = set()
+
+        # Whether to destructively delete/store the bone parent data
+        self.delete_parents = False
+        self.store_parents = False
+
+        self.is_edit_mode = (top.mode == 'EDIT')
+
+        # Number of bones which are updated at once, or None to update every bone at once
+        self.slice_size = None
+
+        # Whether the sliced update has been cancelled
+        self.cancelled = False
+
+        # Names of bones which must be updated, or None if every bone must be updated
+        self.dirty = events.take_dirty_bones(armature)
+
+
+        if self.is_edit_mode:
+            assert armature.mode == 'EDIT'
+        else:
+            assert armature.mode != 'EDIT'
+
+
+        if self.is_edit_mode or not top.enabled:
+            if top.parents_stored:
+                top.property_unset("parents_stored")
+                self.delete_parents = True
+
+        else:
+            if not top.parents_stored:
+                top.parents_stored = True
+                self.store_parents = True
+
+
+        # The stored parents must be updated for every bone
+        if full or self.is_edit_mode or not top.enabled or self.store_parents or self.delete_parents:
+            self.dirty = None
+
+
+        if self.is_edit_mode:
+            kind = 'EDIT'
+            count = len(armature.data.bones)
+
+        elif self.dirty is None:
+            kind = 'FULL'
+            count = len(armature.data.bones)
+
+        else:
+            kind = 'DIRTY'
+            count = len(self.dirty)
+
+        # Timings and counters for this update, used by the Profile panel
+        self.profile = profiler.Profile(armature.name, kind, count)
+
+
+        if not self.is_edit_mode:
+            # Fast lookup for stored bone names -> list of active children
+            self.active_children = {}
+
+            # Names of objects which exist
+            self.exists = set()
+
+            # Names of objects for testing for duplicates
+            self.duplicates = set()
+
+            # Cache of whether a bone (by topology index) has an active parent or not
+            self.active_cache = {}
+
+            # Whether the root body should exist or not
+            self.has_root_body = False
+
+            # Creates the rigid bodies / constraints in bulk, without using operators
+            self.rigid_bodies = utils.RigidBodies(context)
 
 
     def fix_duplicates(self, data):
@@ -240,40 +344,50 @@ class Update(bpy.types.Operator):
                     duplicates.add(name)
 
 
-    # TODO non-recursive version ?
-    def is_active_parent(self, bone):
-        if bone is None:
-            return False
+    # This uses a loop instead of recursion, because chains can have thousands of bones
+    def is_active_parent(self, index):
+        topology = self.topology
+        bones = self.armature.data.bones
 
-        else:
-            is_active = self.active_cache.get(bone.name)
+        # Indexes of the bones which were checked, they all have the same result
+        checked = []
 
-            if is_active is not None:
-                return is_active
+        is_active = False
 
-            else:
-                data = bone.rigid_body_bones
+        while index != -1:
+            cached = self.active_cache.get(index)
 
-                # Cannot use is_bone_enabled
-                if data.enabled and is_bone_active(data):
-                    self.active_cache[bone.name] = True
-                    return True
+            if cached is not None:
+                is_active = cached
+                break
 
-                else:
-                    is_active = self.is_active_parent(bone.parent)
-                    self.active_cache[bone.name] = is_active
-                    return is_active
+            data = bones[topology.names[index]].rigid_body_bones
+
+            # Cannot use is_bone_enabled
+            if data.enabled and is_bone_active(data):
+                is_active = True
+                break
+
+            checked.append(index)
+            index = topology.parents[index]
+
+        for index in checked:
+            self.active_cache[index] = is_active
+
+        return is_active
 
 
     def update_error(self, top, bone, data):
+        index = self.topology.indexes[bone.name]
+
         # Cannot use is_bone_enabled
         if data.enabled and is_bone_active(data):
-            self.active_cache[bone.name] = True
+            self.active_cache[index] = True
             data.property_unset("error")
 
         else:
-            is_active = self.is_active_parent(bone.parent)
-            self.active_cache[bone.name] = is_active
+            is_active = self.is_active_parent(self.topology.parents[index])
+            self.active_cache[index] = is_active
 
             if is_active:
                 data.error = 'ACTIVE_PARENT'
@@ -289,13 +403,14 @@ class Update(bpy.types.Operator):
             assert data.is_property_set("name")
             assert data.is_property_set("use_connect")
 
-            self.names[data.name] = bone.name
-
             # Can't use is_bone_enabled because this runs before update_error
             if top.enabled and not self.is_edit_mode and data.enabled and is_bone_active(data):
-                self.remove_parents.add(bone.name)
+                # The parent was already removed by a previous update
+                if bone.parent is not None:
+                    self.remove_parents.add(bone.name)
 
-            elif bone.parent is None:
+            # Root bones don't have a parent to restore
+            elif bone.parent is None and data.parent != "":
                 self.restore_parents[bone.name] = (data.parent, data.use_connect)
 
 
@@ -308,11 +423,11 @@ class Update(bpy.types.Operator):
 
         constraint = data.constraint.rigid_body_constraint
 
-        constraint.object2 = data.active
+        utils.set_property(constraint, "object2", data.active)
 
         if data.parent == "":
-            self.has_root_body = True
-            constraint.object1 = make_root_body(context, armature, top)
+            assert top.root_body is not None
+            utils.set_property(constraint, "object1", top.root_body)
 
         # Will be processed later, by update_joint
         else:
@@ -333,98 +448,109 @@ class Update(bpy.types.Operator):
             if is_compound:
                 if not compound.hitbox:
                     collection = compounds_collection(context, armature, top)
-                    compound.hitbox = make_compound_hitbox(context, collection, bone, compound)
+                    compound.hitbox = make_compound_hitbox(self.rigid_bodies, top, collection, bone, compound)
 
                 else:
                     update_hitbox_name(compound.hitbox, compound_name(bone, compound))
 
-                # TODO only set this if the parent is different ?
                 utils.set_parent(compound.hitbox, parent)
 
                 self.exists.add(compound.hitbox.name)
 
             else:
-                remove_compound(compound)
+                remove_compound(top, compound)
 
 
     def make_origin(self, context, armature, top, parent, bone, data):
         if not data.origin_empty:
             collection = origins_collection(context, armature, top)
-            data.origin_empty = make_origin(collection, bone)
+            data.origin_empty = make_origin(top, collection, bone)
 
         else:
-            data.origin_empty.name = origin_name(bone)
+            utils.set_name(data.origin_empty, origin_name(bone))
 
-        # TODO only set this if the parent is different ?
         utils.set_parent(data.origin_empty, parent)
 
-        align_origin(data.origin_empty, bone, data)
-
         self.exists.add(data.origin_empty.name)
 
 
-    def update_bone(self, context, armature, top, bone, data):
+    # This creates / removes the objects for the bone, the rigid bodies are
+    # created later by self.rigid_bodies.flush()
+    def make_bone(self, context, armature, top, bone, data):
         if top.enabled and is_bone_enabled(data):
             if is_bone_active(data):
-                remove_passive(data)
+                remove_passive(top, data)
 
                 if not data.active:
                     collection = actives_collection(context, armature, top)
-                    data.active = make_active_hitbox(context, armature, collection, bone, data)
+                    data.active = make_active_hitbox(self.rigid_bodies, top, armature, collection, bone, data)
 
                 else:
                     update_hitbox_name(data.active, active_name(bone))
 
                 if not data.constraint:
                     collection = constraints_collection(context, armature, top)
-                    data.constraint = make_constraint(context, armature, collection, bone, data)
+                    data.constraint = make_constraint(self.rigid_bodies, top, armature, collection, bone, data)
 
                 else:
-                    data.constraint.name = constraint_name(bone)
+                    utils.set_name(data.constraint, constraint_name(bone))
 
                 self.make_compounds(context, armature, top, data.active, bone, data)
-                align_hitbox(data.active, bone, data)
-                update_hitbox_shape(data.active, data)
-                update_rigid_body(data.active.rigid_body, data)
 
                 self.make_origin(context, armature, top, data.active, bone, data)
 
-                align_constraint(data.constraint, bone)
-                update_constraint(data.constraint.rigid_body_constraint, data)
+                assert data.is_property_set("parent")
 
-                self.update_active_constraint(context, armature, top, bone, data)
+                if data.parent == "":
+                    self.has_root_body = True
+                    make_root_body(context, self.rigid_bodies, armature, top)
 
                 self.exists.add(data.active.name)
                 self.exists.add(data.constraint.name)
 
             else:
-                remove_active(data)
-                remove_constraint(data)
+                remove_active(top, data)
+                remove_constraint(top, data)
 
                 if not data.passive:
                     collection = passives_collection(context, armature, top)
-                    data.passive = make_passive_hitbox(context, armature, collection, bone, data)
+                    data.passive = make_passive_hitbox(self.rigid_bodies, top, armature, collection, bone, data)
 
                 else:
                     update_hitbox_name(data.passive, passive_name(bone))
 
                 self.make_compounds(context, armature, top, data.passive, bone, data)
-                align_hitbox(data.passive, bone, data)
-                update_hitbox_shape(data.passive, data)
-                update_rigid_body(data.passive.rigid_body, data)
 
                 self.make_origin(context, armature, top, data.passive, bone, data)
 
                 self.exists.add(data.passive.name)
 
         else:
-            remove_active(data)
-            remove_passive(data)
-            remove_constraint(data)
-            remove_origin(data)
+            remove_active(top, data)
+            remove_passive(top, data)
+            remove_constraint(top, data)
+            remove_origin(top, data)
 
             for compound in data.compounds:
-                remove_compound(compound)
+                remove_compound(top, compound)
+
+
+    # This must run after self.rigid_bodies.flush()
+    def update_bone(self, context, armature, top, bone, data):
+        if top.enabled and is_bone_enabled(data):
+            hitbox = get_hitbox(data)
+            index = self.transforms.index(bone)
+
+            align_hitbox(hitbox, data, self.transforms, index, top.share_meshes)
+            align_origin(data.origin_empty, self.transforms, index)
+            update_hitbox_shape(hitbox, data)
+            update_rigid_body(hitbox.rigid_body, data)
+
+            if is_bone_active(data):
+                align_constraint(data.constraint, self.transforms, index)
+                update_constraint(data.constraint.rigid_body_constraint, data)
+
+                self.update_active_constraint(context, armature, top, bone, data)
 
 
     def fix_parents(self, armature, top, bone, data):
@@ -442,11 +568,15 @@ class Update(bpy.types.Operator):
 
         self.update_error(top, bone, data)
 
+        self.reconcile_bone(context, armature, top, bone, data)
+
+
+    def reconcile_bone(self, context, armature, top, bone, data):
         self.fix_duplicates(data)
 
         self.hide_active(top, bone, data)
 
-        self.update_bone(context, armature, top, bone, data)
+        self.make_bone(context, armature, top, bone, data)
 
 
     def update_joint(self, context, armature, top, bone):
@@ -458,40 +588,40 @@ class Update(bpy.types.Operator):
 
         if children:
             if is_bone_enabled(data):
-                remove_blank(data)
+                remove_blank(top, data)
 
                 hitbox = get_hitbox(data)
 
                 assert hitbox is not None
 
                 for constraint in children:
-                    constraint.object1 = hitbox
+                    utils.set_property(constraint, "object1", hitbox)
 
             elif data.error != "":
-                remove_blank(data)
+                remove_blank(top, data)
 
                 # This is needed in order to avoid cyclic dependencies with invalid Passives
                 for constraint in children:
-                    constraint.object1 = None
+                    utils.set_property(constraint, "object1", None)
 
             else:
                 blank = data.blank
 
                 if not blank:
                     collection = blanks_collection(context, armature, top)
-                    blank = make_blank_rigid_body(context, armature, collection, bone, data)
+                    blank = make_blank_rigid_body(self.rigid_bodies, top, armature, collection, bone, data)
                     data.blank = blank
 
                 else:
-                    blank.name = blank_name(bone)
+                    utils.set_name(blank, blank_name(bone))
 
                 self.exists.add(blank.name)
 
                 for constraint in children:
-                    constraint.object1 = blank
+                    utils.set_property(constraint, "object1", blank)
 
         else:
-            remove_blank(data)
+            remove_blank(top, data)
 
 
     def update_constraints(self, context, armature, top):
@@ -503,11 +633,14 @@ class Update(bpy.types.Operator):
                 update_pose_constraint(pose_bone)
                 self.update_joint(context, armature, top, pose_bone.bone)
 
+            # This creates the rigid bodies for the new blanks
+            self.rigid_bodies.flush()
+
         else:
             # Remove Child Of constraints
             for pose_bone in armature.pose.bones:
                 remove_pose_constraint(pose_bone)
-                remove_blank(pose_bone.bone.rigid_body_bones)
+                remove_blank(top, pose_bone.bone.rigid_body_bones)
 
         if self.has_root_body:
             self.exists.add(top.root_body.name)
@@ -516,6 +649,20 @@ class Update(bpy.types.Operator):
             remove_root_body(top)
 
 
+    # Switching to Edit mode recreates every bone, so it's only done if a parent actually changes
+    def has_parent_changes(self):
+        return len(self.restore_parents) != 0 or len(self.remove_parents) != 0
+
+
+    def apply_parent_changes(self, context, armature):
+        if self.has_parent_changes():
+            with profiler.phase("change_parents"), utils.Mode(context, armature, 'EDIT'):
+                self.change_parents(context, armature)
+
+            # Leaving Edit mode recreated the bones with their new parents
+            self.topology = topology.reload(armature)
+
+
     def change_parents(self, context, armature):
         edit_bones = armature.data.edit_bones
 
@@ -530,7 +677,7 @@ class Update(bpy.types.Operator):
                 assert edit_bone.parent is None
 
                 if parent_name != "":
-                    edit_bone.parent = edit_bones[self.names[parent_name]]
+                    edit_bone.parent = edit_bones[self.topology.stored_names[parent_name]]
 
                 edit_bone.use_connect = use_connect
 
@@ -542,6 +689,11 @@ class Update(bpy.types.Operator):
     # This cleans up any objects which are left behind after a bone
     # has been deleted.
     def remove_orphans(self, context, armature, top):
+        with profiler.phase("remove_orphans"):
+            self.remove_all_orphans(context, armature, top)
+
+
+    def remove_all_orphans(self, context, armature, top):
         exists = self.exists
 
         if top.actives and remove_orphans(top.actives, exists):
@@ -571,6 +723,8 @@ class Update(bpy.types.Operator):
         if scene.collection and utils.safe_remove_collection(scene.collection):
             scene.property_unset("collection")
 
+        utils.remove_unused_shared_meshes()
+
 
     def process_edit(self, context, armature, top):
         for pose_bone in armature.pose.bones:
@@ -581,122 +735,795 @@ class Update(bpy.types.Operator):
 
             self.fix_parents(armature, top, bone, data)
 
+
+    def hide_edit_collections(self, top):
         if top.actives:
-            top.actives.hide_viewport = True
+            utils.set_property(top.actives, "hide_viewport", True)
 
         if top.passives:
-            top.passives.hide_viewport = True
+            utils.set_property(top.passives, "hide_viewport", True)
 
         if top.compounds:
-            top.compounds.hide_viewport = True
+            utils.set_property(top.compounds, "hide_viewport", True)
 
         if top.origins:
-            top.origins.hide_viewport = True
+            utils.set_property(top.origins, "hide_viewport", True)
 
 
+    # This yields the progress after every slice of bones
     def process_pose(self, context, armature, top):
         top.errors.clear()
 
+        with profiler.phase("fix_parents"):
+            # The stored parents are a part of the topology, so it must be loaded after they are stored
+            if not self.store_parents:
+                self.topology = topology.get(armature)
 
-        for bone in armature.data.bones:
-            data = bone.rigid_body_bones
-            self.fix_parents(armature, top, bone, data)
+            for bone in armature.data.bones:
+                data = bone.rigid_body_bones
+                self.fix_parents(armature, top, bone, data)
+
+            if self.store_parents or self.delete_parents:
+                topology.invalidate(armature)
+
+            if self.store_parents:
+                self.topology = topology.get(armature)
 
 
         # This must happen before process_bone
-        with utils.Mode(context, 'EDIT'):
-            self.change_parents(context, armature)
+        self.apply_parent_changes(context, armature)
+
+        children = self.topology.stored_children
+
+
+        # Bones are looked up by name, because the slices can run in different ticks
+        names = list(self.topology.names)
+
+        total = len(names)
+        size = total if self.slice_size is None else self.slice_size
+
+        for start in range(0, total, max(size, 1)):
+            self.process_slice(context, armature, top, names[start:start + size])
 
+            done = min(start + size, total)
 
-        for bone in armature.data.bones:
-            self.process_bone(context, armature, top, bone)
+            yield (done, total)
 
+            if self.cancelled:
+                self.cancel(context, armature, top, children, names[:done], names[done:])
+                return
 
-        self.update_constraints(context, armature, top)
+
+        with profiler.phase("update_constraints"):
+            self.update_constraints(context, armature, top)
 
         self.remove_orphans(context, armature, top)
 
+        self.hide_collections(top)
+
+
+    def process_slice(self, context, armature, top, names):
+        bones = armature.data.bones
+
+        with profiler.phase("process_bone"):
+            for name in names:
+                self.process_bone(context, armature, top, bones[name])
+
+        # This creates the rigid bodies for all of the new objects at once
+        with profiler.phase("rigid_bodies"):
+            self.rigid_bodies.flush()
+
+        with profiler.phase("update_bone"):
+            if self.slice_size is None:
+                self.transforms = Transforms(bones)
+
+            else:
+                self.transforms = Transforms(bones, names)
+
+            for name in names:
+                bone = bones[name]
+                self.update_bone(context, armature, top, bone, bone.rigid_body_bones)
+
+
+    # The processed bones are finished, and the remaining bones are
+    # marked as dirty, so they will be updated when the update is resumed.
+    def cancel(self, context, armature, top, children, processed, remaining):
+        bones = armature.data.bones
+
+        # The joints of the remaining bones are updated when the update is resumed
+        joints = set(bones[name].rigid_body_bones.name for name in processed)
+
+        with profiler.phase("update_constraints"):
+            self.update_changed(context, armature, top, children, processed, joints)
+
+        self.profile.cancelled = True
+
+        events.mark_bones_pending(armature, remaining)
+
+
+    # This only updates the dirty bones, the bones whose error has changed,
+    # and the joints which connect them to their parents / children.
+    def process_dirty(self, context, armature, top, dirty):
+        bones = armature.data.bones
+
+        with profiler.phase("fix_parents"):
+            self.topology = topology.get(armature)
+
+            for name in dirty:
+                bone = bones.get(name)
+
+                if bone is not None:
+                    self.process_parent(armature, top, bone, bone.rigid_body_bones)
+
+
+        # This must happen before reconcile_bone
+        self.apply_parent_changes(context, armature)
+
+        children = self.topology.stored_children
+
+        bones = armature.data.bones
+
+        # The error depends on the parents, so it must also check the descendants
+        descendants = self.topology.descendants(dirty)
+
+        for index in reversed(range(len(top.errors))):
+            if top.errors[index].name in descendants:
+                top.errors.remove(index)
+
+
+        # Names of bones which must be updated
+        changed = set()
+
+        # Stored names of bones whose joint must be updated
+        joints = set()
+
+        for name in descendants:
+            bone = bones[name]
+            data = bone.rigid_body_bones
+
+            old_error = data.error
+
+            self.update_error(top, bone, data)
+
+            if name in dirty or data.error != old_error:
+                changed.add(name)
+
+                joints.add(data.name)
+
+                if data.parent != "":
+                    joints.add(data.parent)
+
+
+        with profiler.phase("process_bone"):
+            for name in changed:
+                bone = bones[name]
+                self.reconcile_bone(context, armature, top, bone, bone.rigid_body_bones)
+
+        # This creates the rigid bodies for all of the new objects at once
+        with profiler.phase("rigid_bodies"):
+            self.rigid_bodies.flush()
+
+        with profiler.phase("update_bone"):
+            self.transforms = Transforms(bones, changed)
+
+            for name in changed:
+                bone = bones[name]
+                self.update_bone(context, armature, top, bone, bone.rigid_body_bones)
+
+        with profiler.phase("update_constraints"):
+            self.update_changed(context, armature, top, children, changed, joints)
+
+
+    # This updates the joints and Child Of constraints for the changed bones
+    def update_changed(self, context, armature, top, children, changed, joints):
+        bones = armature.data.bones
+
+        # The unchanged children were not processed, so the joints must be recalculated
+        self.active_children = {}
+
+        for name in joints:
+            constraints = []
+
+            for child_name in children.get(name, []):
+                data = bones[self.topology.stored_names[child_name]].rigid_body_bones
+
+                # The constraint doesn't exist if the child hasn't been updated yet
+                if data.constraint and is_bone_enabled(data) and is_bone_active(data):
+                    constraints.append(data.constraint.rigid_body_constraint)
+
+            self.active_children[name] = constraints
+
+        utils.reset_frame(context)
+
+        pose_bones = armature.pose.bones
+
+        for name in changed:
+            update_pose_constraint(pose_bones[name])
+
+        for name in joints:
+            self.update_joint(context, armature, top, bones[self.topology.stored_names[name]])
+
+        # This creates the rigid bodies for the new blanks
+        self.rigid_bodies.flush()
+
+
+        for name in children.get("", []):
+            data = bones[self.topology.stored_names[name]].rigid_body_bones
+
+            if is_bone_enabled(data) and is_bone_active(data):
+                self.has_root_body = True
+                break
+
+        if not self.has_root_body:
+            remove_root_body(top)
+
+        self.hide_collections(top)
+
+
+    def hide_collections(self, top):
         if top.actives:
-            top.actives.hide_viewport = top.hide_hitboxes
+            utils.set_property(top.actives, "hide_viewport", top.hide_hitboxes)
 
         if top.passives:
-            top.passives.hide_viewport = top.hide_hitboxes
+            utils.set_property(top.passives, "hide_viewport", top.hide_hitboxes)
 
         if top.compounds:
-            top.compounds.hide_viewport = top.hide_hitboxes
+            utils.set_property(top.compounds, "hide_viewport", top.hide_hitboxes)
 
         if top.origins:
-            top.origins.hide_viewport = top.hide_hitbox_origins
+            utils.set_property(top.origins, "hide_viewport", top.hide_hitbox_origins)
+
+
+    # This yields the progress while it is updating
+    def steps(self):
+        context = self.context
+        armature = self.armature
+        top = armature.data.rigid_body_bones
+
+        if self.is_edit_mode:
+            # The bone data can only be changed in Pose mode, so it only switches
+            # modes if there are stored parents or constraints which must be removed
+            if self.delete_parents or any(has_pose_constraint(pose_bone) for pose_bone in armature.pose.bones):
+                with profiler.phase("process_edit"), utils.Mode(context, armature, 'POSE'):
+                    # The bones might have been changed in Edit mode
+                    self.topology = topology.reload(armature)
+
+                    self.process_edit(context, armature, top)
+
+                    if self.delete_parents:
+                        topology.invalidate(armature)
+
+            self.hide_edit_collections(top)
+
+            if self.has_parent_changes():
+                with profiler.phase("change_parents"):
+                    self.change_parents(context, armature)
+
+        elif self.dirty is None:
+            yield from self.process_pose(context, armature, top)
+
+        else:
+            self.process_dirty(context, armature, top, self.dirty)
+
+        # The remaining bones of a cancelled update are still dirty
+        if not self.cancelled:
+            utils.set_property(top, "updated_generation", top.generation)
+
+
+    def run(self):
+        with self.profile:
+            for _ in self.steps():
+                pass
+
+        profiler.record(self.profile)
+
+
+    # Only big full updates are sliced, because the other updates are fast
+    def can_slice(self):
+        top = self.armature.data.rigid_body_bones
+
+        return (
+            not bpy.app.background and
+            not self.is_edit_mode and
+            top.enabled and
+            self.dirty is None and
+            len(self.armature.data.bones) >= SLICED_UPDATE_BONES
+        )
+
+
+def redraw_panels():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
+# This runs the update over multiple ticks, so that the UI doesn't freeze with big armatures.
+class SlicedUpdate:
+    def __init__(self, context, updater):
+        armature = updater.armature
+
+        self.name = armature.name
+        self.key = utils.armature_key(armature)
+        self.mode = armature.mode
+
+        self.updater = updater
+        updater.slice_size = SLICE_BONES
+
+        # The operator's context can't be used after the operator has finished
+        updater.context = bpy.context
+        updater.rigid_bodies.context = bpy.context
+
+        self.steps = updater.steps()
+
+        self.done = 0
+        self.total = len(armature.data.bones)
+
+        events.sliced_updates[self.key] = self
 
+        context.window_manager.progress_begin(0, self.total)
+
+        # This is needed so that it can be unregistered
+        self.timer = self.tick
+
+        # The first slice switches modes, so it must run while the armature is active
+        if self.tick() is not None:
+            bpy.app.timers.register(self.timer)
+
+
+    # The armature might have been deleted (e.g. by loading a new file) or renamed between ticks
+    def get_armature(self):
+        armature = utils.get_armature(self.key, self.name)
+
+        if armature is not None:
+            self.name = armature.name
+
+        return armature
+
+
+    def cancel(self):
+        self.updater.cancelled = True
+
+
+    def stop(self):
+        if bpy.app.timers.is_registered(self.timer):
+            bpy.app.timers.unregister(self.timer)
+
+        profiler.record(self.updater.profile)
+
+        bpy.context.window_manager.progress_end()
+
+        del events.sliced_updates[self.key]
+
+        redraw_panels()
+
+
+    def tick(self):
+        armature = self.get_armature()
+
+        if armature is None or armature.mode != self.mode:
+            self.steps.close()
+            self.updater.profile.cancelled = True
+            self.stop()
+
+            # It was only partially updated, so it needs a full update
+            if armature is not None:
+                events.mark_bones_pending(armature, None)
+
+            return None
+
+        deadline = time.perf_counter() + SLICE_BUDGET
+
+        finished = True
+
+        with self.updater.profile:
+            for done, total in self.steps:
+                self.done = done
+                bpy.context.window_manager.progress_update(done)
+
+                if time.perf_counter() >= deadline:
+                    finished = False
+                    break
+
+        if finished:
+            self.stop()
+            return None
+
+        else:
+            redraw_panels()
+            return 0.0
+
+
+# This must be an operator, because it creates/destroys data blocks (e.g. objects).
+# It must run asynchronously, in a separate tick. This is handled by `events.mark_dirty`.
+class Update(bpy.types.Operator):
+    bl_idname = "rigid_body_bones.update"
+    bl_label = "Update Rigid Body Bones"
+    bl_description = "Recreates the rigid bodies and joints for every bone"
+    # TODO use UNDO_GROUPED ?
+    bl_options = {'REGISTER', 'UNDO'}
+
+    full: bpy.props.BoolProperty(
+        name="Full Update",
+        description="Update every bone, instead of only the bones which have changed",
+        default=False,
+        options={'SKIP_SAVE'},
+    )
+
+    sliced: bpy.props.BoolProperty(
+        name="Sliced Update",
+        description="Update big armatures over multiple ticks, so the UI doesn't freeze",
+        default=False,
+        options={'SKIP_SAVE'},
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return utils.is_armature(context) and utils.armature_key(context.active_object) not in events.sliced_updates
+
+
+    def execute(self, context):
+        updater = Updater(context, context.active_object, full=self.full)
+
+        if self.sliced and updater.can_slice():
+            SlicedUpdate(context, updater)
+
+        else:
+            updater.run()
+
+        return {'FINISHED'}
+
+
+# This updates every dirty armature at once, so that changing many armatures
+# only creates one undo step. It is run by `events.next_tick`.
+class UpdateDirty(bpy.types.Operator):
+    bl_idname = "rigid_body_bones.update_dirty"
+    bl_label = "Update Dirty Armatures"
+    bl_description = "Updates the rigid bodies for every armature which has changed"
+    # This runs automatically after every change, so it doesn't push an undo step,
+    # the change itself already pushed one. Undo is fixed by `events.fix_undo`.
+    bl_options = {'INTERNAL'}
+
+    sliced: bpy.props.BoolProperty(
+        name="Sliced Update",
+        description="Update big armatures over multiple ticks, so the UI doesn't freeze",
+        default=False,
+        options={'SKIP_SAVE'},
+    )
 
     @classmethod
     def poll(cls, context):
-        return utils.is_armature(context)
+        return events.has_ready_armatures()
+
+
+    def execute(self, context):
+        for armature in events.take_dirty_armatures():
+            updater = Updater(context, armature)
+
+            if self.sliced and updater.can_slice():
+                SlicedUpdate(context, updater)
+
+            else:
+                updater.run()
+
+            events.forget_dirty(armature)
+
+        return {'FINISHED'}
+
+
+class Tolerances:
+    location_tolerance: bpy.props.FloatProperty(
+        name="Location Tolerance",
+        description="Maximum difference from the baked location",
+        default=0.001,
+        min=0.000001,
+        step=0.01,
+        precision=4,
+        unit='LENGTH',
+    )
+
+    rotation_tolerance: bpy.props.FloatProperty(
+        name="Rotation Tolerance",
+        description="Maximum difference from the baked rotation",
+        # 0.1 degrees
+        default=0.00174533,
+        min=0.000001,
+        step=1,
+        precision=3,
+        subtype='ANGLE',
+        unit='ROTATION',
+    )
+
+    scale_tolerance: bpy.props.FloatProperty(
+        name="Scale Tolerance",
+        description="Maximum difference from the baked scale",
+        default=0.001,
+        min=0.000001,
+        step=0.01,
+        precision=4,
+    )
+
+    def tolerances(self):
+        return (self.location_tolerance, self.rotation_tolerance, self.scale_tolerance)
+
+
+# Shared by the operators which step through the simulation
+class Simulate:
+    frame_start: bpy.props.IntProperty(
+        name="Start Frame",
+        description="First frame to simulate",
+        min=0,
+        default=1,
+    )
+
+    frame_end: bpy.props.IntProperty(
+        name="End Frame",
+        description="Last frame to simulate",
+        min=0,
+        default=250,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if not utils.is_armature(context):
+            return False
+
+        armature = context.active_object
+
+        return (
+            armature.mode != 'EDIT' and
+            armature.data.rigid_body_bones.enabled and
+            utils.armature_key(armature) not in events.sliced_updates
+        )
+
+
+    def invoke(self, context, event):
+        self.frame_start = context.scene.frame_start
+        self.frame_end = context.scene.frame_end
+        return context.window_manager.invoke_props_dialog(self)
+
+
+    # The simulation must use the latest hitboxes, and disabling physics should
+    # remove the objects right away, so this doesn't wait for the next tick.
+    def update_now(self, context, armature):
+        Updater(context, armature).run()
+        events.forget_dirty(armature)
+
+
+    # Returns False if the operator should be cancelled
+    def prepare(self, context, armature):
+        if self.frame_end < self.frame_start:
+            self.report({'ERROR'}, "The end frame must be after the start frame")
+            return False
+
+        if events.is_dirty(armature) or events.is_pending(armature):
+            self.update_now(context, armature)
+
+        return True
+
+
+    # Calls f with a function which updates the progress bar
+    def simulate(self, context, f):
+        window_manager = context.window_manager
+        window_manager.progress_begin(0, self.frame_end - min(self.frame_start, context.scene.rigidbody_world.point_cache.frame_start))
+
+        try:
+            return f(window_manager.progress_update)
+
+        finally:
+            window_manager.progress_end()
+
+
+class Bake(bpy.types.Operator, Simulate, Tolerances):
+    bl_idname = "rigid_body_bones.bake"
+    bl_label = "Bake to Keyframes"
+    bl_description = "Simulates the Active bones and saves their motion as keyframes"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    disable: bpy.props.BoolProperty(
+        name="Disable Physics",
+        description="Disable rigid body physics for the armature after baking, so it only uses the keyframes",
+        default=True,
+    )
+
+    reduce: bpy.props.BoolProperty(
+        name="Reduce Keyframes",
+        description="Remove the keyframes which can be interpolated from the other keyframes, within the tolerances",
+        default=False,
+    )
+
+    use_cache: bpy.props.BoolProperty(
+        name="Use Bake Cache",
+        description="Reuse the simulation from a previous bake with the same settings, animation and frames, instead of simulating again. Force fields and the values of drivers are not checked",
+        default=False,
+    )
+
+    def sample(self, context, armature, progress):
+        if self.use_cache:
+            try:
+                samples, cached = cache.bake_samples(context, armature, self.frame_start, self.frame_end, progress)
+
+                if cached:
+                    self.report({'INFO'}, "Using the cached simulation")
+
+                return samples
+
+            # The bake still works without the cache
+            except OSError as e:
+                self.report({'WARNING'}, "Could not use the bake cache: {}".format(e))
+
+        return bake.sample(context, armature, self.frame_start, self.frame_end, progress)
 
 
     def execute(self, context):
         armature = context.active_object
         top = armature.data.rigid_body_bones
 
+        if not self.prepare(context, armature):
+            return {'CANCELLED'}
 
-        # Fast lookup for stored bone names -> new name
-        self.names = {}
+        samples = self.simulate(context, lambda progress: self.sample(context, armature, progress))
 
-        # Data for bones which should have their parent restored
-        self.restore_parents = {}
+        if samples is None:
+            self.report({'WARNING'}, "There are no Active bones to bake")
+            return {'CANCELLED'}
 
-        # Names of bones which should have their parent removed
-        self.remove_parents = set()
+        # The physics unparents the Active bones, so it is always disabled while the keyframes
+        # are written, otherwise they would be wrong when the parents are restored.
+        top.enabled = False
+        self.update_now(context, armature)
 
-        # Whether to destructively delete/store the bone parent data
-        self.delete_parents = False
-        self.store_parents = False
+        reduction = bake.write_keyframes(context, armature, samples, self.tolerances() if self.reduce else None)
 
-        self.is_edit_mode = (top.mode == 'EDIT')
+        if not self.disable:
+            top.enabled = True
+            self.update_now(context, armature)
 
+        self.report({'INFO'}, "Baked {} bones".format(len(samples.names)))
 
-        if self.is_edit_mode:
-            assert armature.mode == 'EDIT'
-        else:
-            assert armature.mode != 'EDIT'
+        if self.reduce:
+            self.report({'INFO'}, reduction.report())
 
+        return {'FINISHED'}
 
-        if self.is_edit_mode or not top.enabled:
-            if top.parents_stored:
-                top.property_unset("parents_stored")
-                self.delete_parents = True
 
-        else:
-            if not top.parents_stored:
-                top.parents_stored = True
-                self.store_parents = True
+class CacheSimulation(bpy.types.Operator, Simulate):
+    bl_idname = "rigid_body_bones.cache_simulation"
+    bl_label = "Cache to Disk"
+    bl_description = "Simulates the Active bones and stores their motion in the cache file, so it can be played without simulating again"
+    bl_options = {'REGISTER', 'UNDO'}
 
+    play: bpy.props.BoolProperty(
+        name="Play from Cache",
+        description="Disable rigid body physics for the armature after caching, and move the bones with the cache",
+        default=True,
+    )
 
-        if self.is_edit_mode:
-            with utils.Mode(context, 'POSE'):
-                self.process_edit(context, armature, top)
+    def execute(self, context):
+        armature = context.active_object
+        top = armature.data.rigid_body_bones
 
-            self.change_parents(context, armature)
+        if bpy.data.filepath == "" and (top.cache_file == "" or top.cache_file.startswith("//")):
+            self.report({'ERROR'}, "Save the .blend file first, or choose an absolute path for the cache file")
+            return {'CANCELLED'}
 
-        else:
-            # Fast lookup for stored bone names -> list of active children
-            self.active_children = {}
+        if not self.prepare(context, armature):
+            return {'CANCELLED'}
 
-            # Names of objects which exist
-            self.exists = set()
+        try:
+            count = self.simulate(context, lambda progress: cache.record(context, armature, cache.file_path(armature), self.frame_start, self.frame_end, progress))
 
-            # Names of objects for testing for duplicates
-            self.duplicates = set()
+        except OSError as e:
+            self.report({'ERROR'}, "Could not write the cache file: {}".format(e))
+            return {'CANCELLED'}
 
-            # Cache of whether a bone has an active parent or not
-            self.active_cache = {}
+        if count == 0:
+            self.report({'WARNING'}, "There are no Active bones to cache")
+            return {'CANCELLED'}
 
-            # Whether the root body should exist or not
-            self.has_root_body = False
+        if self.play:
+            top.enabled = False
+            self.update_now(context, armature)
+            top.cache_playback = True
+
+        self.report({'INFO'}, "Cached {} bones to {}".format(count, cache.file_path(armature)))
+
+        return {'FINISHED'}
 
-            self.process_pose(context, armature, top)
 
+class ReduceKeyframes(bpy.types.Operator, Tolerances):
+    bl_idname = "rigid_body_bones.reduce_keyframes"
+    bl_label = "Reduce Baked Keyframes"
+    bl_description = "Removes the baked bone keyframes which can be interpolated from the other keyframes, within the tolerances"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        if not utils.is_armature(context):
+            return False
+
+        animation_data = context.active_object.animation_data
+        return animation_data is not None and animation_data.action is not None
 
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
+    def execute(self, context):
+        action = context.active_object.animation_data.action
+
+        reduction = keyframes.reduce_action(action, self.tolerances())
+
+        if reduction.before == 0:
+            self.report({'WARNING'}, "There are no baked bone keyframes to reduce")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, reduction.report())
+
+        return {'FINISHED'}
+
+
+class CancelUpdate(bpy.types.Operator):
+    bl_idname = "rigid_body_bones.cancel_update"
+    bl_label = "Cancel Update"
+    bl_description = "Stops updating the armature, the remaining bones are updated later"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return utils.is_armature(context) and utils.armature_key(context.active_object) in events.sliced_updates
+
+    def execute(self, context):
+        events.sliced_updates[utils.armature_key(context.active_object)].cancel()
+        return {'FINISHED'}
+
+
+class ExportProfile(bpy.types.Operator, ExportHelper):
+    bl_idname = "rigid_body_bones.export_profile"
+    bl_label = "Export Profile"
+    bl_description = "Saves the timings of the recent updates as JSON"
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".json"
+
+    filter_glob: bpy.props.StringProperty(
+        default="*.json",
+        options={'HIDDEN'},
+    )
+
+    all_armatures: bpy.props.BoolProperty(
+        name="All Armatures",
+        description="Export the updates for every armature, instead of only the active armature",
+        default=False,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return len(profiler.history) != 0
+
+    def execute(self, context):
+        if self.all_armatures or not utils.is_armature(context):
+            profiler.export_json(self.filepath)
+
+        else:
+            profiler.export_json(self.filepath, context.active_object.name)
+
+        return {'FINISHED'}
+
+
+class ClearProfile(bpy.types.Operator):
+    bl_idname = "rigid_body_bones.clear_profile"
+    bl_label = "Clear Profile"
+    bl_description = "Forgets the timings of the recent updates for the active armature"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return utils.is_armature(context) and context.active_object.name in profiler.history
+
+    def execute(self, context):
+        profiler.clear(context.active_object.name)
         return {'FINISHED'}
 
 
@@ -704,8 +1531,8 @@ class Update(bpy.types.Operator):
 class CleanupArmatures(bpy.types.Operator):
     bl_idname = "rigid_body_bones.cleanup_armatures"
     bl_label = "Cleanup Rigid Body Bones"
-    # TODO use UNDO_GROUPED ?
-    bl_options = {'REGISTER', 'UNDO'}
+    # This runs automatically after an armature is deleted, deleting it already pushed an undo step
+    bl_options = {'INTERNAL'}
 
 
     @classmethod
@@ -717,7 +1544,13 @@ class CleanupArmatures(bpy.types.Operator):
         exists = set()
 
         for armature in bpy.data.armatures:
-            container = armature.rigid_body_bones.container
+            top = armature.rigid_body_bones
+
+            # The armature object was deleted, so its pooled objects will never be reused
+            if armature.users == 0:
+                pool.evict(top.pool)
+
+            container = top.container
 
             if container:
                 exists.add(container.name)
@@ -841,6 +1674,7 @@ class CalculateMass(bpy.types.Operator):
 
     def execute(self, context):
         datas = []
+        names = []
 
         with utils.Selected(context), utils.Selectable(context):
             utils.deselect_all(context)
@@ -852,13 +1686,13 @@ class CalculateMass(bpy.types.Operator):
 
                 if hitbox:
                     datas.append(data)
+                    names.append(bone.name)
                     utils.select_active(context, hitbox)
 
             bpy.ops.rigidbody.mass_calculate(material=self.material, density=self.density)
 
         # This is only needed to prevent the mass update callback from running.
-        # TODO make this more efficient
-        events.mark_dirty(context)
+        events.mark_bones_dirty(context, names)
 
         for data in datas:
             hitbox = get_hitbox(data)
@@ -884,11 +1718,15 @@ def add_new_compound(bone):
     properties.Compound.is_updating = False
 
 
-def delete_compound(bone):
+# The hitbox is released here, because the dirty update only sees the remaining compounds
+def delete_compound(top, bone):
     data = bone.rigid_body_bones
 
     old_index = data.active_compound_index
 
+    if old_index < len(data.compounds):
+        remove_compound(top, data.compounds[old_index])
+
     data.compounds.remove(old_index)
 
     length = len(data.compounds)
@@ -933,17 +1771,21 @@ class NewCompound(bpy.types.Operator):
         return self.execute(context)
 
     def execute(self, context):
+        names = []
+
         if self.is_alt:
             for pose_bone in context.selected_pose_bones_from_active_object:
                 bone = pose_bone.bone
                 add_new_compound(bone)
+                names.append(bone.name)
 
         else:
             armature = context.active_object
             bone = utils.get_active_bone(armature)
             add_new_compound(bone)
+            names.append(bone.name)
 
-        events.mark_dirty(context)
+        events.mark_bones_dirty(context, names)
 
         return {'FINISHED'}
 
@@ -968,17 +1810,23 @@ class RemoveCompound(bpy.types.Operator):
         return self.execute(context)
 
     def execute(self, context):
+        names = []
+
+        armature = context.active_object
+        top = armature.data.rigid_body_bones
+
         if self.is_alt:
             for pose_bone in context.selected_pose_bones_from_active_object:
                 bone = pose_bone.bone
-                delete_compound(bone)
+                delete_compound(top, bone)
+                names.append(bone.name)
 
         else:
-            armature = context.active_object
             bone = utils.get_active_bone(armature)
-            delete_compound(bone)
+            delete_compound(top, bone)
+            names.append(bone.name)
 
-        events.mark_dirty(context)
+        events.mark_bones_dirty(context, names)
 
         return {'FINISHED'}
 
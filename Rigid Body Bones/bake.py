@@ -0,0 +1,278 @@
+import bpy
+import numpy as np
+from mathutils import Matrix
+from . import topology
+from . import keyframes
+from .transforms import matrix_to_euler_order, matrix_to_quaternion, quaternion_to_axis_angle
+
+
+# Blender matrices are column major
+def to_row_major(matrices):
+    return np.swapaxes(matrices, -1, -2)
+
+
+# The local matrices can be calculated with NumPy only if the bone uses the
+# default inheritance, the other bones use Object.convert_space
+def has_default_inheritance(bone):
+    return bone.use_inherit_rotation and bone.inherit_scale == 'FULL' and bone.use_local_location
+
+
+# The simulation can only be sampled while the rigid bodies exist, but the
+# keyframes must be relative to the bone parents which exist afterwards
+# (disabling the physics restores the parents of the Active bones), so
+# the poses are stored in armature space until the keyframes are written.
+class Samples:
+    def __init__(self, names, frame_start, poses, indexes):
+        # Names of the bones which will be baked
+        self.names = names
+
+        self.frame_start = frame_start
+
+        # Pose matrices (frames, bones, 4, 4) of every bone, in the same order as armature.pose.bones
+        self.poses = poses
+
+        # Bone name -> index in poses
+        self.indexes = indexes
+
+
+# Steps the simulation one frame at a time, and stores the pose matrices of
+# every bone into `samples` (frames, bones * 16), in the same order as armature.pose.bones
+#
+# The matrices are column major, like Blender returns them.
+def step_frames(context, armature, frame_start, frame_end, samples, progress):
+    scene = context.scene
+    pose_bones = armature.pose.bones
+
+    # The simulation only works when every frame is evaluated in order, starting at the beginning of the cache
+    first = min(frame_start, scene.rigidbody_world.point_cache.frame_start)
+
+    frame_current = scene.frame_current
+
+    try:
+        for frame in range(first, frame_end + 1):
+            scene.frame_set(frame)
+
+            if frame >= frame_start:
+                pose_bones.foreach_get("matrix", samples[frame - frame_start])
+
+            progress(frame - first)
+
+    finally:
+        scene.frame_set(frame_current)
+
+
+# Names of the bones which are simulated, only the Active bones are
+# simulated, the other bones already follow their animation.
+def simulated_bones(armature):
+    return [bone.name for bone in armature.data.bones if bone.rigid_body_bones.active]
+
+
+def sample(context, armature, frame_start, frame_end, progress):
+    names = simulated_bones(armature)
+
+    if len(names) == 0:
+        return None
+
+    pose_bones = armature.pose.bones
+
+    count = len(pose_bones)
+    frames = frame_end - frame_start + 1
+
+    samples = np.empty((frames, count * 16), dtype=np.float32)
+
+    step_frames(context, armature, frame_start, frame_end, samples, progress)
+
+    poses = to_row_major(samples.reshape(frames, count, 4, 4))
+    indexes = {name: i for i, name in enumerate(pose_bones.keys())}
+
+    return Samples(names, frame_start, poses, indexes)
+
+
+# Converts the pose matrices of the bones (in armature space) into their local matrices.
+#
+# This is the same as Object.convert_space from 'POSE' to 'LOCAL', but for every bone and frame at once.
+def local_matrices(hierarchy, rest, poses, indexes):
+    parents = np.array(hierarchy.parents, dtype=np.int64)[indexes]
+    has_parent = (parents != -1)
+
+    # Rest matrix of the bone relative to its parent
+    offset = np.linalg.inv(rest[indexes])
+    offset[has_parent] = offset[has_parent] @ rest[parents[has_parent]]
+
+    parent_poses = poses[:, parents]
+    parent_poses[:, ~has_parent] = np.identity(4)
+
+    return offset[None] @ np.linalg.inv(parent_poses) @ poses[:, indexes]
+
+
+# Quaternions q and -q are the same rotation, this picks the one which is closest to the previous frame
+def continuous_quaternions(quaternions):
+    dots = np.sum(quaternions[1:] * quaternions[:-1], axis=-1)
+    signs = np.cumprod(np.where(dots < 0.0, -1.0, 1.0), axis=0)
+    quaternions[1:] *= signs[..., None]
+    return quaternions
+
+
+# Returns (property name, values) for each channel of the bone, the values are (frames, size)
+def bone_channels(rotation_mode, matrices):
+    location = matrices[:, :3, 3]
+    scale = np.linalg.norm(matrices[:, :3, :3], axis=1)
+    rotation = matrices[:, :3, :3] / scale[:, None, :]
+
+    yield ("location", location)
+
+    if rotation_mode in ('QUATERNION', 'AXIS_ANGLE'):
+        quaternions = continuous_quaternions(matrix_to_quaternion(rotation))
+
+        if rotation_mode == 'QUATERNION':
+            yield ("rotation_quaternion", quaternions)
+
+        else:
+            yield ("rotation_axis_angle", quaternion_to_axis_angle(quaternions))
+
+    else:
+        euler = matrix_to_euler_order(rotation, rotation_mode)
+        yield ("rotation_euler", np.unwrap(euler, axis=0))
+
+    yield ("scale", scale)
+
+
+# The baked keyframes are written into a copy of the armature's action,
+# so the original keyframes (e.g. for Passive bones) are kept.
+#
+# Baking again replaces the previous baked action of the armature, and copies
+# the original action again, so old keyframes are never baked over.
+def make_action(armature):
+    animation_data = armature.animation_data_create()
+
+    name = "{} Baked".format(armature.name)
+
+    source = animation_data.action
+
+    if source is not None and source.rigid_body_bones.baked:
+        source = source.rigid_body_bones.source
+
+    old = bpy.data.actions.get(name)
+
+    if old is not None and not (old.rigid_body_bones.baked and old.rigid_body_bones.source == source):
+        old = None
+
+    if source is not None:
+        action = source.copy()
+
+    else:
+        action = bpy.data.actions.new(name)
+
+    action.rigid_body_bones.baked = True
+    action.rigid_body_bones.source = source
+
+    if old is not None:
+        # NLA strips and other objects which use the old action now use the new one
+        old.user_remap(action)
+        bpy.data.actions.remove(old)
+
+    action.name = name
+    animation_data.action = action
+
+    return action
+
+
+# Returns the F-Curves of the bone, see keyframes.py
+def bone_curves(pose_bone, matrices):
+    for name, values in bone_channels(pose_bone.rotation_mode, matrices):
+        data_path = pose_bone.path_from_id(name)
+
+        for channel in range(values.shape[1]):
+            yield (data_path, channel, pose_bone.name, values[:, channel])
+
+
+# Object.convert_space uses the current pose of the parent bone, so every frame
+# is evaluated again, after the keyframes of the parents have been written.
+#
+# Bones with a non-default parent are grouped by how many of them are above the bone,
+# so that each group only needs one pass over the frames.
+def write_special(context, armature, action, hierarchy, samples, frames, special, tolerances, reduction):
+    scene = context.scene
+
+    depths = {}
+
+    for index in hierarchy.order:
+        depths[index] = depths.get(hierarchy.parents[index], 0) + (1 if index in special else 0)
+
+    groups = {}
+
+    for index in special:
+        groups.setdefault(depths[index], []).append(armature.pose.bones[hierarchy.names[index]])
+
+    frame_current = scene.frame_current
+
+    try:
+        for depth in sorted(groups.keys()):
+            pose_bones = groups[depth]
+            matrices = np.empty((len(frames), len(pose_bones), 4, 4))
+
+            for i, frame in enumerate(frames):
+                scene.frame_set(int(frame))
+
+                for j, pose_bone in enumerate(pose_bones):
+                    matrices[i, j] = armature.convert_space(
+                        pose_bone=pose_bone,
+                        matrix=Matrix(samples.poses[i, samples.indexes[pose_bone.name]].tolist()),
+                        from_space='POSE',
+                        to_space='LOCAL',
+                    )
+
+            curves = []
+
+            for j, pose_bone in enumerate(pose_bones):
+                curves.extend(bone_curves(pose_bone, matrices[:, j]))
+
+            keyframes.write_curves(action, frames, curves, tolerances, reduction)
+
+    finally:
+        scene.frame_set(frame_current)
+
+
+# Writes the sampled poses as keyframes, relative to the current bone parents.
+#
+# If `tolerances` is (location, rotation, scale) the keyframes are reduced,
+# the returned keyframes.Reduction contains the statistics.
+def write_keyframes(context, armature, samples, tolerances):
+    bones = armature.data.bones
+    hierarchy = topology.get(armature)
+
+    # Converts the poses into the same order as armature.data.bones
+    order = [samples.indexes[name] for name in hierarchy.names]
+    poses = samples.poses[:, order].astype(np.float64)
+
+    baked = [hierarchy.indexes[name] for name in samples.names]
+
+    rest = np.empty(len(bones) * 16, dtype=np.float32)
+    bones.foreach_get("matrix_local", rest)
+    rest = to_row_major(rest.reshape(-1, 4, 4)).astype(np.float64)
+
+    matrices = local_matrices(hierarchy, rest, poses, baked)
+
+    action = make_action(armature)
+    frames = np.arange(samples.frame_start, samples.frame_start + len(poses), dtype=np.float32)
+
+    special = set()
+    curves = []
+    reduction = keyframes.Reduction()
+
+    for i, index in enumerate(baked):
+        bone = bones[index]
+
+        # Bones without a parent don't inherit anything, so their inheritance settings don't matter
+        if bone.parent is not None and not has_default_inheritance(bone):
+            special.add(index)
+
+        else:
+            curves.extend(bone_curves(armature.pose.bones[bone.name], matrices[:, i]))
+
+    keyframes.write_curves(action, frames, curves, tolerances, reduction)
+
+    if len(special) != 0:
+        write_special(context, armature, action, hierarchy, samples, frames, special, tolerances, reduction)
+
+    return reduction
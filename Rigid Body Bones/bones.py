@@ -1,7 +1,9 @@
 import bpy
 from math import radians
-from mathutils import Vector, Euler
 from . import utils
+from . import profiler
+from . import pool
+from .transforms import shape_dimensions
 
 
 def is_bone_enabled(data):
@@ -31,6 +33,22 @@ def compound_name(bone, data):
     return "{} - {} [Compound]".format(bone.name, data.name)
 
 
+# Armature property -> suffix for the name of the collection / object
+ARMATURE_NAMES = {
+    "container": "[Container]",
+    "actives": "[Actives]",
+    "passives": "[Passives]",
+    "compounds": "[Compounds]",
+    "origins": "[Origins]",
+    "blanks": "[Blanks]",
+    "constraints": "[Joints]",
+    "root_body": "[Root]",
+}
+
+def armature_name(armature, key):
+    return "{} {}".format(armature.data.name, ARMATURE_NAMES[key])
+
+
 def shape_icon(shape):
     if shape == 'BOX':
         return 'MESH_CUBE'
@@ -57,66 +75,108 @@ def common_settings(object):
     object.display.show_shadows = False
 
 
-def make_active_hitbox(context, armature, collection, bone, data):
-    hitbox = utils.make_mesh_object(
-        name=active_name(bone),
-        collection=collection,
-    )
+def setup_active(hitbox):
+    hitbox.rigid_body.type = 'ACTIVE'
+    hitbox.rigid_body.kinematic = False
 
-    utils.set_parent(hitbox, armature)
 
-    utils.select_active(context, hitbox)
-    bpy.ops.rigidbody.object_add(type='ACTIVE')
+def setup_passive(hitbox):
+    hitbox.rigid_body.type = 'PASSIVE'
+    hitbox.rigid_body.kinematic = True
 
-    common_settings(hitbox)
 
-    return hitbox
+def setup_compound(hitbox):
+    hitbox.rigid_body.type = 'PASSIVE'
 
 
-def make_passive_hitbox(context, armature, collection, bone, data):
-    hitbox = utils.make_mesh_object(
-        name=passive_name(bone),
-        collection=collection,
-    )
+def setup_empty(body):
+    setup_passive(body)
+    body.rigid_body.collision_collections[0] = False
+    update_shape(body, type='BOX')
 
-    utils.set_bone_parent(hitbox, armature, bone.name)
 
-    utils.select_active(context, hitbox)
-    bpy.ops.rigidbody.object_add(type='PASSIVE')
+# Reuses a hitbox from the pool, or creates a new hitbox.
+#
+# The pooled objects have the same kind, so they already have the right settings.
+# The shared mesh is looked up before creating the hitbox, so it doesn't
+# create a mesh which is immediately replaced when the hitbox is aligned.
+def hitbox_mesh(top, bone, data):
+    if top.share_meshes and data.collision_shape != 'COMPOUND':
+        return utils.get_shared_mesh(shape_dimensions(data, bone.length))
 
-    hitbox.rigid_body.kinematic = True
-    common_settings(hitbox)
+    else:
+        return None
+
+
+def make_hitbox(items, name, collection, mesh):
+    hitbox = pool.acquire(items, collection)
+
+    if hitbox is None:
+        hitbox = utils.make_mesh_object(
+            name=name,
+            collection=collection,
+            mesh=mesh,
+        )
+
+        common_settings(hitbox)
+
+    else:
+        update_hitbox_name(hitbox, name)
 
     return hitbox
 
 
-def make_compound_hitbox(context, collection, bone, data):
-    hitbox = utils.make_mesh_object(
-        name=compound_name(bone, data),
-        collection=collection,
-    )
+def make_active_hitbox(rigid_bodies, top, armature, collection, bone, data):
+    hitbox = make_hitbox(top.pool.actives, active_name(bone), collection, hitbox_mesh(top, bone, data))
+
+    utils.set_parent(hitbox, armature)
+
+    # The rigid body is also reused, so it must be reset to the default type
+    rigid_bodies.add_object(hitbox, setup_active)
+
+    return hitbox
 
-    utils.select_active(context, hitbox)
-    bpy.ops.rigidbody.object_add(type='PASSIVE')
 
-    common_settings(hitbox)
+def make_passive_hitbox(rigid_bodies, top, armature, collection, bone, data):
+    hitbox = make_hitbox(top.pool.passives, passive_name(bone), collection, hitbox_mesh(top, bone, data))
+
+    utils.set_bone_parent(hitbox, armature, bone.name)
+
+    rigid_bodies.add_object(hitbox, setup_passive)
 
     return hitbox
 
 
-def make_origin(collection, bone):
-    origin = bpy.data.objects.new(name=origin_name(bone), object_data=None)
-    collection.objects.link(origin)
+def make_compound_hitbox(rigid_bodies, top, collection, bone, data):
+    hitbox = make_hitbox(top.pool.compounds, compound_name(bone, data), collection, hitbox_mesh(top, bone, data))
+
+    rigid_bodies.add_object(hitbox, setup_compound)
+
+    return hitbox
 
-    origin.rotation_euler = (radians(-90.0), 0.0, 0.0)
 
-    common_settings(origin)
-    origin.empty_display_type = 'CIRCLE'
+def make_origin(top, collection, bone):
+    name = origin_name(bone)
+
+    origin = pool.acquire(top.pool.origins, collection)
+
+    if origin is None:
+        origin = bpy.data.objects.new(name=name, object_data=None)
+        profiler.count("objects_created")
+        collection.objects.link(origin)
+
+        origin.rotation_euler = (radians(-90.0), 0.0, 0.0)
+
+        common_settings(origin)
+        origin.empty_display_type = 'CIRCLE'
+
+    else:
+        utils.set_name(origin, name)
 
     return origin
 
 
-def make_empty_rigid_body(context, name, collection, parent, parent_bone):
+def make_empty_rigid_body(rigid_bodies, name, collection, parent, parent_bone):
     body = utils.make_mesh_object(
         name=name,
         collection=collection,
@@ -128,59 +188,71 @@ def make_empty_rigid_body(context, name, collection, parent, parent_bone):
     else:
         utils.set_bone_parent(body, parent, parent_bone)
 
-    utils.select_active(context, body)
-    bpy.ops.rigidbody.object_add(type='PASSIVE')
-
-    body.rigid_body.kinematic = True
-    body.rigid_body.collision_collections[0] = False
+    rigid_bodies.add_object(body, setup_empty)
 
     common_settings(body)
-    update_shape(body, type='BOX')
 
     return body
 
 
-def make_blank_rigid_body(context, armature, collection, bone, data):
-    return make_empty_rigid_body(
-        context,
-        name=blank_name(bone),
-        collection=collection,
-        parent=armature,
-        parent_bone=bone.name,
-    )
+def make_blank_rigid_body(rigid_bodies, top, armature, collection, bone, data):
+    body = pool.acquire(top.pool.blanks, collection)
 
+    if body is None:
+        return make_empty_rigid_body(
+            rigid_bodies,
+            name=blank_name(bone),
+            collection=collection,
+            parent=armature,
+            parent_bone=bone.name,
+        )
 
-def make_constraint(context, armature, collection, bone, data):
-    empty = bpy.data.objects.new(name=constraint_name(bone), object_data=None)
-    collection.objects.link(empty)
+    else:
+        utils.set_name(body, blank_name(bone))
+        utils.set_bone_parent(body, armature, bone.name)
+        rigid_bodies.add_object(body, setup_empty)
+        return body
 
-    utils.set_parent(empty, armature)
 
-    utils.select_active(context, empty)
-    bpy.ops.rigidbody.constraint_add(type='FIXED')
+def make_constraint(rigid_bodies, top, armature, collection, bone, data):
+    name = constraint_name(bone)
+
+    empty = pool.acquire(top.pool.constraints, collection)
+
+    if empty is None:
+        empty = bpy.data.objects.new(name=name, object_data=None)
+        profiler.count("objects_created")
+        collection.objects.link(empty)
+
+        empty.hide_render = True
+        empty.empty_display_size = 0.0
+
+    else:
+        utils.set_name(empty, name)
+
+    utils.set_parent(empty, armature)
 
-    empty.hide_render = True
-    empty.empty_display_size = 0.0
+    rigid_bodies.add_constraint(empty)
 
     return empty
 
 
 def update_shape(object, type):
-    object.rigid_body.collision_shape = type
+    utils.set_property(object.rigid_body, "collision_shape", type)
 
     if type == 'CONVEX_HULL' or type == 'MESH':
-        object.show_bounds = False
-        object.display_type = 'WIRE'
-        object.display_bounds_type = 'BOX'
+        utils.set_property(object, "show_bounds", False)
+        utils.set_property(object, "display_type", 'WIRE')
+        utils.set_property(object, "display_bounds_type", 'BOX')
 
     else:
-        object.show_bounds = True
-        object.display_type = 'BOUNDS'
+        utils.set_property(object, "show_bounds", True)
+        utils.set_property(object, "display_type", 'BOUNDS')
 
         if type == 'COMPOUND':
-            object.display_bounds_type = 'BOX'
+            utils.set_property(object, "display_bounds_type", 'BOX')
         else:
-            object.display_bounds_type = type
+            utils.set_property(object, "display_bounds_type", type)
 
 
 def update_hitbox_shape(object, data):
@@ -195,25 +267,25 @@ def update_hitbox_shape(object, data):
 
 
 def update_rigid_body(rigid_body, data):
-    rigid_body.mass = data.mass
-    rigid_body.friction = data.friction
-    rigid_body.restitution = data.restitution
-    rigid_body.linear_damping = data.linear_damping
-    rigid_body.angular_damping = data.angular_damping
-    rigid_body.use_margin = data.use_margin
-    rigid_body.collision_margin = data.collision_margin
-    rigid_body.collision_collections = data.collision_collections
-    rigid_body.use_deactivation = data.use_deactivation
-    rigid_body.use_start_deactivated = data.use_start_deactivated
-    rigid_body.deactivate_linear_velocity = data.deactivate_linear_velocity
-    rigid_body.deactivate_angular_velocity = data.deactivate_angular_velocity
+    utils.set_property(rigid_body, "mass", data.mass)
+    utils.set_property(rigid_body, "friction", data.friction)
+    utils.set_property(rigid_body, "restitution", data.restitution)
+    utils.set_property(rigid_body, "linear_damping", data.linear_damping)
+    utils.set_property(rigid_body, "angular_damping", data.angular_damping)
+    utils.set_property(rigid_body, "use_margin", data.use_margin)
+    utils.set_property(rigid_body, "collision_margin", data.collision_margin)
+    utils.set_property(rigid_body, "collision_collections", data.collision_collections)
+    utils.set_property(rigid_body, "use_deactivation", data.use_deactivation)
+    utils.set_property(rigid_body, "use_start_deactivated", data.use_start_deactivated)
+    utils.set_property(rigid_body, "deactivate_linear_velocity", data.deactivate_linear_velocity)
+    utils.set_property(rigid_body, "deactivate_angular_velocity", data.deactivate_angular_velocity)
 
     if data.collision_shape == 'COMPOUND':
         for compound in data.compounds:
             compound_body = compound.hitbox.rigid_body
 
-            compound_body.use_margin = compound.use_margin
-            compound_body.collision_margin = compound.collision_margin
+            utils.set_property(compound_body, "use_margin", compound.use_margin)
+            utils.set_property(compound_body, "collision_margin", compound.collision_margin)
 
 
 def is_spring(data):
@@ -228,188 +300,134 @@ def is_spring(data):
 
 def update_constraint(constraint, data):
     if is_spring(data):
-        constraint.type = 'GENERIC_SPRING'
+        utils.set_property(constraint, "type", 'GENERIC_SPRING')
     else:
-        constraint.type = 'GENERIC'
-
-    constraint.disable_collisions = data.disable_collisions
-    constraint.use_breaking = data.use_breaking
-    constraint.breaking_threshold = data.breaking_threshold
-    constraint.use_override_solver_iterations = data.use_override_solver_iterations
-    constraint.solver_iterations = data.solver_iterations
-
-    constraint.use_spring_ang_x = data.use_spring_ang_x
-    constraint.use_spring_ang_y = data.use_spring_ang_y
-    constraint.use_spring_ang_z = data.use_spring_ang_z
-    constraint.spring_stiffness_ang_x = data.spring_stiffness_ang_x
-    constraint.spring_stiffness_ang_y = data.spring_stiffness_ang_y
-    constraint.spring_stiffness_ang_z = data.spring_stiffness_ang_z
-    constraint.spring_damping_ang_x = data.spring_damping_ang_x
-    constraint.spring_damping_ang_y = data.spring_damping_ang_y
-    constraint.spring_damping_ang_z = data.spring_damping_ang_z
-
-    constraint.use_spring_x = data.use_spring_x
-    constraint.use_spring_y = data.use_spring_y
-    constraint.use_spring_z = data.use_spring_z
-    constraint.spring_stiffness_x = data.spring_stiffness_x
-    constraint.spring_stiffness_y = data.spring_stiffness_y
-    constraint.spring_stiffness_z = data.spring_stiffness_z
-    constraint.spring_damping_x = data.spring_damping_x
-    constraint.spring_damping_y = data.spring_damping_y
-    constraint.spring_damping_z = data.spring_damping_z
-
-    constraint.use_limit_lin_x = data.use_limit_lin_x
-    constraint.use_limit_lin_y = data.use_limit_lin_y
-    constraint.use_limit_lin_z = data.use_limit_lin_z
-    constraint.use_limit_ang_x = data.use_limit_ang_x
-    constraint.use_limit_ang_y = data.use_limit_ang_y
-    constraint.use_limit_ang_z = data.use_limit_ang_z
-
-    constraint.limit_lin_x_lower = data.limit_lin_x_lower
-    constraint.limit_lin_y_lower = data.limit_lin_y_lower
-    constraint.limit_lin_z_lower = data.limit_lin_z_lower
-    constraint.limit_lin_x_upper = data.limit_lin_x_upper
-    constraint.limit_lin_y_upper = data.limit_lin_y_upper
-    constraint.limit_lin_z_upper = data.limit_lin_z_upper
+        utils.set_property(constraint, "type", 'GENERIC')
+
+    utils.set_property(constraint, "disable_collisions", data.disable_collisions)
+    utils.set_property(constraint, "use_breaking", data.use_breaking)
+    utils.set_property(constraint, "breaking_threshold", data.breaking_threshold)
+    utils.set_property(constraint, "use_override_solver_iterations", data.use_override_solver_iterations)
+    utils.set_property(constraint, "solver_iterations", data.solver_iterations)
+
+    utils.set_property(constraint, "use_spring_ang_x", data.use_spring_ang_x)
+    utils.set_property(constraint, "use_spring_ang_y", data.use_spring_ang_y)
+    utils.set_property(constraint, "use_spring_ang_z", data.use_spring_ang_z)
+    utils.set_property(constraint, "spring_stiffness_ang_x", data.spring_stiffness_ang_x)
+    utils.set_property(constraint, "spring_stiffness_ang_y", data.spring_stiffness_ang_y)
+    utils.set_property(constraint, "spring_stiffness_ang_z", data.spring_stiffness_ang_z)
+    utils.set_property(constraint, "spring_damping_ang_x", data.spring_damping_ang_x)
+    utils.set_property(constraint, "spring_damping_ang_y", data.spring_damping_ang_y)
+    utils.set_property(constraint, "spring_damping_ang_z", data.spring_damping_ang_z)
+
+    utils.set_property(constraint, "use_spring_x", data.use_spring_x)
+    utils.set_property(constraint, "use_spring_y", data.use_spring_y)
+    utils.set_property(constraint, "use_spring_z", data.use_spring_z)
+    utils.set_property(constraint, "spring_stiffness_x", data.spring_stiffness_x)
+    utils.set_property(constraint, "spring_stiffness_y", data.spring_stiffness_y)
+    utils.set_property(constraint, "spring_stiffness_z", data.spring_stiffness_z)
+    utils.set_property(constraint, "spring_damping_x", data.spring_damping_x)
+    utils.set_property(constraint, "spring_damping_y", data.spring_damping_y)
+    utils.set_property(constraint, "spring_damping_z", data.spring_damping_z)
+
+    utils.set_property(constraint, "use_limit_lin_x", data.use_limit_lin_x)
+    utils.set_property(constraint, "use_limit_lin_y", data.use_limit_lin_y)
+    utils.set_property(constraint, "use_limit_lin_z", data.use_limit_lin_z)
+    utils.set_property(constraint, "use_limit_ang_x", data.use_limit_ang_x)
+    utils.set_property(constraint, "use_limit_ang_y", data.use_limit_ang_y)
+    utils.set_property(constraint, "use_limit_ang_z", data.use_limit_ang_z)
+
+    utils.set_property(constraint, "limit_lin_x_lower", data.limit_lin_x_lower)
+    utils.set_property(constraint, "limit_lin_y_lower", data.limit_lin_y_lower)
+    utils.set_property(constraint, "limit_lin_z_lower", data.limit_lin_z_lower)
+    utils.set_property(constraint, "limit_lin_x_upper", data.limit_lin_x_upper)
+    utils.set_property(constraint, "limit_lin_y_upper", data.limit_lin_y_upper)
+    utils.set_property(constraint, "limit_lin_z_upper", data.limit_lin_z_upper)
 
     # For some strange reason, Blender flips the min/max for the angular limits
-    constraint.limit_ang_x_lower = -data.limit_ang_x_upper
-    constraint.limit_ang_x_upper = -data.limit_ang_x_lower
+    utils.set_property(constraint, "limit_ang_x_lower", -data.limit_ang_x_upper)
+    utils.set_property(constraint, "limit_ang_x_upper", -data.limit_ang_x_lower)
 
-    constraint.limit_ang_y_lower = -data.limit_ang_y_upper
-    constraint.limit_ang_y_upper = -data.limit_ang_y_lower
+    utils.set_property(constraint, "limit_ang_y_lower", -data.limit_ang_y_upper)
+    utils.set_property(constraint, "limit_ang_y_upper", -data.limit_ang_y_lower)
 
-    constraint.limit_ang_z_lower = -data.limit_ang_z_upper
-    constraint.limit_ang_z_upper = -data.limit_ang_z_lower
+    utils.set_property(constraint, "limit_ang_z_lower", -data.limit_ang_z_upper)
+    utils.set_property(constraint, "limit_ang_z_upper", -data.limit_ang_z_lower)
 
 
-def align_constraint(constraint, bone):
-    constraint.location = bone.head_local
-    constraint.rotation_euler = bone.matrix_local.to_euler()
+def align_constraint(constraint, transforms, index):
+    utils.set_property(constraint, "location", transforms.joint_location[index])
+    utils.set_property(constraint, "rotation_euler", transforms.joint_rotation[index])
 
 
-def scale(data, shape):
-    if shape == 'BOX':
-        return data.scale
-    elif shape == 'SPHERE':
-        return Vector((data.scale_diameter, data.scale_diameter, data.scale_diameter))
-    else:
-        return Vector((data.scale_width, data.scale_length, data.scale_width))
-
-def scale_y(data, shape):
-    if shape == 'BOX':
-        return data.scale.y
-    elif shape == 'SPHERE':
-        return data.scale_diameter
-    else:
-        return data.scale_length
-
-
-# TODO this is called with both Bone and Compound properties
-def hitbox_dimensions(bone, data, shape):
-    dimensions = scale(data, shape) * bone.length
-    dimensions.rotate(Euler((radians(90.0), 0.0, 0.0)))
-    return dimensions
+def align_compound(hitbox, transforms, index, share_meshes):
+    utils.set_property(hitbox, "location", transforms.compound_location[index])
+    utils.set_property(hitbox, "rotation_euler", transforms.compound_rotation[index])
 
+    utils.set_hitbox_mesh(hitbox, transforms.compound_dimensions[index], share_meshes)
 
-# TODO this is called with both Bone and Compound properties
-def hitbox_location(bone, data, shape):
-    length = bone.length
-    origin = length * (data.origin - 0.5)
 
-    location = Vector((0.0, -origin * scale_y(data, shape), 0.0))
-    location.rotate(data.rotation)
+def align_hitbox(hitbox, data, transforms, index, share_meshes):
+    utils.set_property(hitbox, "location", transforms.hitbox_location[index])
+    utils.set_property(hitbox, "rotation_euler", transforms.hitbox_rotation[index])
 
-    location.y += origin - (length * 0.5)
-    location += data.location
-    return location
-
-
-# TODO this is called with both Bone and Compound properties
-def passive_rotation(data):
-    rotation = Euler((radians(90.0), 0.0, 0.0))
-    rotation.rotate(data.rotation)
-    return rotation
+    if data.collision_shape == 'COMPOUND':
+        utils.clear_mesh(utils.own_mesh(hitbox))
 
+        start = transforms.compound_start[index]
 
-def hitbox_rotation(bone, data):
-    if is_bone_active(data):
-        rotation = data.rotation.copy()
-        rotation.rotate(bone.matrix_local.to_euler())
-        rotation.rotate_axis('X', radians(90.0))
-        return rotation
+        for i, compound in enumerate(data.compounds):
+            assert compound.hitbox is not None
+            align_compound(compound.hitbox, transforms, start + i, share_meshes)
 
     else:
-        return passive_rotation(data)
-
+        utils.set_hitbox_mesh(hitbox, transforms.hitbox_dimensions[index], share_meshes)
 
-def hitbox_origin(bone, data):
-    return Vector((0.0, bone.length * (data.origin - 1.0), 0.0))
 
+def align_origin(origin, transforms, index):
+    utils.set_property(origin, "empty_display_size", transforms.origin_size[index])
+    utils.set_property(origin, "location", transforms.origin_location[index])
 
-def align_compound(hitbox, bone, data, compound):
-    shape = compound.collision_shape
 
-    location = hitbox_location(bone, compound, shape)
-    location -= hitbox_origin(bone, data)
-    location.rotate(Euler((radians(-90.0), 0.0, 0.0)))
-    hitbox.location = location
-
-    rotation = passive_rotation(compound)
-    rotation.rotate(Euler((radians(-90.0), 0.0, 0.0)))
-    hitbox.rotation_euler = rotation
-
-    utils.set_mesh_cube(hitbox.data, hitbox_dimensions(bone, compound, shape))
-
-
-def align_hitbox(hitbox, bone, data):
-    hitbox.rotation_euler = hitbox_rotation(bone, data)
-
-    shape = data.collision_shape
-
-    if shape == 'COMPOUND':
-        location = hitbox_origin(bone, data)
-        location += data.location
-
-        if is_bone_active(data):
-            location.rotate(bone.matrix_local.to_euler())
-            location += bone.tail_local
-
-        hitbox.location = location
-
-        utils.clear_mesh(hitbox.data)
+def update_hitbox_name(hitbox, name):
+    utils.set_name(hitbox, name)
 
-        for compound in data.compounds:
-            assert compound.hitbox is not None
-            align_compound(compound.hitbox, bone, data, compound)
+    if not utils.is_shared_mesh(hitbox.data):
+        utils.set_name(hitbox.data, name)
 
-    else:
-        location = hitbox_location(bone, data, shape)
 
-        if is_bone_active(data):
-            location.rotate(bone.matrix_local.to_euler())
-            location += bone.tail_local
+# This is faster than an update, because it only renames the objects
+# for bones which have been renamed.
+def rename_objects(bone, data):
+    if data.active:
+        update_hitbox_name(data.active, active_name(bone))
 
-        hitbox.location = location
+    if data.passive:
+        update_hitbox_name(data.passive, passive_name(bone))
 
-        utils.set_mesh_cube(hitbox.data, hitbox_dimensions(bone, data, shape))
+    if data.origin_empty:
+        utils.set_name(data.origin_empty, origin_name(bone))
 
+    if data.blank:
+        utils.set_name(data.blank, blank_name(bone))
 
-def align_origin(origin, bone, data):
-    origin.empty_display_size = bone.length * 0.05
+    if data.constraint:
+        utils.set_name(data.constraint, constraint_name(bone))
 
-    shape = data.collision_shape
+    for compound in data.compounds:
+        if compound.hitbox:
+            update_hitbox_name(compound.hitbox, compound_name(bone, compound))
 
-    if shape == 'COMPOUND':
-        origin.location = (0.0, 0.0, 0.0)
 
-    else:
-        origin.location = (0.0, 0.0, (bone.length * (0.5 - data.origin)) * scale_y(data, shape))
+def rename_armature_objects(armature, top):
+    for key in ARMATURE_NAMES:
+        value = getattr(top, key)
 
+        if value:
+            utils.set_name(value, armature_name(armature, key))
 
-def update_hitbox_name(hitbox, name):
-    hitbox.name = name
-    hitbox.data.name = name
+    for bone in armature.data.bones:
+        rename_objects(bone, bone.rigid_body_bones)
 
 
 def get_hitbox(data):
@@ -423,34 +441,35 @@ def get_hitbox(data):
         return None
 
 
-def remove_active(data):
+# The objects are moved into the armature's pool, so they can be reused later
+def remove_active(top, data):
     if data.active:
-        utils.remove_object(data.active)
+        pool.release(top.pool.actives, data.active)
         data.property_unset("active")
 
-def remove_passive(data):
+def remove_passive(top, data):
     if data.passive:
-        utils.remove_object(data.passive)
+        pool.release(top.pool.passives, data.passive)
         data.property_unset("passive")
 
-def remove_compound(data):
+def remove_compound(top, data):
     if data.hitbox:
-        utils.remove_object(data.hitbox)
+        pool.release(top.pool.compounds, data.hitbox)
         data.property_unset("hitbox")
 
-def remove_origin(data):
+def remove_origin(top, data):
     if data.origin_empty:
-        utils.remove_object(data.origin_empty)
+        pool.release(top.pool.origins, data.origin_empty)
         data.property_unset("origin_empty")
 
-def remove_blank(data):
+def remove_blank(top, data):
     if data.blank:
-        utils.remove_object(data.blank)
+        pool.release(top.pool.blanks, data.blank)
         data.property_unset("blank")
 
-def remove_constraint(data):
+def remove_constraint(top, data):
     if data.constraint:
-        utils.remove_object(data.constraint)
+        pool.release(top.pool.constraints, data.constraint)
         data.property_unset("constraint")
 
 
@@ -494,6 +513,10 @@ def delete_parent(data):
     data.property_unset("use_connect")
 
 
+def has_pose_constraint(pose_bone):
+    return pose_bone.constraints.get("Rigid Body Bones [Child Of]") is not None
+
+
 def remove_pose_constraint(pose_bone):
     constraint = pose_bone.constraints.get("Rigid Body Bones [Child Of]")
 
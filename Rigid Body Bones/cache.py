@@ -0,0 +1,680 @@
+import bpy
+import os
+import struct
+import hashlib
+import tempfile
+import numpy as np
+from . import utils
+from . import topology
+from . import bake
+from . import bones
+
+
+# The file starts with a header, followed by the pose matrices
+# (frames, bones, 4, 4) as float32, in armature space and column major.
+#
+# The matrices are in armature space so that they don't depend on the bone
+# parents, which are restored when the physics is disabled.
+MAGIC = b"RBBCACHE"
+VERSION = 1
+
+# magic, version, frame_start, frames, bones, settings hash, size of the names
+HEADER = struct.Struct("<8sIiII20sI")
+
+# The matrices start at a multiple of this, so they are aligned in memory
+ALIGNMENT = 64
+
+# Bone properties which don't change the simulation
+IGNORED_BONE_PROPERTIES = {
+    "active", "passive", "origin_empty", "blank", "constraint", "error",
+    "name", "parent", "use_connect", "is_hidden", "compounds", "active_compound_index",
+}
+
+IGNORED_COMPOUND_PROPERTIES = {"hitbox", "name"}
+
+# Armature key -> Player
+players = {}
+
+# Keys of the armatures whose last bake used the bake cache, so scripts
+# (e.g. bake_batch.py) don't need to calculate the hash again to find out
+cached_bakes = set()
+
+
+def property_names(cls, ignored):
+    names = []
+
+    for base in reversed(cls.__mro__):
+        for name in base.__dict__.get("__annotations__", {}):
+            if name not in ignored and name not in names:
+                names.append(name)
+
+    return names
+
+
+def hash_value(hasher, value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        hasher.update(repr(value).encode("utf-8"))
+
+    else:
+        hasher.update(repr(tuple(value)).encode("utf-8"))
+
+
+def hash_matrix(hasher, matrix):
+    hash_value(hasher, np.array(matrix, dtype=np.float32).ravel().tolist())
+
+
+# Transform channels which are used when they aren't animated. The animated
+# channels change on every frame, so they're hashed from the F-Curves instead.
+OBJECT_CHANNELS = (
+    "location", "rotation_mode", "rotation_euler", "rotation_quaternion", "rotation_axis_angle", "scale",
+    "delta_location", "delta_rotation_euler", "delta_rotation_quaternion", "delta_scale",
+)
+
+POSE_BONE_CHANNELS = ("location", "rotation_mode", "rotation_euler", "rotation_quaternion", "rotation_axis_angle", "scale")
+
+NLA_STRIP_PROPERTIES = (
+    "mute", "frame_start", "frame_end", "action_frame_start", "action_frame_end", "blend_type",
+    "extrapolation", "influence", "use_animated_influence", "repeat", "scale", "use_reverse", "blend_in", "blend_out",
+)
+
+RIGID_BODY_PROPERTIES = (
+    "type", "enabled", "kinematic", "mass", "friction", "restitution", "linear_damping", "angular_damping",
+    "use_margin", "collision_margin", "collision_collections", "collision_shape", "mesh_source",
+    "use_deactivation", "use_start_deactivated", "deactivate_linear_velocity", "deactivate_angular_velocity",
+)
+
+EFFECTOR_WEIGHTS = (
+    "all", "gravity", "force", "vortex", "magnetic", "wind", "curve_guide", "texture", "harmonic",
+    "charge", "lennardjones", "turbulence", "drag", "boid", "smokeflow",
+)
+
+
+def hash_frames(scene, frame_start, frame_end):
+    # The simulation starts at the start of the rigid body cache, see bake.step_frames
+    first = min(frame_start, scene.rigidbody_world.point_cache.frame_start)
+    return range(first, frame_end + 1)
+
+
+def hash_name(hasher, id):
+    hash_value(hasher, None if id is None else id.name)
+
+
+def animated_paths(animation_data):
+    paths = set()
+
+    if animation_data is not None:
+        actions = [animation_data.action] + [strip.action for track in animation_data.nla_tracks for strip in track.strips]
+
+        for action in actions:
+            if action is not None:
+                paths.update(fcurve.data_path for fcurve in action.fcurves)
+
+        paths.update(fcurve.data_path for fcurve in animation_data.drivers)
+
+    return paths
+
+
+# The F-Curves are evaluated on every simulated frame, so this includes the
+# interpolation, handles, extrapolation and modifiers.
+def hash_action(hasher, action, frames):
+    hash_name(hasher, action)
+
+    if action is not None:
+        for fcurve in sorted(action.fcurves, key=lambda fcurve: (fcurve.data_path, fcurve.array_index)):
+            hasher.update(fcurve.data_path.encode("utf-8"))
+            hash_value(hasher, fcurve.array_index)
+            hash_value(hasher, fcurve.mute)
+
+            values = np.array([fcurve.evaluate(frame) for frame in frames], dtype=np.float32)
+            hasher.update(values.tobytes())
+
+
+# The values of the driver variables are not included, only how they are read
+def hash_driver(hasher, fcurve):
+    hasher.update(fcurve.data_path.encode("utf-8"))
+    hash_value(hasher, fcurve.array_index)
+    hash_value(hasher, fcurve.mute)
+
+    points = fcurve.keyframe_points
+    co = np.empty(len(points) * 2, dtype=np.float32)
+    points.foreach_get("co", co)
+    hasher.update(co.tobytes())
+
+    for modifier in fcurve.modifiers:
+        hash_value(hasher, modifier.type)
+        hash_value(hasher, modifier.mute)
+
+    driver = fcurve.driver
+
+    hash_value(hasher, driver.type)
+    hash_value(hasher, driver.expression)
+
+    for variable in driver.variables:
+        hash_value(hasher, variable.name)
+        hash_value(hasher, variable.type)
+
+        for target in variable.targets:
+            hash_name(hasher, target.id)
+
+            for property in ("data_path", "bone_target", "transform_type", "transform_space", "rotation_mode"):
+                hash_value(hasher, getattr(target, property))
+
+
+def hash_animation(hasher, animation_data, frames):
+    if animation_data is None:
+        hash_value(hasher, None)
+        return
+
+    for property in ("use_nla", "action_blend_type", "action_influence", "action_extrapolation"):
+        hash_value(hasher, getattr(animation_data, property))
+
+    hash_action(hasher, animation_data.action, frames)
+
+    for track in animation_data.nla_tracks:
+        hash_value(hasher, track.name)
+        hash_value(hasher, track.mute)
+        hash_value(hasher, track.is_solo)
+
+        for strip in track.strips:
+            for property in NLA_STRIP_PROPERTIES:
+                hash_value(hasher, getattr(strip, property))
+
+            hash_action(hasher, strip.action, frames)
+
+    for fcurve in sorted(animation_data.drivers, key=lambda fcurve: (fcurve.data_path, fcurve.array_index)):
+        hash_driver(hasher, fcurve)
+
+
+def hash_channels(hasher, struct, channels, animated):
+    for channel in channels:
+        if struct.path_from_id(channel) not in animated:
+            hash_value(hasher, getattr(struct, channel))
+
+
+def hash_constraints(hasher, constraints, frames, seen):
+    for constraint in constraints:
+        # This is added by the physics, so it doesn't exist while playing from the cache
+        if constraint.name == "Rigid Body Bones [Child Of]":
+            continue
+
+        hash_value(hasher, constraint.type)
+        hash_value(hasher, constraint.name)
+        hash_value(hasher, constraint.mute)
+        hash_value(hasher, constraint.influence)
+        hash_value(hasher, getattr(constraint, "subtarget", None))
+        hash_object(hasher, getattr(constraint, "target", None), frames, seen)
+
+
+# The Active bones are moved by the simulation (or by the cache), so their pose is not included
+def hash_pose(hasher, armature, animated, frames, seen):
+    pose_bones = armature.pose.bones
+
+    for name in sorted(pose_bones.keys()):
+        pose_bone = pose_bones[name]
+
+        hasher.update(name.encode("utf-8"))
+        hash_matrix(hasher, pose_bone.bone.matrix_local)
+
+        if not bones.is_bone_active(pose_bone.bone.rigid_body_bones):
+            hash_channels(hasher, pose_bone, POSE_BONE_CHANNELS, animated)
+            hash_constraints(hasher, pose_bone.constraints, frames, seen)
+
+
+# Hash of the animated transform of an object, including its parents and constraint targets
+def hash_object(hasher, object, frames, seen):
+    hash_name(hasher, object)
+
+    if object is None or object.name in seen:
+        return
+
+    seen.add(object.name)
+
+    animation_data = object.animation_data
+    animated = animated_paths(animation_data)
+
+    hash_animation(hasher, animation_data, frames)
+    hash_channels(hasher, object, OBJECT_CHANNELS, animated)
+
+    hash_value(hasher, object.parent_type)
+    hash_value(hasher, object.parent_bone)
+    hash_matrix(hasher, object.matrix_parent_inverse)
+    hash_object(hasher, object.parent, frames, seen)
+
+    hash_constraints(hasher, object.constraints, frames, seen)
+
+    if object.type == 'ARMATURE':
+        hash_pose(hasher, object, animated, frames, seen)
+
+
+# The other rigid bodies in the world can collide with the armature. The
+# hitboxes of this armature only exist while the physics is enabled, so they
+# are skipped.
+def hash_rigid_bodies(hasher, world, armature, frames, seen):
+    hitboxes = set()
+
+    for bone in armature.data.bones:
+        data = bone.rigid_body_bones
+        hitboxes.update(hitbox.name for hitbox in (data.active, data.passive) if hitbox is not None)
+        hitboxes.update(compound.hitbox.name for compound in data.compounds if compound.hitbox is not None)
+
+    collection = world.collection
+    hash_name(hasher, collection)
+
+    if collection is None:
+        return
+
+    for object in sorted(collection.all_objects, key=lambda object: object.name):
+        if object.name in hitboxes or object.rigid_body is None:
+            continue
+
+        for property in RIGID_BODY_PROPERTIES:
+            hash_value(hasher, getattr(object.rigid_body, property))
+
+        # Modifiers and shape keys are not included
+        if object.type == 'MESH':
+            vertices = object.data.vertices
+            co = np.empty(len(vertices) * 3, dtype=np.float32)
+            vertices.foreach_get("co", co)
+            hasher.update(co.tobytes())
+
+        hash_object(hasher, object, frames, seen)
+
+
+# Hash of everything which affects the simulation of the armature from the
+# start of the rigid body cache until frame_end. If it changes, the cache must
+# be recorded again.
+#
+# This doesn't include force fields, the values of driver variables, the
+# modifiers of the other rigid bodies, or the rigid body constraints of other
+# armatures, see README.md.
+#
+# The bones are sorted by name, because leaving Edit mode can change their order.
+def settings_hash(scene, armature, frame_start, frame_end):
+    from .properties import Bone, Compound
+
+    hasher = hashlib.sha1()
+
+    world = scene.rigidbody_world
+
+    for value in (
+        world.time_scale,
+        world.substeps_per_frame,
+        world.solver_iterations,
+        world.use_split_impulse,
+        world.point_cache.frame_start,
+        scene.use_gravity,
+        scene.gravity,
+    ):
+        hash_value(hasher, value)
+
+    weights = world.effector_weights
+
+    for property in EFFECTOR_WEIGHTS:
+        hash_value(hasher, getattr(weights, property))
+
+    hash_name(hasher, weights.collection)
+
+    bone_properties = property_names(Bone, IGNORED_BONE_PROPERTIES)
+    compound_properties = property_names(Compound, IGNORED_COMPOUND_PROPERTIES)
+
+    armature_bones = armature.data.bones
+
+    for name in sorted(armature_bones.keys()):
+        data = armature_bones[name].rigid_body_bones
+
+        hasher.update(name.encode("utf-8"))
+
+        for property in bone_properties:
+            hash_value(hasher, getattr(data, property))
+
+        for compound in data.compounds:
+            for property in compound_properties:
+                hash_value(hasher, getattr(compound, property))
+
+    frames = hash_frames(scene, frame_start, frame_end)
+    seen = set()
+
+    # The armature's transform, rest pose, and the animation of the Passive bones
+    hash_object(hasher, armature, frames, seen)
+
+    hash_rigid_bodies(hasher, world, armature, frames, seen)
+
+    return hasher.digest()
+
+
+def file_path(armature):
+    top = armature.data.rigid_body_bones
+
+    if top.cache_file == "":
+        path = "//{}.rbbcache".format(bpy.path.clean_name(armature.name))
+
+    else:
+        path = top.cache_file
+
+    return bpy.path.abspath(path)
+
+
+def data_offset(names_size, bones):
+    size = HEADER.size + names_size + bones
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Simulates the frames and writes them into the file, returns the number of simulated bones.
+#
+# The frames are written straight into the memory mapped file, so long
+# simulations don't need to fit in memory.
+def record(context, armature, path, frame_start, frame_end, progress, hash=None):
+    simulated = set(bake.simulated_bones(armature))
+
+    if len(simulated) == 0:
+        return 0
+
+    # The old file might still be mapped
+    forget(armature)
+
+    if hash is None:
+        hash = settings_hash(context.scene, armature, frame_start, frame_end)
+
+    names = armature.pose.bones.keys()
+    frames = frame_end - frame_start + 1
+
+    encoded_names = "\0".join(names).encode("utf-8")
+    flags = bytes(1 if name in simulated else 0 for name in names)
+    offset = data_offset(len(encoded_names), len(names))
+
+    # The file is only replaced after every frame was written, so a cancelled
+    # recording doesn't leave a broken cache. Other Blender processes might
+    # record the same bake cache file at the same time.
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, frame_start, frames, len(names), hash, len(encoded_names)))
+        file.write(encoded_names)
+        file.write(flags)
+        file.truncate(offset + frames * len(names) * 16 * 4)
+
+    try:
+        samples = np.memmap(temporary, dtype=np.float32, mode="r+", offset=offset, shape=(frames, len(names) * 16))
+        bake.step_frames(context, armature, frame_start, frame_end, samples, progress)
+        samples.flush()
+        del samples
+
+    except:
+        os.remove(temporary)
+        raise
+
+    os.replace(temporary, path)
+
+    return len(simulated)
+
+
+def read_header(path):
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+
+        if len(header) != HEADER.size:
+            return None
+
+        magic, version, frame_start, frames, bones, hash, names_size = HEADER.unpack(header)
+
+        if magic != MAGIC or version != VERSION:
+            return None
+
+        names = file.read(names_size).decode("utf-8").split("\0")
+        flags = file.read(bones)
+
+    return (frame_start, frames, names, flags, hash, data_offset(names_size, bones))
+
+
+def map_samples(path, header):
+    frame_start, frames, names, flags, hash, offset = header
+    return np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(frames, len(names) * 16))
+
+
+# Plays back a cache file, the frames are only read from the disk when they are used.
+class Player:
+    def __init__(self, path, header):
+        frame_start, frames, names, flags, hash, offset = header
+
+        self.frame_start = frame_start
+        self.frames = frames
+        self.hash = hash
+
+        # Bone names, in the same order as the cached matrices
+        self.names = names
+
+        self.simulated = [name for name, flag in zip(names, flags) if flag]
+
+        self.samples = map_samples(path, header)
+
+        # The bone data is only recalculated when the topology changes
+        self.topology = None
+
+
+    def prepare(self, armature, hierarchy):
+        bones = armature.data.bones
+
+        indexes = {name: i for i, name in enumerate(self.names)}
+
+        # Index of the cached matrix for each bone, in the same order as armature.data.bones
+        self.order = [indexes[name] for name in hierarchy.names]
+
+        self.baked = [hierarchy.indexes[name] for name in self.simulated]
+
+        # Index of each simulated bone in armature.pose.bones
+        pose_indexes = {name: i for i, name in enumerate(armature.pose.bones.keys())}
+        self.pose_indexes = [pose_indexes[name] for name in self.simulated]
+
+        rest = np.empty(len(bones) * 16, dtype=np.float32)
+        bones.foreach_get("matrix_local", rest)
+        self.rest = bake.to_row_major(rest.reshape(-1, 4, 4)).astype(np.float64)
+
+        self.basis = np.empty(len(bones) * 16, dtype=np.float32)
+
+        self.topology = hierarchy
+
+
+    def apply(self, armature, frame):
+        index = frame - self.frame_start
+
+        if index < 0 or index >= self.frames:
+            return
+
+        hierarchy = topology.get(armature)
+
+        if hierarchy is not self.topology:
+            self.prepare(armature, hierarchy)
+
+        poses = bake.to_row_major(np.asarray(self.samples[index]).reshape(-1, 4, 4))[self.order].astype(np.float64)
+
+        # This uses the default inheritance for every bone, see bake.has_default_inheritance
+        local = bake.local_matrices(hierarchy, self.rest, poses[None], self.baked)[0]
+
+        pose_bones = armature.pose.bones
+        pose_bones.foreach_get("matrix_basis", self.basis)
+
+        basis = self.basis.reshape(-1, 4, 4)
+        basis[self.pose_indexes] = bake.to_row_major(local)
+
+        pose_bones.foreach_set("matrix_basis", self.basis)
+        armature.update_tag()
+
+
+# Returns None if the cache doesn't exist or if it's out of date.
+#
+# This calculates the settings hash, which is slow, so it isn't called by the
+# frame change handler, see check_players.
+def get_player(scene, armature):
+    key = utils.armature_key(armature)
+
+    if key in players:
+        return players[key]
+
+    player = None
+    path = file_path(armature)
+
+    if os.path.exists(path):
+        header = read_header(path)
+
+        if header is not None and header[4] == settings_hash(scene, armature, header[0], header[0] + header[1] - 1):
+            player = Player(path, header)
+
+    # Out of date caches are also remembered, so the hash isn't calculated on every frame
+    players[key] = player
+
+    return player
+
+
+def is_playing(armature):
+    top = armature.data.rigid_body_bones
+    return top.cache_playback and not top.enabled
+
+
+# Checks the caches which were forgotten, and shows the cached pose of the current frame
+def check_players():
+    scene = bpy.context.scene
+
+    for armature in scene.objects:
+        if armature.type == 'ARMATURE' and is_playing(armature) and utils.armature_key(armature) not in players:
+            player = get_player(scene, armature)
+
+            if player is not None:
+                player.apply(armature, scene.frame_current)
+
+    return None
+
+
+# The caches are checked in the next main event tick instead of when the next
+# frame is played, so playback doesn't stall after the settings change.
+def schedule_check():
+    if not bpy.app.timers.is_registered(check_players):
+        bpy.app.timers.register(check_players)
+
+
+# This must be called when the cache file or the armature settings change
+def forget(armature):
+    players.pop(utils.armature_key(armature), None)
+
+    if not bpy.app.background:
+        schedule_check()
+
+
+def clear():
+    players.clear()
+    cached_bakes.clear()
+
+
+# Sets the pose before the frame is evaluated, so the cached pose is drawn on the same frame.
+#
+# The armatures which play from the cache don't have rigid bodies, so Bullet doesn't step them.
+#
+# In background mode timers don't run, so the cache is checked here.
+def play(scene):
+    for armature in scene.objects:
+        if armature.type == 'ARMATURE' and is_playing(armature):
+            key = utils.armature_key(armature)
+
+            if bpy.app.background:
+                player = get_player(scene, armature)
+
+            elif key in players:
+                player = players[key]
+
+            else:
+                # e.g. after undo or loading a file
+                schedule_check()
+                player = None
+
+            if player is not None:
+                player.apply(armature, scene.frame_current)
+
+
+# The bake cache is shared by every .blend file, so a rig and shot which
+# didn't change are never simulated twice. The files are named after the
+# hash of everything which the simulation depends on.
+def bake_directory():
+    return os.environ.get("RIGID_BODY_BONES_CACHE", os.path.join(tempfile.gettempdir(), "rigid_body_bones"))
+
+
+# Maximum total size of the bake cache, in bytes
+def bake_limit():
+    return int(float(os.environ.get("RIGID_BODY_BONES_CACHE_SIZE", "2048")) * 1024 * 1024)
+
+
+def bake_path(hash, frame_start, frame_end):
+    hasher = hashlib.sha1(hash)
+    hasher.update(struct.pack("<Iii", VERSION, frame_start, frame_end))
+    return os.path.join(bake_directory(), hasher.hexdigest() + ".rbbcache")
+
+
+def load_samples(path):
+    header = read_header(path)
+
+    if header is None:
+        return None
+
+    frame_start, frames, names, flags, hash, offset = header
+
+    poses = bake.to_row_major(map_samples(path, header).reshape(frames, len(names), 4, 4))
+    simulated = [name for name, flag in zip(names, flags) if flag]
+    indexes = {name: i for i, name in enumerate(names)}
+
+    return bake.Samples(simulated, frame_start, poses, indexes)
+
+
+# Removes the least recently used files until the cache is small enough
+def evict_bakes(directory, limit):
+    files = []
+
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".rbbcache"):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    files.sort()
+
+    total = sum(size for _, size, _ in files)
+
+    for _, size, path in files:
+        if total <= limit:
+            break
+
+        # The file can be in use by another process
+        try:
+            os.remove(path)
+            total -= size
+
+        except OSError:
+            pass
+
+
+# Returns (samples, whether they came from the cache), samples is None if there are no Active bones
+def bake_samples(context, armature, frame_start, frame_end, progress):
+    key = utils.armature_key(armature)
+    cached_bakes.discard(key)
+
+    # The hash is slow, so it is only calculated once
+    hash = settings_hash(context.scene, armature, frame_start, frame_end)
+    path = bake_path(hash, frame_start, frame_end)
+
+    if os.path.exists(path):
+        samples = load_samples(path)
+
+        if samples is not None:
+            # The modification time is used for the LRU order
+            os.utime(path)
+            cached_bakes.add(key)
+            return samples, True
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    if record(context, armature, path, frame_start, frame_end, progress, hash) == 0:
+        return None, False
+
+    # This is mapped before evicting, because the new file is evicted if it is bigger than the limit
+    samples = load_samples(path)
+
+    evict_bakes(directory, bake_limit())
+
+    return samples, False
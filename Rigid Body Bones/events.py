@@ -2,6 +2,10 @@ import bpy
 from bpy.app.handlers import persistent
 from . import utils
 from . import bones
+from . import topology
+from . import pool
+from . import cache
+from .transforms import Transforms
 
 
 def simplify_modes(mode):
@@ -15,51 +19,178 @@ def event_dirty(self, context):
     mark_dirty(context)
 
 
-@utils.event("rigid_body")
-@utils.if_armature_enabled
-def event_rigid_body(context, armature, top):
-    if not is_dirty(context.scene.rigid_body_bones, armature):
-        for bone in armature.data.bones:
-            data = bone.rigid_body_bones
+# This is used for Bone / Compound properties, it only updates the bone which changed
+def event_bone_dirty(self, context):
+    name = utils.owner_bone_name(self)
+
+    if name is None:
+        mark_dirty(context)
 
-            if data.active:
-                bones.update_rigid_body(data.active.rigid_body, data)
+    else:
+        mark_bones_dirty(context, [name])
 
-            elif data.passive:
-                bones.update_rigid_body(data.passive.rigid_body, data)
 
+def event_rigid_body(self, context):
+    queue_event(self, context, 'RIGID_BODY')
 
-@utils.event("rigid_body_constraint")
-@utils.if_armature_enabled
-def event_rigid_body_constraint(context, armature, top):
-    if not is_dirty(context.scene.rigid_body_bones, armature):
-        for bone in armature.data.bones:
-            data = bone.rigid_body_bones
 
-            if data.constraint:
-                bones.update_constraint(data.constraint.rigid_body_constraint, data)
+def event_rigid_body_constraint(self, context):
+    queue_event(self, context, 'CONSTRAINT')
 
 
-@utils.event("align")
-@utils.if_armature_enabled
-def event_align(context, armature, top):
-    if not is_dirty(context.scene.rigid_body_bones, armature):
-        utils.reset_frame(context)
+def event_align(self, context):
+    queue_event(self, context, 'ALIGN')
+
+
+# Armature key -> (armature name, event type -> names of the bones which were changed)
+queued_events = {}
+
+
+# This is called for every change which is applied without an undo step, see fix_undo
+def bump_generation(armature):
+    top = armature.data.rigid_body_bones
+    top.generation += 1
+
+
+# Changing a property on many bones (e.g. with Alt) calls the update
+# callback once per bone, so the changed bones are batched and then
+# updated together during the next main event tick.
+def queue_event(data, context, type):
+    armature = context.active_object
+    top = armature.data.rigid_body_bones
+
+    # The settings can change the simulation even if the physics is disabled,
+    # so the cache is checked again
+    cache.forget(armature)
+
+    if top.enabled and armature.mode != 'EDIT':
+        name = utils.owner_bone_name(data)
+
+        assert name is not None
+
+        events = queue_events(armature)
+
+        names = events.get(type)
+
+        if names is None:
+            names = set()
+            events[type] = names
+
+        names.add(name)
+
+        bump_generation(armature)
+
+        if not bpy.app.timers.is_registered(flush_events):
+            bpy.app.timers.register(flush_events)
+
+
+def update_rigid_bodies(armature, names):
+    for name in names:
+        data = armature.data.bones[name].rigid_body_bones
+        hitbox = bones.get_hitbox(data)
 
-        for pose_bone in armature.pose.bones:
-            bone = pose_bone.bone
-            data = bone.rigid_body_bones
+        if hitbox:
+            bones.update_rigid_body(hitbox.rigid_body, data)
 
-            if data.active:
-                bones.align_hitbox(data.active, bone, data)
 
-            elif data.passive:
-                bones.align_hitbox(data.passive, bone, data)
+def update_constraints(armature, names):
+    for name in names:
+        data = armature.data.bones[name].rigid_body_bones
+
+        if data.constraint:
+            bones.update_constraint(data.constraint.rigid_body_constraint, data)
+
+
+def align_bones(context, armature, top, names):
+    utils.reset_frame(context)
+
+    transforms = Transforms(armature.data.bones, names)
+
+    for name in names:
+        pose_bone = armature.pose.bones[name]
+        bone = pose_bone.bone
+        data = bone.rigid_body_bones
+        hitbox = bones.get_hitbox(data)
+
+        if hitbox:
+            index = transforms.index(bone)
+
+            bones.align_hitbox(hitbox, data, transforms, index, top.share_meshes)
 
             if data.origin_empty:
-                bones.align_origin(data.origin_empty, bone, data)
+                bones.align_origin(data.origin_empty, transforms, index)
+
+        bones.update_pose_constraint(pose_bone)
+
+
+# Returns the queued events of the armature
+def queue_events(armature):
+    key = utils.armature_key(armature)
+    queued = queued_events.get(key)
+
+    if queued is None:
+        events = {}
+
+    else:
+        events = queued[1]
+
+    queued_events[key] = (armature.name, events)
+
+    return events
+
+
+@utils.timed("events")
+def flush_events():
+    context = bpy.context
+
+    for key, (name, events) in queued_events.items():
+        armature = utils.get_armature(key, name)
+
+        if armature is None:
+            continue
+
+        top = armature.data.rigid_body_bones
 
-            bones.update_pose_constraint(pose_bone)
+        if not top.enabled or armature.mode == 'EDIT':
+            continue
+
+        # The dirty bones will be updated by the update operator
+        dirty = dirty_bones.get(utils.armature_key(armature), set())
+
+        if dirty is None:
+            continue
+
+        bone_names = armature.data.bones
+
+        for type, names in events.items():
+            names = [name for name in names if name not in dirty and name in bone_names]
+
+            if type == 'RIGID_BODY':
+                update_rigid_bodies(armature, names)
+
+            elif type == 'CONSTRAINT':
+                update_constraints(armature, names)
+
+            elif type == 'ALIGN':
+                align_bones(context, armature, top, names)
+
+            elif type == 'RENAME':
+                bones.rename_armature_objects(armature, top)
+
+                # This stores the new names, see is_renamed
+                topology.get(armature)
+
+        # If it's dirty then the update will do this
+        if not is_dirty(armature):
+            utils.set_property(top, "updated_generation", top.generation)
+
+    queued_events.clear()
+
+
+# The cache is checked again when the next frame is played
+@utils.event("cache")
+def event_cache(context):
+    cache.forget(context.active_object)
 
 
 @utils.event("hide_hitboxes")
@@ -86,12 +217,55 @@ def event_hide_active_bones(context, armature, top):
         bones.hide_active_bone(bone, data, top.hide_active_bones)
 
 
-def is_dirty(scene, armature):
-    for dirty in scene.dirties:
-        if dirty.armature and dirty.armature.name == armature.name:
-            return True
+# Armature key -> name of the armature when it was marked dirty, for the
+# armatures which will be updated during the next tick.
+#
+# This is a dict (instead of a set) so the armatures are updated in the order
+# they were marked dirty. It isn't stored in the scene, so marking an
+# armature as dirty doesn't change the file data.
+dirty_armatures = {}
+
+
+def is_dirty(armature):
+    return utils.armature_key(armature) in dirty_armatures
+
 
-    return False
+# Armature key -> set of bone names which must be updated,
+# or None if every bone must be updated.
+dirty_bones = {}
+
+
+# Returns the bones which must be updated, or None if it must do a full update.
+def take_dirty_bones(armature):
+    return dirty_bones.pop(utils.armature_key(armature), None)
+
+
+# Armature key -> SlicedUpdate which is currently running
+sliced_updates = {}
+
+
+# This marks the bones as dirty without scheduling an update, it is used when
+# a sliced update is cancelled, so the bones are updated when it is resumed.
+#
+# If names is None then it will do a full update.
+def mark_bones_pending(armature, names):
+    key = utils.armature_key(armature)
+
+    if names is None:
+        dirty_bones[key] = None
+
+    elif key in dirty_bones:
+        bones = dirty_bones[key]
+
+        if bones is not None:
+            bones.update(names)
+
+    else:
+        dirty_bones[key] = set(names)
+
+
+def is_pending(armature):
+    return utils.armature_key(armature) in dirty_bones and not is_dirty(armature)
 
 
 # This is used to run the update operator during the next
@@ -103,31 +277,132 @@ def mark_dirty(context):
     assert utils.is_armature(context)
 
     armature = context.active_object
-    scene = context.scene.rigid_body_bones
 
-    # Don't add duplicate objects
-    if not is_dirty(scene, armature):
-        dirty = scene.dirties.add()
-        dirty.armature = armature
+    dirty_bones[utils.armature_key(armature)] = None
+
+    schedule_update(context, armature)
+
+
+def mark_bones_dirty(context, names):
+    assert utils.is_armature(context)
+
+    armature = context.active_object
+    key = utils.armature_key(armature)
+
+    if key in dirty_bones:
+        bones = dirty_bones[key]
+
+        if bones is not None:
+            bones.update(names)
+
+    # If the armature is already dirty then it must do a full update
+    elif is_dirty(armature):
+        dirty_bones[key] = None
+
+    else:
+        dirty_bones[key] = set(names)
+
+    schedule_update(context, armature)
+
+
+def schedule_update(context, armature):
+    bump_generation(armature)
+    cache.forget(armature)
+
+    dirty_armatures[utils.armature_key(armature)] = armature.name
 
-    if len(scene.dirties) > 0:
-        if not bpy.app.timers.is_registered(next_tick):
-            bpy.app.timers.register(next_tick)
+    if not bpy.app.timers.is_registered(next_tick):
+        bpy.app.timers.register(next_tick)
 
 
+# Armatures which are in the middle of a sliced update are updated afterwards
+def is_ready(key):
+    return key not in sliced_updates
+
+
+def has_ready_armatures():
+    return any(is_ready(key) for key in dirty_armatures)
+
+
+# Returns the dirty armatures which can be updated now, they are no longer dirty
+def take_dirty_armatures():
+    armatures = []
+
+    for key, name in list(dirty_armatures.items()):
+        if is_ready(key):
+            del dirty_armatures[key]
+
+            armature = utils.get_armature(key, name)
+
+            # It was deleted after it was marked dirty
+            if armature is None:
+                dirty_bones.pop(key, None)
+
+            else:
+                armatures.append(armature)
+
+    return armatures
+
+
+# The update can mark the armature dirty again, which is ignored because it was just updated
+def forget_dirty(armature):
+    key = utils.armature_key(armature)
+
+    dirty_armatures.pop(key, None)
+
+    # Normally the update takes the dirty bones, this is just in case it didn't run
+    dirty_bones.pop(key, None)
+
+
+# Every armature is updated by a single operator, so there is only one undo step
 @utils.timed("update")
 def next_tick():
-    context = bpy.context
-    scene = context.scene.rigid_body_bones
+    if has_ready_armatures():
+        bpy.ops.rigid_body_bones.update_dirty(sliced=True)
+
+    if dirty_armatures:
+        return 0.1
+
+    return None
 
-    with utils.Selected(context), utils.Selectable(context):
-        for dirty in scene.dirties:
-            if dirty.armature:
-                utils.select_active(context, dirty.armature)
-                assert context.active_object.name == dirty.armature.name
-                bpy.ops.rigid_body_bones.update()
 
-    scene.dirties.clear()
+# Returns True if the bones or the armature were renamed after the objects were named.
+#
+# The bone names are compared with the cached hierarchy, if it isn't cached then
+# it's assumed that they were renamed.
+def is_renamed(armature, top):
+    for key in bones.ARMATURE_NAMES:
+        value = getattr(top, key)
+
+        if value and value.name != bones.armature_name(armature, key):
+            return True
+
+    cached = topology.cache.get(utils.armature_key(armature))
+
+    return cached is None or cached.names != armature.data.bones.keys()
+
+
+# This is called when a bone or armature is renamed.
+#
+# The renamed armature isn't always the active object (e.g. renaming in the
+# Outliner or with a script), so every armature is checked.
+def rename_switch():
+    queued = False
+
+    for armature in bpy.data.objects:
+        if armature.type == 'ARMATURE' and armature.mode != 'EDIT':
+            top = armature.data.rigid_body_bones
+
+            if top.enabled and is_renamed(armature, top):
+                events = queue_events(armature)
+                events['RENAME'] = set()
+
+                bump_generation(armature)
+
+                queued = True
+
+    if queued and not bpy.app.timers.is_registered(flush_events):
+        bpy.app.timers.register(flush_events)
 
 
 def mode_switch():
@@ -140,24 +415,58 @@ def mode_switch():
         mode = simplify_modes(armature.mode)
 
         if top.mode != mode:
+            # Leaving Edit mode recreates the bones, so the hierarchy might have changed
+            if top.mode == 'EDIT':
+                topology.invalidate(armature)
+
             top.mode = mode
             mark_dirty(context)
 
 
+# The number of armatures and their users when the cleanup last ran
+cleanup_key = None
+
+
+# Deleting an armature (or the object which uses it) always changes this
+def armatures_key():
+    return (len(bpy.data.armatures), sum(armature.users for armature in bpy.data.armatures))
+
+
 # This is needed to cleanup the rigid body objects when the armature is deleted
 def cleanup_armatures():
+    global cleanup_key
+    cleanup_key = armatures_key()
+
     if bpy.ops.rigid_body_bones.cleanup_armatures.poll():
         bpy.ops.rigid_body_bones.cleanup_armatures()
 
-    return 5.0
+    return None
+
+
+# This runs after every change (including playback and renders), so it only
+# does a cheap check, and the cleanup runs later in a timer because removing
+# objects isn't safe while the depsgraph is being evaluated.
+@persistent
+def check_cleanup(scene, depsgraph):
+    if armatures_key() != cleanup_key:
+        if not bpy.app.timers.is_registered(cleanup_armatures):
+            bpy.app.timers.register(cleanup_armatures)
 
 
+# Automatic updates don't push an undo step, so the undo step for a change
+# doesn't contain the objects which were created by its update. This updates
+# the armatures which were restored to a state which was never updated.
 @persistent
 def fix_undo(scene):
     context = bpy.context
 
-    if utils.is_armature(context):
-        mark_dirty(context)
+    for armature in scene.objects:
+        if armature.type == 'ARMATURE':
+            top = armature.data.rigid_body_bones
+
+            if top.generation != top.updated_generation:
+                dirty_bones[utils.armature_key(armature)] = None
+                schedule_update(context, armature)
 
 
 owner = object()
@@ -165,6 +474,10 @@ owner = object()
 def register_subscribers():
     bpy.msgbus.clear_by_owner(owner)
 
+    dirty_armatures.clear()
+
+    topology.clear()
+
     bpy.msgbus.subscribe_rna(
         key=(bpy.types.Object, "mode"),
         owner=owner,
@@ -174,9 +487,71 @@ def register_subscribers():
         options={'PERSISTENT'}
     )
 
+    bpy.msgbus.subscribe_rna(
+        key=(bpy.types.Bone, "name"),
+        owner=owner,
+        args=(),
+        notify=rename_switch,
+        options={'PERSISTENT'}
+    )
+
+    bpy.msgbus.subscribe_rna(
+        key=(bpy.types.Armature, "name"),
+        owner=owner,
+        args=(),
+        notify=rename_switch,
+        options={'PERSISTENT'}
+    )
+
+# Undo / redo restores the old bone data, so the cached hierarchy and cache files can't be trusted
+@persistent
+def clear_topology(scene):
+    topology.clear()
+    cache.clear()
+
+
+# Undo / redo can restore armatures to a state which was never updated,
+# so the armatures which still exist get a full update.
+@persistent
+def reconcile_dirty(scene):
+    for key, name in list(dirty_armatures.items()):
+        if utils.get_armature(key, name) is None:
+            del dirty_armatures[key]
+            dirty_bones.pop(key, None)
+
+        else:
+            dirty_bones[key] = None
+
+
+# The pooled objects are only useful while editing, so they aren't saved
+@persistent
+def evict_pools(dummy):
+    for armature in bpy.data.armatures:
+        pool.evict(armature.rigid_body_bones.pool)
+
+
 @persistent
 def load_post(dummy):
-    register_subscribers()
+    global cleanup_key
+
+    # The queued armatures belong to the previous file
+    dirty_armatures.clear()
+    dirty_bones.clear()
+    queued_events.clear()
+
+    # The new file might contain orphan objects, so it is always cleaned up once
+    cleanup_key = None
+
+    topology.clear()
+    cache.clear()
+
+    if not bpy.app.background:
+        register_subscribers()
+
+
+@persistent
+def play_cache(scene, depsgraph):
+    cache.play(scene)
 
 
 def register():
@@ -185,11 +560,27 @@ def register():
     # This is needed in order to re-subscribe when the file changes
     bpy.app.handlers.load_post.append(load_post)
 
+    bpy.app.handlers.save_pre.append(evict_pools)
+
+    # Render farms also play from the cache, so this is used in background mode
+    bpy.app.handlers.frame_change_pre.append(play_cache)
+
+    # Background mode doesn't have undo or interactive changes,
+    # so scripts must run the update operator themselves
+    if bpy.app.background:
+        return
+
+    bpy.app.handlers.undo_post.append(clear_topology)
+    bpy.app.handlers.redo_post.append(clear_topology)
+
+    bpy.app.handlers.undo_post.append(reconcile_dirty)
+    bpy.app.handlers.redo_post.append(reconcile_dirty)
+
     # This is needed in order to fix up problems caused by undo/redo
-    #bpy.app.handlers.undo_post.append(fix_undo)
-    #bpy.app.handlers.redo_post.append(fix_undo)
+    bpy.app.handlers.undo_post.append(fix_undo)
+    bpy.app.handlers.redo_post.append(fix_undo)
 
-    bpy.app.timers.register(cleanup_armatures, persistent=True)
+    bpy.app.handlers.depsgraph_update_post.append(check_cleanup)
 
     register_subscribers()
 
@@ -200,9 +591,39 @@ def unregister():
     if bpy.app.timers.is_registered(cleanup_armatures):
         bpy.app.timers.unregister(cleanup_armatures)
 
+    if check_cleanup in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(check_cleanup)
+
     if bpy.app.timers.is_registered(next_tick):
         bpy.app.timers.unregister(next_tick)
 
+    if bpy.app.timers.is_registered(flush_events):
+        bpy.app.timers.unregister(flush_events)
+
+    if bpy.app.timers.is_registered(cache.check_players):
+        bpy.app.timers.unregister(cache.check_players)
+
+    for update in list(sliced_updates.values()):
+        update.stop()
+
+    if evict_pools in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(evict_pools)
+
+    if play_cache in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(play_cache)
+
+    if reconcile_dirty in bpy.app.handlers.redo_post:
+        bpy.app.handlers.redo_post.remove(reconcile_dirty)
+
+    if reconcile_dirty in bpy.app.handlers.undo_post:
+        bpy.app.handlers.undo_post.remove(reconcile_dirty)
+
+    if clear_topology in bpy.app.handlers.redo_post:
+        bpy.app.handlers.redo_post.remove(clear_topology)
+
+    if clear_topology in bpy.app.handlers.undo_post:
+        bpy.app.handlers.undo_post.remove(clear_topology)
+
     if fix_undo in bpy.app.handlers.redo_post:
         bpy.app.handlers.redo_post.remove(fix_undo)
 
@@ -213,3 +634,9 @@ def unregister():
         bpy.app.handlers.load_post.remove(load_post)
 
     bpy.msgbus.clear_by_owner(owner)
+
+    dirty_armatures.clear()
+
+    topology.clear()
+
+    cache.clear()
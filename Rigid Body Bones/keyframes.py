@@ -0,0 +1,305 @@
+import math
+import numpy as np
+
+
+# Each F-Curve is stored as (data_path, array_index, group name, values),
+# the values are for every frame in `frames`.
+
+
+def channel_name(data_path):
+    return data_path.rpartition(".")[2]
+
+
+def is_bone_channel(data_path):
+    return data_path.startswith("pose.bones[") and channel_name(data_path) in ("location", "rotation_euler", "rotation_quaternion", "rotation_axis_angle", "scale")
+
+
+# Removing the last keyframe doesn't move the other keyframes, so this is fast
+def remove_points(points, count):
+    for _ in range(count):
+        points.remove(points[len(points) - 1], fast=True)
+
+
+# Writes every keyframe of the F-Curve at once, instead of inserting them one at a time.
+#
+# An existing F-Curve is reused, so its modifiers and settings (e.g. color, lock) are kept.
+def write_fcurve(action, data_path, index, group, frames, values, interpolation='BEZIER'):
+    fcurve = action.fcurves.find(data_path, index=index)
+
+    if fcurve is None:
+        fcurve = action.fcurves.new(data_path, index=index, action_group=group)
+
+    else:
+        # The old keyframes are replaced, so their interpolation and handles aren't kept
+        remove_points(fcurve.keyframe_points, len(fcurve.keyframe_points))
+
+    co = np.empty((len(frames), 2), dtype=np.float32)
+    co[:, 0] = frames
+    co[:, 1] = values
+
+    fcurve.keyframe_points.add(len(frames))
+    fcurve.keyframe_points.foreach_set("co", co.ravel())
+
+    # Reduced F-Curves only have a few keyframes, so this loop is fast
+    if interpolation != 'BEZIER':
+        for point in fcurve.keyframe_points:
+            point.interpolation = interpolation
+
+    fcurve.update()
+
+
+# Allowed error of each F-Curve, in the same units as the F-Curve
+def curve_tolerances(curves, location, rotation, scale):
+    output = np.empty(len(curves))
+
+    for i, (data_path, index, group, values) in enumerate(curves):
+        name = channel_name(data_path)
+
+        if name == "location":
+            output[i] = location
+
+        # The angle between two quaternions is about 2 * |q1 - q2|, and the
+        # difference of the 4 components is at most 2 times the largest difference.
+        elif name == "rotation_quaternion":
+            output[i] = rotation / 4.0
+
+        # The axis is a unit vector, so a small change in it is also about an angle in radians
+        elif name in ("rotation_euler", "rotation_axis_angle"):
+            output[i] = rotation
+
+        else:
+            output[i] = scale
+
+    return output
+
+
+# Error-bounded keyframe reduction, similar to Ramer-Douglas-Peucker.
+#
+# Instead of recursing on each F-Curve, this splits the segments of every
+# F-Curve at the same time. Each pass linearly interpolates between the
+# keyframes which are kept, and keeps the frame with the largest error in
+# every segment where the error is bigger than the tolerance. It usually
+# takes about log2(frames) passes.
+#
+# The error is the vertical distance, because that is how F-Curves are evaluated.
+#
+# Returns the mask of keyframes to keep (curves, frames), and the interpolated values.
+def simplify(frames, values, tolerances):
+    count = values.shape[1]
+    columns = np.arange(count)
+
+    keep = np.zeros(values.shape, dtype=bool)
+    keep[:, 0] = True
+    keep[:, -1] = True
+
+    interpolated = np.empty_like(values)
+
+    # Indexes of the F-Curves which are still being split
+    pending = np.arange(len(values))
+
+    while len(pending) != 0:
+        pending_keep = keep[pending]
+        pending_values = values[pending]
+
+        # Index of the kept keyframe before and after each frame
+        previous = np.maximum.accumulate(np.where(pending_keep, columns, 0), axis=1)
+        following = np.minimum.accumulate(np.where(pending_keep, columns, count - 1)[:, ::-1], axis=1)[:, ::-1]
+
+        start = frames[previous]
+        span = frames[following] - start
+        span[span == 0.0] = 1.0
+
+        factor = (frames - start) / span
+        before = np.take_along_axis(pending_values, previous, axis=1)
+        after = np.take_along_axis(pending_values, following, axis=1)
+
+        lerp = before + (after - before) * factor
+        interpolated[pending] = lerp
+
+        error = np.abs(pending_values - lerp) / tolerances[pending, None]
+
+        # Each kept keyframe starts a segment, the segments never cross rows
+        # because the first and last frames are always kept.
+        flat_keep = pending_keep.ravel()
+        starts = np.flatnonzero(flat_keep)
+        largest = np.maximum.reduceat(error.ravel(), starts)[np.cumsum(flat_keep) - 1].reshape(error.shape)
+
+        split = (error > 1.0) & (error == largest)
+
+        keep[pending] = pending_keep | split
+        pending = pending[split.any(axis=1)]
+
+    return keep, interpolated
+
+
+def quaternion_angles(a, b):
+    a = a / np.linalg.norm(a, axis=0)
+    b = b / np.linalg.norm(b, axis=0)
+    return 2.0 * np.arccos(np.clip(np.abs(np.sum(a * b, axis=0)), 0.0, 1.0))
+
+
+class Reduction:
+    def __init__(self):
+        self.before = 0
+        self.after = 0
+
+        # Largest difference from the original keyframes
+        self.location_error = 0.0
+        self.rotation_error = 0.0
+        self.scale_error = 0.0
+
+
+    def measure(self, curves, values, interpolated):
+        self.before += values.size
+
+        quaternions = {}
+
+        for i, (data_path, index, group, _) in enumerate(curves):
+            name = channel_name(data_path)
+
+            if name == "rotation_quaternion":
+                quaternions.setdefault(data_path, {})[index] = i
+                continue
+
+            error = np.abs(values[i] - interpolated[i]).max()
+
+            if name == "location":
+                self.location_error = max(self.location_error, error)
+
+            elif name == "scale":
+                self.scale_error = max(self.scale_error, error)
+
+            else:
+                self.rotation_error = max(self.rotation_error, error)
+
+        for indexes in quaternions.values():
+            rows = list(indexes.values())
+
+            if len(rows) == 4:
+                error = quaternion_angles(values[rows], interpolated[rows]).max()
+
+            else:
+                error = np.abs(values[rows] - interpolated[rows]).max() * 4.0
+
+            self.rotation_error = max(self.rotation_error, error)
+
+
+    def report(self):
+        return "Reduced {} keyframes to {} ({:.1f}x smaller), max error {:.4g} location, {:.4g}° rotation, {:.4g} scale".format(
+            self.before,
+            self.after,
+            self.before / max(self.after, 1),
+            self.location_error,
+            math.degrees(self.rotation_error),
+            self.scale_error,
+        )
+
+
+# Returns the mask of keyframes to keep (curves, frames) for F-Curves which
+# have the same frames, and adds the statistics to `reduction`.
+def reduce_curves(frames, curves, tolerances, reduction):
+    values = np.array([curve[3] for curve in curves], dtype=np.float64)
+    keep, interpolated = simplify(frames.astype(np.float64), values, curve_tolerances(curves, *tolerances))
+
+    reduction.measure(curves, values, interpolated)
+    reduction.after += np.count_nonzero(keep)
+
+    return keep
+
+
+# Writes F-Curves which have the same frames, if `tolerances` isn't None the
+# keyframes are reduced first, and the statistics are added to `reduction`.
+def write_curves(action, frames, curves, tolerances, reduction):
+    if tolerances is None or len(frames) < 3:
+        for data_path, index, group, values in curves:
+            write_fcurve(action, data_path, index, group, frames, values)
+
+    else:
+        keep = reduce_curves(frames, curves, tolerances, reduction)
+
+        for i, (data_path, index, group, values) in enumerate(curves):
+            write_fcurve(action, data_path, index, group, frames[keep[i]], values[keep[i]], interpolation='LINEAR')
+
+
+# Per-keyframe settings which are kept when an F-Curve is reduced
+KEYFRAME_SETTINGS = ("handle_left_type", "handle_right_type", "easing", "type")
+
+
+# Removes the keyframes of an existing F-Curve which aren't in `keep`.
+#
+# The F-Curve is changed in place, so its modifiers and settings are kept, and
+# the kept keyframes keep their handles and settings. The segments which lost
+# keyframes become linear, because that is how the error was measured.
+def reduce_fcurve(fcurve, keep):
+    points = fcurve.keyframe_points
+    count = len(points)
+    kept = np.flatnonzero(keep)
+
+    arrays = {}
+
+    for name in ("co", "handle_left", "handle_right"):
+        values = np.empty(count * 2, dtype=np.float32)
+        points.foreach_get(name, values)
+        arrays[name] = values.reshape(-1, 2)[kept]
+
+    # Reduced F-Curves only have a few keyframes, so these loops are fast
+    settings = []
+
+    for i in kept:
+        point = points[int(i)]
+        settings.append((point.interpolation, [getattr(point, name) for name in KEYFRAME_SETTINGS]))
+
+    remove_points(points, count - len(kept))
+
+    for name, values in arrays.items():
+        points.foreach_set(name, values.ravel())
+
+    reduced = np.diff(kept) > 1
+
+    for i, point in enumerate(points):
+        interpolation, values = settings[i]
+
+        for name, value in zip(KEYFRAME_SETTINGS, values):
+            setattr(point, name, value)
+
+        if i < len(reduced) and reduced[i]:
+            point.interpolation = 'LINEAR'
+
+        else:
+            point.interpolation = interpolation
+
+    fcurve.update()
+
+
+# Reduces the bone F-Curves of an action which was already baked.
+#
+# This assumes that the keyframes are close together (e.g. one on every
+# frame), because the error is only checked on the existing keyframes.
+def reduce_action(action, tolerances):
+    reduction = Reduction()
+
+    # F-Curves with the same frames are reduced together
+    groups = {}
+
+    for fcurve in action.fcurves:
+        points = fcurve.keyframe_points
+
+        if is_bone_channel(fcurve.data_path) and len(points) >= 3:
+            co = np.empty(len(points) * 2, dtype=np.float32)
+            points.foreach_get("co", co)
+            co = co.reshape(-1, 2)
+
+            group = fcurve.group.name if fcurve.group else ""
+
+            frames = co[:, 0]
+            frames, curves, fcurves = groups.setdefault(frames.tobytes(), (frames, [], []))
+            curves.append((fcurve.data_path, fcurve.array_index, group, co[:, 1]))
+            fcurves.append(fcurve)
+
+    for frames, curves, fcurves in groups.values():
+        keep = reduce_curves(frames, curves, tolerances, reduction)
+
+        for i, fcurve in enumerate(fcurves):
+            reduce_fcurve(fcurve, keep[i])
+
+    return reduction
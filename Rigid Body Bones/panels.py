@@ -1,5 +1,8 @@
 import bpy
 from . import utils
+from . import events
+from . import profiler
+from . import cache
 from .bones import is_bone_active, shape_icon
 
 
@@ -48,6 +51,8 @@ class RigidBodyMenu(bpy.types.Menu):
     def draw(self, context):
         self.layout.operator("rigid_body_bones.calculate_mass")
         self.layout.operator("rigid_body_bones.copy_from_active")
+        self.layout.operator("rigid_body_bones.bake")
+        self.layout.operator("rigid_body_bones.reduce_keyframes")
 
 
 class ArmaturePanel(bpy.types.Panel):
@@ -71,9 +76,22 @@ class ArmaturePanel(bpy.types.Panel):
             layout.label(text="", icon='ERROR')
 
     def draw(self, context):
-        data = context.active_object.data.rigid_body_bones
+        armature = context.active_object
+        data = armature.data.rigid_body_bones
         layout = self.layout
 
+        update = events.sliced_updates.get(utils.armature_key(armature))
+
+        if update is not None:
+            row = layout.row()
+            row.label(text="Updating {} / {} bones".format(update.done, update.total), icon='TIME')
+            row.operator("rigid_body_bones.cancel_update", text="", icon='CANCEL')
+
+        elif events.is_pending(armature):
+            row = layout.row()
+            row.label(text="Update cancelled", icon='INFO')
+            row.operator("rigid_body_bones.update", text="Resume", icon='PLAY').sliced = True
+
         if len(data.errors) != 0:
             layout.label(text="Invalid bones:")
 
@@ -82,6 +100,112 @@ class ArmaturePanel(bpy.types.Panel):
             for error in data.errors:
                 box.label(text=error.name, icon='BONE_DATA')
 
+        if data.enabled:
+            layout.operator("rigid_body_bones.bake", icon='REC')
+
+
+class ArmatureCachePanel(bpy.types.Panel):
+    bl_idname = "DATA_PT_rigid_body_bones_armature_cache"
+    bl_label = "Cache"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Rigid Body Bones"
+    bl_parent_id = "DATA_PT_rigid_body_bones_armature"
+    bl_options = {'DEFAULT_CLOSED'}
+    bl_order = 1
+
+    def draw(self, context):
+        armature = context.active_object
+        data = armature.data.rigid_body_bones
+        layout = self.layout
+
+        layout.prop(data, "cache_file", text="")
+
+        col = layout.column()
+        col.enabled = not data.enabled
+        col.prop(data, "cache_playback")
+
+        # The cache is checked in a timer after it changes, because checking it is slow
+        key = utils.armature_key(armature)
+
+        if cache.is_playing(armature) and key in cache.players:
+            player = cache.players[key]
+
+            if player is None:
+                layout.label(text="Cache is missing or out of date", icon='ERROR')
+
+            else:
+                layout.label(text="Playing frames {} - {}".format(player.frame_start, player.frame_start + player.frames - 1), icon='PLAY')
+
+        layout.operator("rigid_body_bones.cache_simulation", icon='DISK_DRIVE')
+
+
+def format_time(seconds):
+    return "{:.1f} ms".format(seconds * 1000.0)
+
+
+class ArmatureProfilePanel(bpy.types.Panel):
+    bl_idname = "DATA_PT_rigid_body_bones_armature_profile"
+    bl_label = "Profile"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Rigid Body Bones"
+    bl_parent_id = "DATA_PT_rigid_body_bones_armature"
+    bl_options = {'DEFAULT_CLOSED'}
+    bl_order = 2
+
+    def draw(self, context):
+        armature = context.active_object
+        layout = self.layout
+
+        profiles = profiler.history.get(armature.name)
+
+        if not profiles:
+            layout.label(text="No updates yet")
+
+        else:
+            last = profiles[-1]
+
+            col = layout.column(align=True)
+
+            title = "Last update: {} ({} bones)".format(last.kind.title(), last.bones)
+
+            if last.cancelled:
+                title += ", cancelled"
+
+            col.label(text=title)
+            col.label(text="Total: " + format_time(last.duration))
+
+            box = layout.box()
+            col = box.column(align=True)
+
+            for name in profiler.PHASES:
+                seconds = last.phases[name]
+
+                if seconds != 0.0:
+                    row = col.row()
+                    row.label(text=name)
+                    row.label(text=format_time(seconds))
+
+            box = layout.box()
+            col = box.column(align=True)
+
+            for name in profiler.COUNTERS:
+                row = col.row()
+                row.label(text=name)
+                row.label(text=str(last.counters[name]))
+
+            durations = [profile.duration for profile in profiles]
+
+            col = layout.column(align=True)
+            col.label(text="History: {} updates".format(len(durations)))
+            col.label(text="Average: " + format_time(sum(durations) / len(durations)))
+            col.label(text="Slowest: " + format_time(max(durations)))
+
+        row = layout.row(align=True)
+        row.operator("rigid_body_bones.export_profile", text="Export", icon='EXPORT')
+        row.operator("rigid_body_bones.clear_profile", text="Clear", icon='TRASH')
+
 
 class ArmatureSettingsPanel(bpy.types.Panel):
     bl_idname = "DATA_PT_rigid_body_bones_armature_settings"
@@ -118,6 +242,19 @@ class ArmatureSettingsPanel(bpy.types.Panel):
         col.prop(data, "hide_hitboxes")
         col.prop(data, "hide_hitbox_origins")
 
+        flow.separator()
+
+        col = flow.column()
+        col.prop(data, "share_meshes")
+
+        flow.separator()
+
+        col = flow.column()
+        col.enabled = data.enabled
+        op = col.operator("rigid_body_bones.update", text="Rebuild", icon='FILE_REFRESH')
+        op.full = True
+        op.sliced = True
+
 
 class BonePanel(bpy.types.Panel):
     bl_idname = "DATA_PT_rigid_body_bones_bone"
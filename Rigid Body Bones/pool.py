@@ -0,0 +1,66 @@
+from . import utils
+from . import profiler
+
+
+# Maximum number of objects of each kind which are kept for each armature
+POOL_SIZE = 256
+
+# The pooled objects are renamed, so that their old names can be used by the new objects
+POOL_NAME = "Rigid Body Bones [Pool]"
+
+
+# Instead of deleting the object, this unlinks it from every collection and
+# stores it in the pool, so it can be reused when a bone needs a new object
+# of the same kind (e.g. when a bone switches between Active and Passive).
+#
+# The pool is stored in the armature, so it survives undo / redo.
+def release(items, object):
+    if len(items) >= POOL_SIZE:
+        utils.remove_object(object)
+
+    else:
+        for collection in object.users_collection:
+            collection.objects.unlink(object)
+
+        utils.set_name(object, POOL_NAME)
+
+        if object.data is not None and not utils.is_shared_mesh(object.data):
+            utils.set_name(object.data, POOL_NAME)
+
+        item = items.add()
+        item.object = object
+        profiler.count("objects_pooled")
+
+
+# Returns None if the pool is empty, the caller must rename the object
+def acquire(items, collection):
+    while len(items) != 0:
+        index = len(items) - 1
+        object = items[index].object
+        items.remove(index)
+
+        # This can happen if the object was deleted by a script
+        if object:
+            collection.objects.link(object)
+            profiler.count("objects_reused")
+            return object
+
+    return None
+
+
+def evict_items(items):
+    for item in items:
+        if item.object:
+            utils.remove_object(item.object)
+
+    items.clear()
+
+
+# The pooled objects aren't needed after the file is loaded, so they are removed before saving
+def evict(pool):
+    evict_items(pool.actives)
+    evict_items(pool.passives)
+    evict_items(pool.compounds)
+    evict_items(pool.origins)
+    evict_items(pool.blanks)
+    evict_items(pool.constraints)
@@ -0,0 +1,159 @@
+import time
+import json
+from collections import deque
+
+
+# Number of updates which are remembered for each armature
+HISTORY_SIZE = 50
+
+# Order which the phases are displayed in
+PHASES = (
+    "fix_parents",
+    "change_parents",
+    "process_bone",
+    "rigid_bodies",
+    "update_bone",
+    "update_constraints",
+    "reset_frame",
+    "remove_orphans",
+    "process_edit",
+)
+
+COUNTERS = (
+    "objects_created",
+    "objects_removed",
+    "objects_pooled",
+    "objects_reused",
+    "meshes_created",
+    "meshes_removed",
+    "operator_calls",
+    "writes",
+    "writes_skipped",
+)
+
+
+# Armature name -> deque of the most recent profiles
+history = {}
+
+# The profile which is currently being recorded, or None
+current = None
+
+
+# This records the timings and counters for a single update.
+#
+# The phases are inclusive, e.g. reset_frame is also part of update_constraints.
+class Profile:
+    def __init__(self, armature_name, kind, bones):
+        self.armature = armature_name
+        self.kind = kind
+        self.bones = bones
+        self.cancelled = False
+
+        self.started = time.time()
+
+        # Time spent updating, this doesn't include the time between ticks for sliced updates
+        self.duration = 0.0
+
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+        self.time_start = None
+
+
+    # The profile is recorded while it is entered, this can happen multiple times
+    def __enter__(self):
+        global current
+        assert current is None
+
+        current = self
+        self.time_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global current
+        assert current is self
+
+        self.duration += time.perf_counter() - self.time_start
+        current = None
+        return False
+
+
+    def to_dict(self):
+        return {
+            "armature": self.armature,
+            "kind": self.kind,
+            "bones": self.bones,
+            "cancelled": self.cancelled,
+            "started": self.started,
+            "duration": self.duration,
+            "phases": self.phases,
+            "counters": self.counters,
+        }
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.time_start = None
+
+    def __enter__(self):
+        self.time_start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if current is not None:
+            current.phases[self.name] += time.perf_counter() - self.time_start
+
+        return False
+
+
+def phase(name):
+    return Phase(name)
+
+
+def count(name, amount=1):
+    if current is not None:
+        current.counters[name] += amount
+
+
+# This is called when the profile is finished, so it shows up in the history
+def record(profile):
+    profiles = history.get(profile.armature)
+
+    if profiles is None:
+        profiles = deque(maxlen=HISTORY_SIZE)
+        history[profile.armature] = profiles
+
+    profiles.append(profile)
+
+
+def last(armature_name):
+    profiles = history.get(armature_name)
+
+    if profiles:
+        return profiles[-1]
+
+    else:
+        return None
+
+
+def clear(armature_name=None):
+    if armature_name is None:
+        history.clear()
+
+    else:
+        history.pop(armature_name, None)
+
+
+def export_json(path, armature_name=None):
+    if armature_name is None:
+        names = sorted(history.keys())
+    else:
+        names = [armature_name]
+
+    output = {
+        name: [profile.to_dict() for profile in history.get(name, [])]
+        for name in names
+    }
+
+    with open(path, "w") as file:
+        json.dump(output, file, indent=4)
@@ -2,8 +2,8 @@ import bpy
 from . import utils
 from .bones import shape_icon
 from .events import (
-    event_dirty, event_rigid_body, event_rigid_body_constraint, event_align,
-    event_hide_hitboxes, event_hide_active_bones, mark_dirty
+    event_dirty, event_bone_dirty, event_rigid_body, event_rigid_body_constraint,
+    event_align, event_hide_hitboxes, event_hide_active_bones, event_cache, mark_bones_dirty
 )
 
 
@@ -13,12 +13,7 @@ MAX_ROT = 3.14159265358979323846 * 2.0
 MIN_ROT = -MAX_ROT
 
 
-class Dirty(bpy.types.PropertyGroup):
-    armature: bpy.props.PointerProperty(type=bpy.types.Object)
-
-
 class Scene(bpy.types.PropertyGroup):
-    dirties: bpy.props.CollectionProperty(type=Dirty)
     collection: bpy.props.PointerProperty(type=bpy.types.Collection)
 
     @classmethod
@@ -34,6 +29,20 @@ class Error(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty()
 
 
+class PoolObject(bpy.types.PropertyGroup):
+    object: bpy.props.PointerProperty(type=bpy.types.Object)
+
+
+# Objects which were removed from bones, they are reused when a bone needs a new object
+class Pool(bpy.types.PropertyGroup):
+    actives: bpy.props.CollectionProperty(type=PoolObject)
+    passives: bpy.props.CollectionProperty(type=PoolObject)
+    compounds: bpy.props.CollectionProperty(type=PoolObject)
+    origins: bpy.props.CollectionProperty(type=PoolObject)
+    blanks: bpy.props.CollectionProperty(type=PoolObject)
+    constraints: bpy.props.CollectionProperty(type=PoolObject)
+
+
 class Armature(bpy.types.PropertyGroup):
     mode: bpy.props.StringProperty()
 
@@ -48,8 +57,14 @@ class Armature(bpy.types.PropertyGroup):
     constraints: bpy.props.PointerProperty(type=bpy.types.Collection)
 
     root_body: bpy.props.PointerProperty(type=bpy.types.Object)
+    pool: bpy.props.PointerProperty(type=Pool)
     parents_stored: bpy.props.BoolProperty(default=False)
 
+    # Automatic updates don't push an undo step, so undo can restore an armature
+    # which was changed but never updated. This is detected by comparing these.
+    generation: bpy.props.IntProperty(default=0)
+    updated_generation: bpy.props.IntProperty(default=0)
+
 
     enabled: bpy.props.BoolProperty(
         name="Enable rigid body physics",
@@ -79,6 +94,28 @@ class Armature(bpy.types.PropertyGroup):
         update=event_hide_hitboxes,
     )
 
+    share_meshes: bpy.props.BoolProperty(
+        name="Share hitbox meshes",
+        description="Hitboxes with the same dimensions use the same mesh (uses less memory)",
+        default=False,
+        update=event_dirty,
+    )
+
+    cache_file: bpy.props.StringProperty(
+        name="Cache File",
+        description="File which stores the simulation cache, if it is empty the cache is stored next to the .blend file",
+        default="",
+        subtype='FILE_PATH',
+        update=event_cache,
+    )
+
+    cache_playback: bpy.props.BoolProperty(
+        name="Play from cache",
+        description="When rigid body physics is disabled, move the bones with the simulation which was stored in the cache file",
+        default=False,
+        update=event_cache,
+    )
+
 
     @classmethod
     def register(cls):
@@ -89,6 +126,22 @@ class Armature(bpy.types.PropertyGroup):
         del bpy.types.Armature.rigid_body_bones
 
 
+# Actions which were created by Bake to Keyframes
+class Action(bpy.types.PropertyGroup):
+    baked: bpy.props.BoolProperty(default=False)
+
+    # The action which was copied when baking, or None if the armature didn't have an action
+    source: bpy.props.PointerProperty(type=bpy.types.Action)
+
+    @classmethod
+    def register(cls):
+        bpy.types.Action.rigid_body_bones = bpy.props.PointerProperty(type=cls)
+
+    @classmethod
+    def unregister(cls):
+        del bpy.types.Action.rigid_body_bones
+
+
 class ShapeProperties:
     location: bpy.props.FloatVectorProperty(
         name="Location",
@@ -216,7 +269,7 @@ class Compound(bpy.types.PropertyGroup, ShapeProperties):
                 self.name = utils.make_unique_name(utils.strip_name_suffix(self.name), seen)
                 Compound.is_updating = False
 
-            mark_dirty(context)
+            mark_bones_dirty(context, [bone.name])
 
     hitbox: bpy.props.PointerProperty(type=bpy.types.Object)
 
@@ -238,7 +291,7 @@ class Compound(bpy.types.PropertyGroup, ShapeProperties):
             #('MESH', "Mesh", "Mesh consisting of triangles only, allowing for more detailed interactions than convex hulls", shape_icon('MESH'), 6),
         ],
         # TODO more efficient event for this ?
-        update=event_dirty,
+        update=event_bone_dirty,
     )
 
 
@@ -279,7 +332,7 @@ class Bone(bpy.types.PropertyGroup, ShapeProperties):
         description="Enable rigid body physics for the bone",
         default=False,
         options=set(),
-        update=event_dirty,
+        update=event_bone_dirty,
     )
 
     type: bpy.props.EnumProperty(
@@ -291,7 +344,7 @@ class Bone(bpy.types.PropertyGroup, ShapeProperties):
             ('PASSIVE', "Passive", "Bone stays still unless manually moved", 0),
             ('ACTIVE', "Active", "Bone automatically moves", 1),
         ],
-        update=event_dirty,
+        update=event_bone_dirty,
     )
 
     mass: bpy.props.FloatProperty(
@@ -322,7 +375,7 @@ class Bone(bpy.types.PropertyGroup, ShapeProperties):
             None,
             ('COMPOUND', "Compound", "Combines multiple hitboxes into one hitbox", shape_icon('COMPOUND'), 7),
         ],
-        update=event_dirty,
+        update=event_bone_dirty,
     )
 
     friction: bpy.props.FloatProperty(
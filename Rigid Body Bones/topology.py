@@ -0,0 +1,121 @@
+from . import utils
+
+
+# Armature key -> Topology
+cache = {}
+
+
+def add_child(children, data):
+    siblings = children.get(data.parent)
+
+    if siblings is None:
+        siblings = []
+        children[data.parent] = siblings
+
+    siblings.append(data.name)
+
+
+# This stores the bone hierarchy of an armature, so that it doesn't need to be
+# recalculated for every update.
+#
+# Blender recreates the bones when leaving Edit mode, so it only stores names
+# and indexes, never the bones themselves.
+class Topology:
+    def __init__(self, armature):
+        bones = armature.data.bones
+
+        self.pointer = armature.data.as_pointer()
+
+        # Bone names, in the same order as armature.data.bones
+        self.names = bones.keys()
+
+        count = len(self.names)
+
+        # Bone name -> index
+        self.indexes = {name: i for i, name in enumerate(self.names)}
+
+        # Index of the parent bone, or -1 if it doesn't have a parent
+        self.parents = [-1] * count
+
+        # Indexes of the child bones
+        self.children = [[] for _ in range(count)]
+
+        # Fast lookup for stored bone names -> current bone name
+        self.stored_names = {}
+
+        # Fast lookup for stored bone names -> stored names of the child bones
+        self.stored_children = {}
+
+        for i, bone in enumerate(bones):
+            parent = bone.parent
+
+            if parent is not None:
+                index = self.indexes[parent.name]
+                self.parents[i] = index
+                self.children[index].append(i)
+
+            data = bone.rigid_body_bones
+
+            if data.is_property_set("name"):
+                self.stored_names[data.name] = bone.name
+                add_child(self.stored_children, data)
+
+        # Indexes of every bone, parents are always before their children.
+        #
+        # This uses a loop instead of recursion, because chains can have thousands of bones.
+        self.order = []
+
+        pending = [i for i in reversed(range(count)) if self.parents[i] == -1]
+
+        while pending:
+            index = pending.pop()
+            self.order.append(index)
+            pending.extend(reversed(self.children[index]))
+
+
+    # Renaming, adding or removing bones changes the names, so this also catches
+    # changes which didn't go through the add-on (e.g. scripts).
+    def is_valid(self, armature):
+        return self.pointer == armature.data.as_pointer() and self.names == armature.data.bones.keys()
+
+
+    # Names of the bones and all of their descendants
+    def descendants(self, names):
+        output = set()
+
+        pending = [self.indexes[name] for name in names if name in self.indexes]
+
+        while pending:
+            index = pending.pop()
+            name = self.names[index]
+
+            if name not in output:
+                output.add(name)
+                pending.extend(self.children[index])
+
+        return output
+
+
+def get(armature):
+    key = utils.armature_key(armature)
+    topology = cache.get(key)
+
+    if topology is None or not topology.is_valid(armature):
+        topology = Topology(armature)
+        cache[key] = topology
+
+    return topology
+
+
+# This must be called after the bone parents or the stored parents are changed
+def invalidate(armature):
+    cache.pop(utils.armature_key(armature), None)
+
+
+def reload(armature):
+    invalidate(armature)
+    return get(armature)
+
+
+def clear():
+    cache.clear()
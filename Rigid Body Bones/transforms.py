@@ -0,0 +1,328 @@
+import numpy as np
+from math import radians
+
+
+# Converts XYZ Euler rotations (n, 3) into rotation matrices (n, 3, 3)
+#
+# Based on eul_to_mat3 in source/blender/blenlib/intern/math_rotation.c
+def euler_to_matrix(euler):
+    ci = np.cos(euler[:, 0])
+    cj = np.cos(euler[:, 1])
+    ch = np.cos(euler[:, 2])
+    si = np.sin(euler[:, 0])
+    sj = np.sin(euler[:, 1])
+    sh = np.sin(euler[:, 2])
+
+    cc = ci * ch
+    cs = ci * sh
+    sc = si * ch
+    ss = si * sh
+
+    matrix = np.empty((len(euler), 3, 3))
+
+    matrix[:, 0, 0] = cj * ch
+    matrix[:, 0, 1] = sj * sc - cs
+    matrix[:, 0, 2] = sj * cc + ss
+    matrix[:, 1, 0] = cj * sh
+    matrix[:, 1, 1] = sj * ss + cc
+    matrix[:, 1, 2] = sj * cs - sc
+    matrix[:, 2, 0] = -sj
+    matrix[:, 2, 1] = cj * si
+    matrix[:, 2, 2] = cj * ci
+
+    return matrix
+
+
+# Converts rotation matrices (n, 3, 3) into XYZ Euler rotations (n, 3)
+#
+# Based on mat3_normalized_to_eul in source/blender/blenlib/intern/math_rotation.c
+def matrix_to_euler(matrix):
+    cy = np.hypot(matrix[:, 0, 0], matrix[:, 1, 0])
+
+    euler1 = np.stack((
+        np.arctan2(matrix[:, 2, 1], matrix[:, 2, 2]),
+        np.arctan2(-matrix[:, 2, 0], cy),
+        np.arctan2(matrix[:, 1, 0], matrix[:, 0, 0]),
+    ), axis=1)
+
+    euler2 = np.stack((
+        np.arctan2(-matrix[:, 2, 1], -matrix[:, 2, 2]),
+        np.arctan2(-matrix[:, 2, 0], -cy),
+        np.arctan2(-matrix[:, 1, 0], -matrix[:, 0, 0]),
+    ), axis=1)
+
+    # Gimbal lock
+    locked = (cy <= 16.0 * np.finfo(np.float32).eps)
+
+    euler1[locked, 0] = np.arctan2(-matrix[locked, 1, 2], matrix[locked, 1, 1])
+    euler1[locked, 2] = 0.0
+    euler2[locked] = euler1[locked]
+
+    # Blender picks the rotation with the smallest angles
+    use_euler2 = np.abs(euler1).sum(axis=1) > np.abs(euler2).sum(axis=1)
+
+    return np.where(use_euler2[:, None], euler2, euler1)
+
+
+# Axis indexes and parity for each Euler order
+#
+# Copied from source/blender/blenlib/intern/math_rotation.c
+EULER_ORDERS = {
+    'XYZ': ((0, 1, 2), False),
+    'XZY': ((0, 2, 1), True),
+    'YXZ': ((1, 0, 2), True),
+    'YZX': ((1, 2, 0), False),
+    'ZXY': ((2, 0, 1), False),
+    'ZYX': ((2, 1, 0), True),
+}
+
+
+# Converts rotation matrices (n, 3, 3) into Euler rotations (n, 3) with any order
+#
+# Based on mat3_normalized_to_eulO2 in source/blender/blenlib/intern/math_rotation.c
+def matrix_to_euler_order(matrix, order):
+    (i, j, k), parity = EULER_ORDERS[order]
+
+    cy = np.hypot(matrix[:, i, i], matrix[:, j, i])
+
+    euler1 = np.empty((len(matrix), 3))
+    euler1[:, i] = np.arctan2(matrix[:, k, j], matrix[:, k, k])
+    euler1[:, j] = np.arctan2(-matrix[:, k, i], cy)
+    euler1[:, k] = np.arctan2(matrix[:, j, i], matrix[:, i, i])
+
+    euler2 = np.empty((len(matrix), 3))
+    euler2[:, i] = np.arctan2(-matrix[:, k, j], -matrix[:, k, k])
+    euler2[:, j] = np.arctan2(-matrix[:, k, i], -cy)
+    euler2[:, k] = np.arctan2(-matrix[:, j, i], -matrix[:, i, i])
+
+    # Gimbal lock
+    locked = (cy <= 16.0 * np.finfo(np.float32).eps)
+
+    euler1[locked, i] = np.arctan2(-matrix[locked, j, k], matrix[locked, j, j])
+    euler1[locked, k] = 0.0
+    euler2[locked] = euler1[locked]
+
+    if parity:
+        euler1 = -euler1
+        euler2 = -euler2
+
+    # Blender picks the rotation with the smallest angles
+    use_euler2 = np.abs(euler1).sum(axis=1) > np.abs(euler2).sum(axis=1)
+
+    return np.where(use_euler2[:, None], euler2, euler1)
+
+
+# Converts rotation matrices (n, 3, 3) into (w, x, y, z) quaternions (n, 4)
+#
+# Based on mat3_normalized_to_quat in source/blender/blenlib/intern/math_rotation.c
+def matrix_to_quaternion(matrix):
+    m00 = matrix[:, 0, 0]
+    m11 = matrix[:, 1, 1]
+    m22 = matrix[:, 2, 2]
+    trace = m00 + m11 + m22
+
+    # The biggest of these is used, because it is the most accurate
+    cases = np.stack((trace, m00, m11, m22), axis=1)
+    case = np.argmax(cases, axis=1)
+
+    # The square root is clamped, because the unused cases can be negative
+    s = np.sqrt(np.maximum(1.0 + 2.0 * cases[np.arange(len(matrix)), case] - trace, 0.0)) * 2.0
+    s[s == 0.0] = 1.0
+
+    quaternion = np.empty((len(matrix), 4))
+
+    m01 = matrix[:, 0, 1]
+    m02 = matrix[:, 0, 2]
+    m10 = matrix[:, 1, 0]
+    m12 = matrix[:, 1, 2]
+    m20 = matrix[:, 2, 0]
+    m21 = matrix[:, 2, 1]
+
+    quaternion[:, 0] = np.choose(case, (0.25 * s, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s))
+    quaternion[:, 1] = np.choose(case, ((m21 - m12) / s, 0.25 * s, (m01 + m10) / s, (m02 + m20) / s))
+    quaternion[:, 2] = np.choose(case, ((m02 - m20) / s, (m01 + m10) / s, 0.25 * s, (m12 + m21) / s))
+    quaternion[:, 3] = np.choose(case, ((m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, 0.25 * s))
+
+    return quaternion / np.linalg.norm(quaternion, axis=1)[:, None]
+
+
+# Converts quaternions (n, 4) into (angle, x, y, z) axis angle rotations (n, 4)
+#
+# Based on quat_to_axis_angle in source/blender/blenlib/intern/math_rotation.c
+def quaternion_to_axis_angle(quaternion):
+    half_angle = np.arccos(np.clip(quaternion[:, 0], -1.0, 1.0))
+    sin = np.sin(half_angle)
+    sin[np.abs(sin) < np.finfo(np.float32).eps] = 1.0
+
+    axis = quaternion[:, 1:] / sin[:, None]
+    axis[np.all(axis == 0.0, axis=1), 1] = 1.0
+
+    return np.concatenate(((half_angle * 2.0)[:, None], axis), axis=1)
+
+
+def rotation_x(angle):
+    return euler_to_matrix(np.array([[angle, 0.0, 0.0]]))[0]
+
+
+ROTATE_X_90 = rotation_x(radians(90.0))
+ROTATE_X_MINUS_90 = rotation_x(radians(-90.0))
+
+
+# Reads a float property for every item in the collection
+def read_floats(collection, name, shape):
+    values = np.empty(len(collection) * int(np.prod(shape)), dtype=np.float32)
+    collection.foreach_get(name, values)
+    return values.reshape((len(collection),) + shape).astype(np.float64)
+
+
+# Shape properties of Bone / Compound properties, as arrays
+class Shapes:
+    def __init__(self, datas):
+        count = len(datas)
+
+        self.location = np.zeros((count, 3))
+        self.rotation = np.zeros((count, 3))
+        self.scale = np.zeros((count, 3))
+        self.scale_y = np.zeros(count)
+        self.origin = np.zeros(count)
+
+        for i, data in enumerate(datas):
+            self.location[i] = data.location
+            self.rotation[i] = data.rotation
+            self.origin[i] = data.origin
+
+            shape = data.collision_shape
+
+            if shape == 'BOX':
+                self.scale[i] = data.scale
+                self.scale_y[i] = data.scale[1]
+
+            elif shape == 'SPHERE':
+                self.scale[i] = data.scale_diameter
+                self.scale_y[i] = data.scale_diameter
+
+            else:
+                self.scale[i] = (data.scale_width, data.scale_length, data.scale_width)
+                self.scale_y[i] = data.scale_length
+
+
+    # Same as rotating Vector((0.0, y, 0.0)) by the rotation
+    def rotate_y(self, y):
+        return euler_to_matrix(self.rotation)[:, :, 1] * y[:, None]
+
+
+    def dimensions(self, length):
+        return (self.scale * length[:, None]) @ ROTATE_X_90.T
+
+
+    def location_from_origin(self, length):
+        origin = length * (self.origin - 0.5)
+
+        location = self.rotate_y(-origin * self.scale_y)
+        location[:, 1] += origin - (length * 0.5)
+        location += self.location
+        return location
+
+
+# Dimensions of one hitbox, the same as Transforms.hitbox_dimensions / compound_dimensions
+def shape_dimensions(data, length):
+    return Shapes([data]).dimensions(np.array([length], dtype=np.float64))[0]
+
+
+# This calculates the hitbox, origin and joint transforms for many bones at once.
+#
+# The bone data is read with foreach_get, so it must be recreated whenever the
+# bones change (e.g. after switching modes).
+class Transforms:
+    def __init__(self, bones, names=None):
+        head = read_floats(bones, "head_local", (3,))
+        tail = read_floats(bones, "tail_local", (3,))
+        length = read_floats(bones, "length", ())
+        # Blender matrices are column major
+        matrix = read_floats(bones, "matrix_local", (4, 4)).transpose(0, 2, 1)
+
+        if names is None:
+            selected = list(bones)
+            rows = np.arange(len(bones))
+
+        else:
+            selected = [bones[name] for name in names]
+            rows = np.array([bones.find(bone.name) for bone in selected], dtype=np.int64)
+
+        # Bone name -> index into the arrays
+        self.indexes = {bone.name: i for i, bone in enumerate(selected)}
+
+        datas = [bone.rigid_body_bones for bone in selected]
+
+        count = len(selected)
+
+        head = head[rows]
+        tail = tail[rows]
+        length = length[rows]
+        rotation = matrix[rows, :3, :3]
+
+        is_active = np.array([data.type == 'ACTIVE' for data in datas], dtype=bool)
+        is_compound = np.array([data.collision_shape == 'COMPOUND' for data in datas], dtype=bool)
+
+        shapes = Shapes(datas)
+
+
+        # Hitbox
+        location = shapes.location_from_origin(length)
+        compound_location = shapes.location.copy()
+        compound_location[:, 1] += length * (shapes.origin - 1.0)
+        location[is_compound] = compound_location[is_compound]
+
+        active_location = np.einsum("nij,nj->ni", rotation, location) + tail
+        location[is_active] = active_location[is_active]
+
+        hitbox_rotation = euler_to_matrix(shapes.rotation)
+        active_rotation = rotation @ hitbox_rotation
+        hitbox_rotation[is_active] = active_rotation[is_active]
+
+        self.hitbox_location = location
+        self.hitbox_rotation = matrix_to_euler(hitbox_rotation @ ROTATE_X_90)
+        self.hitbox_dimensions = shapes.dimensions(length)
+
+
+        # Origin
+        self.origin_size = length * 0.05
+        self.origin_location = np.zeros((count, 3))
+        self.origin_location[:, 2] = np.where(is_compound, 0.0, (length * (0.5 - shapes.origin)) * shapes.scale_y)
+
+
+        # Joint
+        self.joint_location = head
+        self.joint_rotation = matrix_to_euler(rotation)
+
+
+        # Compounds
+        owners = []
+        compounds = []
+
+        # Index of the bone -> index of its first compound
+        self.compound_start = np.zeros(count, dtype=np.int64)
+
+        for i, data in enumerate(datas):
+            self.compound_start[i] = len(compounds)
+
+            if is_compound[i]:
+                for compound in data.compounds:
+                    owners.append(i)
+                    compounds.append(compound)
+
+        owners = np.array(owners, dtype=np.int64)
+        compound_shapes = Shapes(compounds)
+        compound_length = length[owners]
+
+        # Relative to the hitbox origin
+        location = compound_shapes.location_from_origin(compound_length)
+        location[:, 1] -= compound_length * (shapes.origin[owners] - 1.0)
+
+        self.compound_location = location @ ROTATE_X_MINUS_90.T
+        self.compound_rotation = matrix_to_euler(ROTATE_X_MINUS_90 @ euler_to_matrix(compound_shapes.rotation) @ ROTATE_X_90)
+        self.compound_dimensions = compound_shapes.dimensions(compound_length)
+
+
+    def index(self, bone):
+        return self.indexes[bone.name]
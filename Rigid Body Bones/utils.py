@@ -2,9 +2,10 @@ import re
 import sys
 import time
 import bpy
-import bmesh
+import numpy as np
 from math import radians
 from mathutils import Vector, Euler, Matrix
+from . import profiler
 
 
 DEBUG = False
@@ -33,13 +34,15 @@ def timed(name):
 
             time_start = time.time()
 
-            f(*args)
+            result = f(*args)
 
             time_end = time.time()
             print_time(time_start, time_end)
 
             debug("}")
 
+            return result
+
         return update
     return decorator
 
@@ -73,18 +76,37 @@ def if_armature_enabled(f):
     return update
 
 
+# This makes the object active for an operator, without changing the selection
+def object_override(context, obj):
+    override = context.copy()
+    override["active_object"] = obj
+    override["object"] = obj
+    override["selected_objects"] = [obj]
+    override["selected_editable_objects"] = [obj]
+
+    if obj.mode == 'EDIT':
+        override["edit_object"] = obj
+
+    return override
+
+
+# The object is passed explicitly, because sliced updates can run after
+# the user has selected a different object.
 class Mode:
-    def __init__(self, context, mode):
+    def __init__(self, context, obj, mode):
         self.context = context
+        self.obj = obj
         self.mode = mode
         self.old_mode = None
 
     def __enter__(self):
-        self.old_mode = self.context.active_object.mode
-        bpy.ops.object.mode_set(mode=self.mode)
+        self.old_mode = self.obj.mode
+        bpy.ops.object.mode_set(object_override(self.context, self.obj), mode=self.mode)
+        profiler.count("operator_calls")
 
     def __exit__(self, exc_type, exc_value, traceback):
-        bpy.ops.object.mode_set(mode=self.old_mode)
+        bpy.ops.object.mode_set(object_override(self.context, self.obj), mode=self.old_mode)
+        profiler.count("operator_calls")
         return False
 
 
@@ -133,8 +155,9 @@ class Selectable:
 
 
 def reset_frame(context):
-    scene = context.scene
-    scene.frame_set(scene.rigidbody_world.point_cache.frame_start)
+    with profiler.phase("reset_frame"):
+        scene = context.scene
+        scene.frame_set(scene.rigidbody_world.point_cache.frame_start)
 
 
 def get_active_bone(armature):
@@ -170,15 +193,124 @@ def select_active(context, obj):
     context.view_layer.objects.active = obj
 
 
+def is_same_value(old, new):
+    # Blender stores floats with single precision
+    if isinstance(old, float):
+        return old == np.float32(new)
+
+    elif old is None or isinstance(old, (bool, int, str, bpy.types.bpy_struct)):
+        return old == new
+
+    # Vectors / arrays
+    else:
+        old = np.asarray(old)
+
+        if old.dtype.kind == 'f':
+            return np.array_equal(old, np.asarray(new, dtype=np.float32))
+
+        else:
+            return np.array_equal(old, np.asarray(new, dtype=old.dtype))
+
+
+# Every property write tags the depsgraph and resets the point cache, so
+# this skips the write if the property already has the same value.
+def set_property(struct, name, value):
+    if is_same_value(getattr(struct, name), value):
+        profiler.count("writes_skipped")
+
+    else:
+        setattr(struct, name, value)
+        profiler.count("writes")
+
+
+# Renaming an ID sorts the bpy.data list, so it only renames if the name is different
+def set_name(id, name):
+    set_property(id, "name", name)
+
+
 def set_parent(child, parent):
-    child.parent = parent
-    child.parent_type = 'OBJECT'
+    set_property(child, "parent", parent)
+    set_property(child, "parent_type", 'OBJECT')
 
 
 def set_bone_parent(child, parent, bone):
-    child.parent = parent
-    child.parent_type = 'BONE'
-    child.parent_bone = bone
+    set_property(child, "parent", parent)
+    set_property(child, "parent_type", 'BONE')
+    set_property(child, "parent_bone", bone)
+
+
+def rigid_body_world(context):
+    scene = context.scene
+
+    if scene.rigidbody_world is None:
+        bpy.ops.rigidbody.world_add()
+        profiler.count("operator_calls")
+
+    return scene.rigidbody_world
+
+
+# This creates rigid bodies / constraints without using operators or changing the selection.
+#
+# The objects are linked into the rigid body world collections, and then Blender
+# creates the missing rigid bodies / constraints for all of the objects at once.
+class RigidBodies:
+    def __init__(self, context):
+        self.context = context
+        self.objects = []
+        self.constraints = []
+
+    # The setup function is called after the rigid body is created
+    def add_object(self, object, setup=None):
+        self.objects.append((object, setup))
+
+    # The setup function is called after the rigid body constraint is created
+    def add_constraint(self, object, setup=None):
+        self.constraints.append((object, setup))
+
+    def flush(self):
+        if len(self.objects) == 0 and len(self.constraints) == 0:
+            return
+
+        world = rigid_body_world(self.context)
+
+        if len(self.objects) != 0:
+            collection = world.collection
+
+            if not collection:
+                collection = bpy.data.collections.new("RigidBodyWorld")
+
+            for object, setup in self.objects:
+                collection.objects.link(object)
+
+            # Assigning the collection validates it, which creates the missing rigid bodies
+            world.collection = collection
+
+        if len(self.constraints) != 0:
+            collection = world.constraints
+
+            if not collection:
+                collection = bpy.data.collections.new("RigidBodyConstraints")
+
+            for object, setup in self.constraints:
+                collection.objects.link(object)
+
+            # Assigning the collection validates it, which creates the missing constraints
+            world.constraints = collection
+
+        for object, setup in self.objects:
+            assert object.rigid_body is not None
+
+            if setup is not None:
+                setup(object)
+
+        for object, setup in self.constraints:
+            assert object.rigid_body_constraint is not None
+
+            if setup is not None:
+                setup(object)
+
+        self.objects.clear()
+        self.constraints.clear()
 
 
 def make_collection(name, parent):
@@ -191,9 +323,17 @@ def remove_object(object):
     data = object.data
 
     bpy.data.objects.remove(object)
+    profiler.count("objects_removed")
 
     if data is not None:
-        bpy.data.meshes.remove(data)
+        release_mesh(data)
+
+
+# Meshes can be shared between multiple objects, so this only removes it if it's unused
+def release_mesh(mesh):
+    if mesh.users == 0:
+        bpy.data.meshes.remove(mesh)
+        profiler.count("meshes_removed")
 
 
 def safe_remove_collection(collection):
@@ -206,10 +346,11 @@ def safe_remove_collection(collection):
 
 
 def remove_collection_recursive(collection):
-    for child in collection.objects:
+    # The objects / collections are removed while looping, so it must loop over a copy
+    for child in list(collection.objects):
         remove_object(child)
 
-    for sub in collection.children:
+    for sub in list(collection.children):
         remove_collection_recursive(sub)
 
     assert len(collection.children) == 0 and len(collection.objects) == 0
@@ -217,28 +358,162 @@ def remove_collection_recursive(collection):
     bpy.data.collections.remove(collection)
 
 
+# Unit cube, centered on the origin
+CUBE_VERTICES = np.array([
+    (-0.5, -0.5, -0.5),
+    (-0.5, -0.5,  0.5),
+    (-0.5,  0.5, -0.5),
+    (-0.5,  0.5,  0.5),
+    ( 0.5, -0.5, -0.5),
+    ( 0.5, -0.5,  0.5),
+    ( 0.5,  0.5, -0.5),
+    ( 0.5,  0.5,  0.5),
+], dtype=np.float32)
+
+CUBE_FACES = [
+    (0, 1, 3, 2),
+    (4, 6, 7, 5),
+    (0, 4, 5, 1),
+    (2, 3, 7, 6),
+    (0, 2, 6, 4),
+    (1, 5, 7, 3),
+]
+
+
+# The cube topology is only created once, after that it only moves the vertices
 def set_mesh_cube(mesh, dimensions):
-    bm = bmesh.new()
-    bmesh.ops.create_cube(bm, size=1.0, calc_uvs=False)
-    bmesh.ops.scale(bm, vec=dimensions, verts=bm.verts)
-    bm.to_mesh(mesh)
-    bm.free()
+    coordinates = (CUBE_VERTICES * np.asarray(dimensions, dtype=np.float32)).ravel()
+
+    if len(mesh.vertices) != 8 or len(mesh.polygons) != 6:
+        mesh.clear_geometry()
+        mesh.from_pydata(CUBE_VERTICES.tolist(), [], CUBE_FACES)
+
+    else:
+        current = np.empty(len(coordinates), dtype=np.float32)
+        mesh.vertices.foreach_get("co", current)
+
+        # The dimensions haven't changed, so it doesn't need to update the mesh
+        if np.array_equal(current, coordinates):
+            return
+
+    mesh.vertices.foreach_set("co", coordinates)
+    mesh.update()
 
 
-# TODO is there a faster way ?
 def clear_mesh(mesh):
-    bm = bmesh.new()
-    bm.to_mesh(mesh)
-    bm.free()
+    if len(mesh.vertices) != 0:
+        mesh.clear_geometry()
+
+
+SHARED_MESH_PREFIX = "RigidBodyBones Mesh "
+
+# Hitboxes whose dimensions are closer than this use the same shared mesh
+SHARED_MESH_QUANTUM = 0.0001
+
+# Names of the shared meshes which have been used, so the unused ones can be
+# removed without looping over every mesh in the file
+shared_meshes = set()
+
+
+def is_shared_mesh(mesh):
+    return mesh.name.startswith(SHARED_MESH_PREFIX)
+
+
+# Shared meshes are found by name, so the mesh name contains the quantized dimensions
+def shared_mesh_name(dimensions):
+    steps = np.round(np.asarray(dimensions, dtype=np.float64) / SHARED_MESH_QUANTUM).astype(np.int64)
+    return SHARED_MESH_PREFIX + "[{} {} {}]".format(*steps)
+
+
+def get_shared_mesh(dimensions):
+    name = shared_mesh_name(dimensions)
+    mesh = bpy.data.meshes.get(name)
+
+    if mesh is None:
+        mesh = bpy.data.meshes.new(name)
+        profiler.count("meshes_created")
+
+        steps = np.round(np.asarray(dimensions, dtype=np.float64) / SHARED_MESH_QUANTUM)
+        set_mesh_cube(mesh, steps * SHARED_MESH_QUANTUM)
+
+    shared_meshes.add(name)
+
+    return mesh
+
+
+def set_shared_mesh_cube(object, dimensions):
+    name = shared_mesh_name(dimensions)
+    old_mesh = object.data
+
+    if old_mesh.name != name:
+        object.data = get_shared_mesh(dimensions)
+
+        release_mesh(old_mesh)
+
+    else:
+        # The mesh might have been created by an earlier session
+        shared_meshes.add(name)
+
+
+# Makes sure that the object has its own mesh, and it's not using a shared mesh
+def own_mesh(object):
+    old_mesh = object.data
 
+    if old_mesh.users > 1 or is_shared_mesh(old_mesh):
+        object.data = bpy.data.meshes.new(name=object.name)
+        profiler.count("meshes_created")
+        release_mesh(old_mesh)
+
+    return object.data
+
+
+def set_hitbox_mesh(object, dimensions, shared):
+    if shared:
+        set_shared_mesh_cube(object, dimensions)
+
+    else:
+        set_mesh_cube(own_mesh(object), dimensions)
+
+
+def remove_unused_shared_meshes():
+    for name in list(shared_meshes):
+        mesh = bpy.data.meshes.get(name)
+
+        if mesh is None:
+            shared_meshes.discard(name)
+
+        elif mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+            shared_meshes.discard(name)
+            profiler.count("meshes_removed")
+
+
+# If mesh is None then the object gets its own mesh
+def make_mesh_object(name, collection, mesh=None):
+    if mesh is None:
+        mesh = bpy.data.meshes.new(name=name)
+        profiler.count("meshes_created")
 
-def make_mesh_object(name, collection):
-    mesh = bpy.data.meshes.new(name=name)
     cube = bpy.data.objects.new(name, mesh)
+    profiler.count("objects_created")
     collection.objects.link(cube)
     return cube
 
 
+re_bone_path = re.compile(r'^bones\["((?:[^"\\]|\\.)*)"\]')
+re_unescape = re.compile(r"\\(.)")
+
+# Returns the name of the Bone which owns the Bone / Compound properties
+def owner_bone_name(data):
+    match = re_bone_path.match(data.path_from_id())
+
+    if match is None:
+        return None
+
+    else:
+        return re_unescape.sub(r"\1", match.group(1))
+
+
 re_strip = re.compile(r"\.[0-9]+$")
 
 # TODO is there a builtin utility for this ?
@@ -259,3 +534,25 @@ def make_unique_name(prefix, seen):
 
         else:
             return new_name
+
+
+# The armatures are keyed by their pointer instead of their name (e.g. in the
+# dirty armatures, queued events and sliced updates), because the object can
+# be renamed before it is updated.
+def armature_key(armature):
+    return armature.as_pointer()
+
+
+# Returns None if the armature was deleted, the name is only used to find it quickly
+def get_armature(key, name):
+    armature = bpy.data.objects.get(name)
+
+    if armature is not None and armature.as_pointer() == key:
+        return armature
+
+    # It was renamed after it was stored
+    for armature in bpy.data.objects:
+        if armature.type == 'ARMATURE' and armature.as_pointer() == key:
+            return armature
+
+    return None
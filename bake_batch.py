@@ -0,0 +1,583 @@
+# Bakes the rigid body bones of many .blend files at the same time, using a pool of Blender processes.
+#
+#     python bake_batch.py --jobs 8 shots/*.blend
+#
+# Each job starts `blender --background`, which loads the file, updates every
+# armature which has rigid body physics, bakes it over the scene's frame range,
+# and saves the file. The report contains the time and peak memory of every
+# job, and the bake time of every armature.
+#
+# A shot can be a whole .blend file (which bakes its active scene) or a single
+# scene inside of the file:
+#
+#     python bake_batch.py --jobs 8 sh010.blend:Main sh020.blend:Main sh020.blend:Insert
+#
+# The scenes of the same file are always baked by the same job, because the
+# file can only be saved by one process at a time.
+#
+# The simulation runs on a single thread, so each job only gets a few of the
+# cores, and the number of jobs should usually be the number of cores. With
+# --cache the bake cache (see README.md) is shared by every job, so re-baking
+# shots which didn't change is very fast.
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import signal
+import argparse
+import platform
+import tempfile
+import importlib
+import threading
+import subprocess
+import concurrent.futures
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+
+# Blender has already imported bpy, so this is only true for the jobs
+IS_BLENDER = "bpy" in sys.modules
+
+if IS_BLENDER:
+    import bpy
+
+# How often the jobs are checked for timeouts, in seconds
+POLL_INTERVAL = 0.1
+
+
+def parse_args():
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    elif IS_BLENDER:
+        argv = []
+    else:
+        argv = sys.argv[1:]
+
+    cores = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(prog="bake_batch.py", description="Bakes rigid body bones in many .blend files at the same time.")
+    parser.add_argument("shots", nargs="*", help="FILE.blend or FILE.blend:SCENE")
+    parser.add_argument("--list", help="Text file with one shot per line, in addition to the shots on the command line")
+    parser.add_argument("--jobs", type=int, default=cores, help="Number of Blender processes which run at the same time")
+    parser.add_argument("--threads", type=int, default=0, help="Number of threads for each Blender process (default: cores / jobs)")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Path to the Blender executable")
+    parser.add_argument("--output-dir", help="Save the baked files in this folder, instead of overwriting them. The folders of the files are kept, relative to the folder which contains all of them")
+    parser.add_argument("--timeout", type=float, default=0, help="Kill jobs which take longer than this many seconds")
+    parser.add_argument("--logs", help="Folder for the output of each job (default: a temporary folder)")
+    parser.add_argument("--report", help="Save the report as JSON")
+
+    # These are the same as the options of the Bake to Keyframes operator
+    parser.add_argument("--keep-physics", action="store_true", help="Don't disable the rigid body physics after baking")
+    parser.add_argument("--reduce", action="store_true", help="Reduce the baked keyframes")
+    parser.add_argument("--location-tolerance", type=float)
+    parser.add_argument("--rotation-tolerance", type=float, help="In degrees")
+    parser.add_argument("--scale-tolerance", type=float)
+    parser.add_argument("--cache", action="store_true", help="Reuse the simulation of previous bakes with the same settings, see README.md")
+
+    # Used internally, when this script runs inside of Blender
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scenes", nargs="*", default=[], help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+
+# Bake options which are passed to every job
+def bake_options(args):
+    options = []
+
+    if args.keep_physics:
+        options.append("--keep-physics")
+
+    if args.reduce:
+        options.append("--reduce")
+
+    if args.cache:
+        options.append("--cache")
+
+    for name in ("location_tolerance", "rotation_tolerance", "scale_tolerance"):
+        value = getattr(args, name)
+
+        if value is not None:
+            options.extend(("--" + name.replace("_", "-"), repr(value)))
+
+    return options
+
+
+# Job
+# ---
+
+
+# The add-on folder has spaces in its name, so it can't be imported with a normal import statement
+def load_addon():
+    if dir_path not in sys.path:
+        sys.path.insert(0, dir_path)
+
+    addon = importlib.import_module("Rigid Body Bones")
+
+    # It might already be enabled in the user preferences
+    if not hasattr(bpy.types.Armature, "rigid_body_bones"):
+        addon.register()
+
+    return addon
+
+
+# Blender 3.2 replaced the context dictionary with Context.temp_override
+def call_operator(operator, override, **properties):
+    if hasattr(bpy.context, "temp_override"):
+        with bpy.context.temp_override(**override):
+            return operator(**properties)
+
+    else:
+        return operator(override, **properties)
+
+
+def count_keyframes(armature):
+    animation_data = armature.animation_data
+
+    if animation_data is None or animation_data.action is None:
+        return 0
+
+    return sum(len(fcurve.keyframe_points) for fcurve in animation_data.action.fcurves)
+
+
+def bake_armature(addon, args, scene, view_layer, armature):
+    result = {
+        "scene": scene.name,
+        "armature": armature.name,
+        "status": "FAILED",
+        "cached": False,
+        "keyframes": 0,
+        "seconds": 0.0,
+    }
+
+    start = time.perf_counter()
+
+    try:
+        view_layer.objects.active = armature
+
+        override = {
+            "scene": scene,
+            "view_layer": view_layer,
+            "active_object": armature,
+            "object": armature,
+        }
+
+        call_operator(bpy.ops.rigid_body_bones.update, override, full=True)
+
+        properties = {
+            "frame_start": scene.frame_start,
+            "frame_end": scene.frame_end,
+            "disable": not args.keep_physics,
+            "reduce": args.reduce,
+            "use_cache": args.cache,
+        }
+
+        if args.location_tolerance is not None:
+            properties["location_tolerance"] = args.location_tolerance
+
+        if args.rotation_tolerance is not None:
+            properties["rotation_tolerance"] = math.radians(args.rotation_tolerance)
+
+        if args.scale_tolerance is not None:
+            properties["scale_tolerance"] = args.scale_tolerance
+
+        status = call_operator(bpy.ops.rigid_body_bones.bake, override, **properties)
+
+        # The operator remembers whether it used the cache, so the hash isn't calculated twice
+        result["cached"] = args.cache and addon.utils.armature_key(armature) in addon.cache.cached_bakes
+
+        # The operator is cancelled if there are no Active bones
+        result["status"] = "FINISHED" if 'FINISHED' in status else "SKIPPED"
+        result["keyframes"] = count_keyframes(armature)
+
+    # Operator errors are raised as RuntimeError
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["seconds"] = time.perf_counter() - start
+
+    print("Baked {} in {} ({:.2f}s): {}".format(armature.name, scene.name, result["seconds"], result["status"]), flush=True)
+
+    return result
+
+
+def run_worker(args):
+    addon = load_addon()
+
+    output = {
+        "file": bpy.data.filepath,
+        "blender": bpy.app.version_string,
+        "armatures": [],
+        "saved": None,
+    }
+
+    try:
+        if len(args.scenes) == 0:
+            scenes = [bpy.context.scene]
+
+        else:
+            scenes = [bpy.data.scenes[name] for name in args.scenes]
+
+        for scene in scenes:
+            view_layer = scene.view_layers[0]
+
+            # Sorted so that the order of the bakes doesn't depend on the file
+            armatures = sorted(
+                (obj for obj in view_layer.objects if obj.type == 'ARMATURE' and obj.data.rigid_body_bones.enabled),
+                key=lambda obj: obj.name,
+            )
+
+            for armature in armatures:
+                output["armatures"].append(bake_armature(addon, args, scene, view_layer, armature))
+
+        # A partly baked file is not saved, so the job can be run again
+        if all(result["status"] != "FAILED" for result in output["armatures"]):
+            if args.output:
+                path = args.output
+                bpy.ops.wm.save_as_mainfile(filepath=path)
+
+            else:
+                path = bpy.data.filepath
+                bpy.ops.wm.save_mainfile()
+
+            output["saved"] = path
+
+    except Exception as e:
+        output["error"] = str(e)
+
+    with open(args.result, "w") as file:
+        json.dump(output, file, indent=4)
+
+
+# Pool
+# ----
+
+
+# Returns (file, [scene names]) for every file, in the same order as the shots
+def group_shots(shots):
+    files = {}
+
+    for shot in shots:
+        path, separator, scene = shot.rpartition(":")
+
+        # Only a name after the .blend file is a scene, the path might contain a ":"
+        if separator == "" or not path.lower().endswith(".blend"):
+            path = shot
+            scene = None
+
+        scenes = files.setdefault(os.path.abspath(path), [])
+
+        if scene is not None and scene not in scenes:
+            scenes.append(scene)
+
+    return list(files.items())
+
+
+# Returns the output path of every file. Files with the same name in different
+# folders must not overwrite each other, so the folders are kept.
+def output_paths(paths, output_dir):
+    root = os.path.commonpath([os.path.dirname(path) for path in paths])
+
+    return {path: os.path.join(os.path.abspath(output_dir), os.path.relpath(path, root)) for path in paths}
+
+
+# Returns the output paths which are used by more than one file, e.g. on a case-insensitive file system
+def output_collisions(outputs):
+    paths = {}
+
+    for path, output in outputs.items():
+        paths.setdefault(os.path.normcase(output), []).append(path)
+
+    return [files for files in paths.values() if len(files) > 1]
+
+
+def read_list(path):
+    with open(path) as file:
+        return [line.strip() for line in file if line.strip() != "" and not line.lstrip().startswith("#")]
+
+
+class Job:
+    def __init__(self, index, path, scenes, save_path, log_dir):
+        self.index = index
+        self.path = path
+        self.scenes = scenes
+
+        # Where the baked file is saved, or None to overwrite the file
+        self.save_path = save_path
+
+        name = "{:04d}-{}".format(index, os.path.splitext(os.path.basename(path))[0])
+        self.log = os.path.join(log_dir, name + ".log")
+        self.result = os.path.join(log_dir, name + ".json")
+
+        self.status = "PENDING"
+        self.error = None
+        self.returncode = None
+        self.seconds = 0.0
+
+        # In bytes
+        self.peak_memory = 0
+
+        self.output = None
+
+
+    def command(self, args, threads):
+        command = [
+            args.blender,
+            "--background",
+            self.path,
+            "--threads", str(threads),
+            # Otherwise errors in the script still exit with 0
+            "--python-exit-code", "1",
+            "--python", os.path.realpath(__file__),
+            "--",
+            "--worker",
+            "--result", self.result,
+        ]
+
+        if self.scenes:
+            command.append("--scenes")
+            command.extend(self.scenes)
+
+        if self.save_path:
+            command.extend(("--output", self.save_path))
+
+        command.extend(bake_options(args))
+
+        return command
+
+
+    def run(self, args, threads):
+        if not os.path.exists(self.path):
+            self.status = "FAILED"
+            self.error = "File not found"
+            return self
+
+        start = time.perf_counter()
+
+        with open(self.log, "wb") as log:
+            try:
+                process = subprocess.Popen(self.command(args, threads), stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+
+            except OSError as e:
+                self.status = "FAILED"
+                self.error = str(e)
+                return self
+
+            self.wait(process, args.timeout, start)
+
+        self.seconds = time.perf_counter() - start
+
+        self.read_result()
+
+        return self
+
+
+    # Popen.wait doesn't return the resource usage of the process, which contains its peak memory
+    def wait(self, process, timeout, start):
+        killed = False
+
+        while True:
+            finished, status, usage = os.wait4(process.pid, os.WNOHANG)
+
+            if finished != 0:
+                break
+
+            if timeout > 0 and not killed and time.perf_counter() - start > timeout:
+                process.send_signal(signal.SIGKILL)
+                killed = True
+
+            time.sleep(POLL_INTERVAL)
+
+        self.returncode = os.waitstatus_to_exitcode(status)
+
+        # The process was reaped by os.wait4, so Popen must not wait for it
+        process.returncode = self.returncode
+
+        # ru_maxrss is in kilobytes on Linux
+        self.peak_memory = usage.ru_maxrss * 1024
+
+        if killed:
+            self.status = "TIMEOUT"
+            self.error = "Killed after {:g} seconds".format(timeout)
+
+        elif self.returncode != 0:
+            self.status = "FAILED"
+            self.error = "Blender exited with {}".format(self.returncode)
+
+        else:
+            self.status = "FINISHED"
+
+
+    def read_result(self):
+        try:
+            with open(self.result) as file:
+                self.output = json.load(file)
+
+        except (OSError, ValueError):
+            if self.status == "FINISHED":
+                self.status = "FAILED"
+                self.error = "The job didn't write a result, see {}".format(self.log)
+
+            return
+
+        if self.status == "FINISHED":
+            if "error" in self.output:
+                self.status = "FAILED"
+                self.error = self.output["error"]
+
+            elif any(result["status"] == "FAILED" for result in self.output["armatures"]):
+                self.status = "FAILED"
+                self.error = "Some armatures failed, the file was not saved"
+
+
+    def report(self):
+        return {
+            "file": self.path,
+            "scenes": self.scenes,
+            "status": self.status,
+            "error": self.error,
+            "returncode": self.returncode,
+            "seconds": self.seconds,
+            "peak_memory": self.peak_memory,
+            "log": self.log,
+            "saved": self.output["saved"] if self.output else None,
+            "armatures": self.output["armatures"] if self.output else [],
+        }
+
+
+def format_memory(size):
+    return "{:.0f} MB".format(size / (1024 * 1024))
+
+
+def print_job(job, done, total, lock):
+    lines = ["[{}/{}] {} {} ({:.1f}s, peak {})".format(done, total, job.status, job.path, job.seconds, format_memory(job.peak_memory))]
+
+    if job.output:
+        for result in job.output["armatures"]:
+            lines.append("    {} / {}: {} in {:.2f}s, {} keyframes{}{}".format(
+                result["scene"],
+                result["armature"],
+                result["status"],
+                result["seconds"],
+                result["keyframes"],
+                " (cached)" if result["cached"] else "",
+                ": " + result["error"] if "error" in result else "",
+            ))
+
+    if job.error:
+        lines.append("    " + job.error)
+
+    with lock:
+        print("\n".join(lines), flush=True)
+
+
+def run_pool(args):
+    shots = list(args.shots)
+
+    if args.list:
+        shots.extend(read_list(args.list))
+
+    if len(shots) == 0:
+        print("No shots to bake", file=sys.stderr)
+        return 2
+
+    if shutil.which(args.blender) is None:
+        print("Could not find Blender at {}, use --blender or the BLENDER environment variable".format(args.blender), file=sys.stderr)
+        return 2
+
+    files = group_shots(shots)
+
+    if args.output_dir:
+        outputs = output_paths([path for path, scenes in files], args.output_dir)
+
+        collisions = output_collisions(outputs)
+
+        if collisions:
+            for paths in collisions:
+                print("These files would be saved to the same path: {}".format(", ".join(paths)), file=sys.stderr)
+
+            return 2
+
+        for output in outputs.values():
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    else:
+        outputs = {}
+
+    log_dir = args.logs or tempfile.mkdtemp(prefix="bake_batch_")
+    os.makedirs(log_dir, exist_ok=True)
+
+    jobs = [Job(i, path, scenes, outputs.get(path), log_dir) for i, (path, scenes) in enumerate(files)]
+
+    workers = max(1, min(args.jobs, len(jobs)))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+
+    print("Baking {} files with {} jobs, {} threads each, logs in {}".format(len(jobs), workers, threads, log_dir), flush=True)
+
+    # Bigger files usually take longer, so they are started first to keep every core busy until the end
+    queue = sorted(jobs, key=lambda job: os.path.getsize(job.path) if os.path.exists(job.path) else 0, reverse=True)
+
+    lock = threading.Lock()
+    done = 0
+
+    start = time.perf_counter()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(job.run, args, threads) for job in queue]
+
+        for future in concurrent.futures.as_completed(futures):
+            done += 1
+            print_job(future.result(), done, len(jobs), lock)
+
+    seconds = time.perf_counter() - start
+
+    failed = [job for job in jobs if job.status != "FINISHED"]
+    busy = sum(job.seconds for job in jobs)
+
+    print("Finished {} files in {:.1f}s ({:.1f}s of jobs, {:.1f}x parallel), {} failed, largest peak memory {}".format(
+        len(jobs),
+        seconds,
+        busy,
+        busy / max(seconds, 1e-9),
+        len(failed),
+        format_memory(max(job.peak_memory for job in jobs)),
+    ), flush=True)
+
+    for job in failed:
+        print("FAILED {}: {}".format(job.path, job.error), file=sys.stderr)
+
+    if args.report:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "jobs": workers,
+            "threads": threads,
+            "seconds": seconds,
+            "results": [job.report() for job in jobs],
+        }
+
+        with open(args.report, "w") as file:
+            json.dump(report, file, indent=4)
+
+        print("Saved report to {}".format(args.report))
+
+    return 1 if failed else 0
+
+
+def main():
+    args = parse_args()
+
+    if args.worker:
+        run_worker(args)
+
+    else:
+        sys.exit(run_pool(args))
+
+
+if __name__ == "__main__":
+    main()
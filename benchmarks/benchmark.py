@@ -0,0 +1,365 @@
+# Measures how the add-on scales with the number of bones.
+#
+#     blender --background --factory-startup --python benchmarks/benchmark.py -- --sizes 10 100 1000 --output report.json
+#
+# It generates armatures procedurally, so it doesn't need any .blend files.
+#
+# It can also run outside of Blender, using the in-memory bpy from the fakes folder:
+#
+#     python benchmarks/benchmark.py --sizes 10 100 1000
+#
+# This is much faster and the results are deterministic, but the timings
+# don't include the time spent inside of Blender.
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import importlib
+import statistics
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+# Blender has already imported bpy, so this is only true when running with a normal Python
+IS_FAKE = "bpy" not in sys.modules
+
+if IS_FAKE:
+    sys.path.insert(0, os.path.join(repo_path, "fakes"))
+
+import bpy
+
+RIGS = ("chain", "fan", "tree", "mixed")
+SIZES = (10, 100, 1000, 10000)
+
+# Number of bones in each strand of the fan rig
+STRAND_LENGTH = 5
+
+
+def parse_args():
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    elif IS_FAKE:
+        argv = sys.argv[1:]
+    else:
+        argv = []
+
+    parser = argparse.ArgumentParser(prog="benchmark.py")
+    parser.add_argument("--rigs", nargs="+", choices=RIGS, default=list(RIGS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3, help="Number of times each small scenario is repeated")
+    parser.add_argument("--output", default=os.path.join(dir_path, "report.json"))
+    return parser.parse_args(argv)
+
+
+# The add-on folder has spaces in its name, so it can't be imported with a normal import statement
+def load_addon():
+    if repo_path not in sys.path:
+        sys.path.insert(0, repo_path)
+
+    addon = importlib.import_module("Rigid Body Bones")
+
+    # It might already be enabled in the user preferences
+    if not hasattr(bpy.types.Armature, "rigid_body_bones"):
+        addon.register()
+
+    return addon
+
+
+# Returns (name, parent_index, head, tail) for every bone
+def chain_bones(size):
+    for i in range(size):
+        yield ("Chain {}".format(i), i - 1, (0.0, 0.0, i * 0.1), (0.0, 0.0, (i + 1) * 0.1))
+
+
+def fan_bones(size):
+    yield ("Root", -1, (0.0, 0.0, 0.0), (0.0, 0.0, 0.1))
+
+    strands = max((size - 1) // STRAND_LENGTH, 1)
+
+    index = 1
+
+    for strand in range(strands):
+        angle = (strand / strands) * math.tau
+        x = math.cos(angle) * 0.1
+        y = math.sin(angle) * 0.1
+
+        for i in range(STRAND_LENGTH):
+            if index >= size:
+                return
+
+            # The first bone of each strand is parented to the root
+            parent = 0 if i == 0 else index - 1
+
+            yield ("Strand {} {}".format(strand, i), parent, (x * (i + 1), y * (i + 1), 0.1), (x * (i + 2), y * (i + 2), 0.1))
+
+            index += 1
+
+
+def tree_bones(size):
+    for i in range(size):
+        # Binary tree, the bones are stored in breadth-first order
+        parent = (i - 1) // 2 if i > 0 else -1
+        depth = int(math.log2(i + 1))
+        x = (i - (2 ** depth) + 1) * 0.1
+
+        yield ("Branch {}".format(i), parent, (x, 0.0, depth * 0.1), (x, 0.0, (depth + 1) * 0.1))
+
+
+RIG_BONES = {
+    "chain": chain_bones,
+    "fan": fan_bones,
+    "tree": tree_bones,
+    "mixed": tree_bones,
+}
+
+
+def make_rig(context, rig, size):
+    name = "Benchmark {} {}".format(rig, size)
+
+    data = bpy.data.armatures.new(name)
+    armature = bpy.data.objects.new(name, data)
+    context.scene.collection.objects.link(armature)
+
+    for object in context.view_layer.objects:
+        object.select_set(False)
+
+    armature.select_set(True)
+    context.view_layer.objects.active = armature
+
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    edit_bones = data.edit_bones
+    created = []
+
+    for bone_name, parent, head, tail in RIG_BONES[rig](size):
+        edit_bone = edit_bones.new(bone_name)
+        edit_bone.head = head
+        edit_bone.tail = tail
+
+        if parent != -1:
+            edit_bone.parent = created[parent]
+
+        created.append(edit_bone)
+
+    bpy.ops.object.mode_set(mode='POSE')
+
+    return armature
+
+
+def configure_rig(addon, armature, rig):
+    for index, bone in enumerate(armature.data.bones):
+        data = bone.rigid_body_bones
+
+        if rig == "mixed":
+            if index % 3 == 0:
+                data.type = 'PASSIVE'
+            else:
+                data.type = 'ACTIVE'
+
+            if index % 5 == 0:
+                data.collision_shape = 'COMPOUND'
+                addon.armatures.add_new_compound(bone)
+                addon.armatures.add_new_compound(bone)
+
+        elif bone.parent is None:
+            data.type = 'PASSIVE'
+
+        else:
+            data.type = 'ACTIVE'
+
+        data.enabled = True
+
+
+# In background mode timers and message bus notifications never run, so the
+# pending work is flushed manually.
+def flush(addon):
+    if addon.events.queued_events:
+        addon.events.flush_events()
+
+    if addon.events.dirty_armatures:
+        addon.events.next_tick()
+
+
+def measure(f):
+    time_start = time.perf_counter()
+    f()
+    return time.perf_counter() - time_start
+
+
+def last_profile(addon, armature):
+    profile = addon.profiler.last(armature.name)
+
+    if profile is None:
+        return None
+
+    else:
+        return profile.to_dict()
+
+
+def benchmark_rig(addon, context, args, rig, size):
+    results = []
+
+    def record(scenario, runs, profile=None):
+        results.append({
+            "rig": rig,
+            "size": size,
+            "scenario": scenario,
+            "seconds": min(runs),
+            "median": statistics.median(runs),
+            "runs": runs,
+            "profile": profile,
+        })
+
+    armature = make_rig(context, rig, size)
+    top = armature.data.rigid_body_bones
+
+    configure_rig(addon, armature, rig)
+
+    # This creates all of the objects
+    record("create", [measure(lambda: flush(addon))], last_profile(addon, armature))
+
+    # Big rigs are only measured once, because they take a long time
+    repeat = args.repeat if size <= 1000 else 1
+
+
+    def full_update():
+        bpy.ops.rigid_body_bones.update(full=True)
+
+    record("full_update", [measure(full_update) for _ in range(repeat)], last_profile(addon, armature))
+
+
+    middle_name = armature.data.bones[len(armature.data.bones) // 2].name
+
+    # Updates can switch to Edit mode, which recreates the bones, so it can't keep a reference to the bone
+    def middle():
+        return armature.data.bones[middle_name].rigid_body_bones
+
+    def toggle_bone():
+        data = middle()
+        data.enabled = not data.enabled
+        flush(addon)
+
+    # Even number of runs, so the bone ends up enabled
+    runs = [measure(toggle_bone) for _ in range(repeat * 2)]
+    record("toggle_bone", runs, last_profile(addon, armature))
+
+
+    def align_bone():
+        middle().location[0] += 0.01
+        flush(addon)
+
+    record("event_align", [measure(align_bone) for _ in range(repeat)])
+
+
+    def enter_edit():
+        bpy.ops.object.mode_set(mode='EDIT')
+        addon.events.mode_switch()
+        flush(addon)
+
+    def exit_edit():
+        bpy.ops.object.mode_set(mode='POSE')
+        addon.events.mode_switch()
+        flush(addon)
+
+    enter_runs = []
+    exit_runs = []
+
+    for _ in range(repeat):
+        enter_runs.append(measure(enter_edit))
+        exit_runs.append(measure(exit_edit))
+
+    record("enter_edit", enter_runs)
+    record("exit_edit", exit_runs, last_profile(addon, armature))
+
+
+    def disable():
+        top.enabled = False
+        flush(addon)
+
+    record("disable", [measure(disable)], last_profile(addon, armature))
+
+
+    name = armature.name
+    data = armature.data
+
+    bpy.data.objects.remove(armature)
+    bpy.data.armatures.remove(data)
+
+    if bpy.ops.rigid_body_bones.cleanup_armatures.poll():
+        bpy.ops.rigid_body_bones.cleanup_armatures()
+
+    addon.profiler.clear(name)
+
+    return results
+
+
+# Slope of log(seconds) / log(size), roughly 1.0 for O(n) and 2.0 for O(n^2)
+def scaling_exponent(points):
+    points = [(math.log(size), math.log(seconds)) for size, seconds in points if seconds > 0.0]
+
+    if len(points) < 2:
+        return None
+
+    mean_x = statistics.mean(x for x, y in points)
+    mean_y = statistics.mean(y for x, y in points)
+
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    denominator = sum((x - mean_x) ** 2 for x, y in points)
+
+    if denominator == 0.0:
+        return None
+
+    else:
+        return numerator / denominator
+
+
+def scaling(results):
+    grouped = {}
+
+    for result in results:
+        key = (result["rig"], result["scenario"])
+        grouped.setdefault(key, []).append((result["size"], result["seconds"]))
+
+    output = {}
+
+    for (rig, scenario), points in sorted(grouped.items()):
+        output.setdefault(rig, {})[scenario] = scaling_exponent(points)
+
+    return output
+
+
+def main():
+    args = parse_args()
+    context = bpy.context
+
+    addon = load_addon()
+
+    results = []
+
+    for rig in args.rigs:
+        for size in sorted(args.sizes):
+            print("Benchmarking {} with {} bones".format(rig, size), flush=True)
+            results.extend(benchmark_rig(addon, context, args, rig, size))
+
+    report = {
+        "blender": bpy.app.version_string,
+        "addon": ".".join(str(x) for x in addon.bl_info["version"]),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+        "scaling": scaling(results),
+    }
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=4)
+
+    print("Saved report to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
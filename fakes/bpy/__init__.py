@@ -0,0 +1,43 @@
+# In-memory stand-in for Blender's bpy module.
+#
+# It only models the parts of Blender which are used by the add-on (objects,
+# meshes, armatures, collections, rigid bodies and constraints), so the update
+# code can be run and profiled with a normal Python interpreter. Every RNA
+# write, ID creation and operator call is counted in `bpy.types.stats`.
+#
+# This isn't part of Blender, so the fake-only functions (reset, process_events)
+# must not be used by the add-on itself.
+from . import types
+from . import props
+from . import ops
+from . import utils
+from . import msgbus
+from . import app
+from . import path
+
+
+def reset():
+    types.data = types.BlendData()
+    types.context = types.Context()
+
+    scene = types.data.scenes.new("Scene")
+    types.context.scene = scene
+
+    types.reset_stats()
+
+    global data, context
+    data = types.data
+    context = types.context
+
+
+# Runs the message bus notifications, the depsgraph handlers and the timers,
+# like Blender's event loop does.
+#
+# The timers use a fake clock, which is moved forward by `seconds`.
+def process_events(seconds=0.1):
+    msgbus.deliver()
+    types.evaluate_depsgraph()
+    app.timers.run_pending(seconds)
+
+
+reset()
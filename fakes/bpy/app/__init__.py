@@ -0,0 +1,10 @@
+from . import handlers
+from . import timers
+
+
+background = True
+
+version = (2, 93, 0)
+version_string = "2.93.0 (fake)"
+
+binary_path = ""
@@ -0,0 +1,17 @@
+def persistent(f):
+    f._bpy_persistent = True
+    return f
+
+
+depsgraph_update_pre = []
+depsgraph_update_post = []
+frame_change_pre = []
+frame_change_post = []
+load_pre = []
+load_post = []
+save_pre = []
+save_post = []
+undo_pre = []
+undo_post = []
+redo_pre = []
+redo_post = []
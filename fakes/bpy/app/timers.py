@@ -0,0 +1,39 @@
+# There is no real time in the fake, the clock only moves when bpy.process_events is called
+clock = 0.0
+
+# Function -> time when it should run
+registered = {}
+
+
+def register(function, first_interval=0.0, persistent=False):
+    registered[function] = clock + first_interval
+
+
+def unregister(function):
+    if function not in registered:
+        raise ValueError("Error: function is not registered")
+
+    del registered[function]
+
+
+def is_registered(function):
+    return function in registered
+
+
+# Moves the clock forward and runs the timers which are due, each timer runs at most once
+def run_pending(seconds):
+    global clock
+    clock += seconds
+
+    for function in list(registered):
+        if registered.get(function, clock + 1.0) > clock:
+            continue
+
+        interval = function()
+
+        if function in registered:
+            if interval is None:
+                del registered[function]
+
+            else:
+                registered[function] = clock + interval
@@ -0,0 +1,28 @@
+# Key -> list of (owner, notify, args)
+subscriptions = {}
+
+# Keys which were published, they are delivered by bpy.process_events
+queue = []
+
+
+def subscribe_rna(key, owner, args, notify, options=set()):
+    subscriptions.setdefault(key, []).append((owner, notify, args))
+
+
+def clear_by_owner(owner):
+    for key, subscribers in subscriptions.items():
+        subscribers[:] = [x for x in subscribers if x[0] is not owner]
+
+
+def publish_rna(key):
+    if key not in queue:
+        queue.append(key)
+
+
+def deliver():
+    keys = list(queue)
+    queue.clear()
+
+    for key in keys:
+        for owner, notify, args in list(subscriptions.get(key, [])):
+            notify(*args)
@@ -0,0 +1,200 @@
+import numpy as np
+from contextlib import contextmanager
+from . import types
+
+
+# Operators can be called with a context override dict and an execution context,
+# e.g. bpy.ops.object.mode_set(override, 'EXEC_DEFAULT', mode='POSE')
+def parse_args(args):
+    override = None
+
+    for arg in args:
+        if isinstance(arg, dict):
+            override = arg
+
+        elif not isinstance(arg, str):
+            raise TypeError("Operator arguments must be a context dict or an execution context string")
+
+    return override
+
+
+@contextmanager
+def overridden(override):
+    if override is None:
+        yield
+
+    else:
+        types.context._overrides.append(override)
+
+        try:
+            yield
+
+        finally:
+            types.context._overrides.pop()
+
+
+# bl_idname -> operator class, filled in by bpy.utils.register_class
+operators = {}
+
+
+class BuiltinOperator:
+    def __init__(self, idname, execute, poll=None):
+        self.idname = idname
+        self.execute = execute
+        self.poll_function = poll
+
+    def poll(self):
+        return self.poll_function is None or self.poll_function(types.context)
+
+    def __call__(self, *args, **keywords):
+        with overridden(parse_args(args)):
+            if not self.poll():
+                raise RuntimeError("Operator bpy.ops.{}.poll() failed, context is incorrect".format(self.idname))
+
+            types.count("operator_calls")
+            return self.execute(types.context, **keywords)
+
+
+class RegisteredOperator:
+    def __init__(self, idname):
+        self.idname = idname
+
+    def get_class(self):
+        cls = operators.get(self.idname)
+
+        if cls is None:
+            raise AttributeError("Calling operator \"bpy.ops.{}\" error, could not be found".format(self.idname))
+
+        return cls
+
+    def poll(self):
+        cls = self.get_class()
+        return not hasattr(cls, "poll") or cls.poll(types.context)
+
+    def __call__(self, *args, **keywords):
+        with overridden(parse_args(args)):
+            return self.call(keywords)
+
+    def call(self, keywords):
+        cls = self.get_class()
+
+        if not self.poll():
+            raise RuntimeError("Operator bpy.ops.{}.poll() failed, context is incorrect".format(self.idname))
+
+        types.count("operator_calls")
+
+        operator = cls.__new__(cls)
+        types.bpy_struct.__init__(operator)
+
+        for name, value in keywords.items():
+            if not isinstance(getattr(cls, name, None), types.Property):
+                raise TypeError("Converting py args to operator properties: keyword \"{}\" unrecognized".format(name))
+
+            setattr(operator, name, value)
+
+        result = operator.execute(types.context)
+
+        if 'FINISHED' in result and 'UNDO' in getattr(cls, "bl_options", set()):
+            types.count("undo_pushes")
+
+        return result
+
+
+class Module:
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        idname = self.name + "." + name
+
+        builtin = builtins.get(idname)
+
+        if builtin is not None:
+            return builtin
+
+        else:
+            return RegisteredOperator(idname)
+
+
+def __getattr__(name):
+    if name.startswith("_"):
+        raise AttributeError(name)
+
+    return Module(name)
+
+
+def has_active_object(context):
+    return context.active_object is not None
+
+
+def mode_set(context, mode='OBJECT', toggle=False):
+    object = context.active_object
+    old_mode = object._mode
+
+    if mode == old_mode:
+        return {'FINISHED'}
+
+    if mode in ('EDIT', 'POSE') and object.type != 'ARMATURE' and not (mode == 'EDIT' and object.type == 'MESH'):
+        raise TypeError("Operator bpy.ops.object.mode_set.poll() Unable to execute '{}' mode".format(mode))
+
+    types.count("mode_switches")
+
+    if object.type == 'ARMATURE':
+        if old_mode == 'EDIT':
+            object.data._exit_edit()
+
+        if mode == 'EDIT':
+            object.data._enter_edit()
+
+    object._mode = mode
+
+    types.publish(types.Object, "mode")
+
+    return {'FINISHED'}
+
+
+def world_add(context):
+    scene = context.scene
+
+    if scene._rigidbody_world is None:
+        scene._rigidbody_world = types.RigidBodyWorld(scene)
+
+    return {'FINISHED'}
+
+
+def world_remove(context):
+    scene = context.scene
+
+    if scene._rigidbody_world is not None:
+        scene._rigidbody_world._remove()
+        scene._rigidbody_world = None
+
+    return {'FINISHED'}
+
+
+# The mass is the density multiplied by the volume of the bounding box
+def mass_calculate(context, material='Custom', density=1.0):
+    for object in context.selected_objects:
+        if object.rigid_body is not None and object.type == 'MESH':
+            co = object.data._co
+
+            if len(co) == 0:
+                volume = 0.0
+
+            else:
+                volume = float(np.prod(co.max(axis=0) - co.min(axis=0)))
+
+            object.rigid_body.mass = density * volume
+
+    return {'FINISHED'}
+
+
+builtins = {
+    "object.mode_set": BuiltinOperator("object.mode_set", mode_set, has_active_object),
+    "rigidbody.world_add": BuiltinOperator("rigidbody.world_add", world_add),
+    "rigidbody.world_remove": BuiltinOperator("rigidbody.world_remove", world_remove),
+    "rigidbody.mass_calculate": BuiltinOperator("rigidbody.mass_calculate", mass_calculate),
+}
@@ -0,0 +1,17 @@
+import os
+import re
+from . import types
+
+
+def abspath(path, start=None):
+    if path.startswith("//"):
+        if start is None:
+            start = os.path.dirname(types.data.filepath)
+
+        path = os.path.join(start, path[2:])
+
+    return path
+
+
+def clean_name(name, replace="_"):
+    return re.sub(r"[^A-Za-z0-9_\-]", replace, name)
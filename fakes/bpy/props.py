@@ -0,0 +1,29 @@
+from .types import Property
+
+
+def BoolProperty(**keywords):
+    return Property('BOOL', **keywords)
+
+def BoolVectorProperty(size=3, **keywords):
+    return Property('BOOL', size=size, **keywords)
+
+def IntProperty(**keywords):
+    return Property('INT', **keywords)
+
+def FloatProperty(**keywords):
+    return Property('FLOAT', **keywords)
+
+def FloatVectorProperty(size=3, **keywords):
+    return Property('FLOAT', size=size, **keywords)
+
+def StringProperty(**keywords):
+    return Property('STRING', **keywords)
+
+def EnumProperty(**keywords):
+    return Property('ENUM', **keywords)
+
+def PointerProperty(**keywords):
+    return Property('POINTER', **keywords)
+
+def CollectionProperty(**keywords):
+    return Property('COLLECTION', **keywords)
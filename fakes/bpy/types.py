@@ -0,0 +1,2513 @@
+import inspect
+import builtins
+import numpy as np
+from math import cos, sin
+from mathutils import Vector, Matrix, Quaternion
+
+
+# Counts of the operations which are slow in Blender
+stats = {}
+
+def reset_stats():
+    stats.clear()
+    stats.update({
+        "writes": 0,
+        "foreach_set": 0,
+        "ids_created": 0,
+        "ids_removed": 0,
+        "links": 0,
+        "rigid_bodies_created": 0,
+        "operator_calls": 0,
+        "undo_pushes": 0,
+        "mode_switches": 0,
+        "frame_changes": 0,
+        "keyframes": 0,
+    })
+
+reset_stats()
+
+
+def count(name, amount=1):
+    stats[name] = stats.get(name, 0) + amount
+
+
+def float32(value):
+    return float(np.float32(value))
+
+
+# These are set by bpy/__init__.py
+context = None
+data = None
+
+
+# Calls a handler with the arguments that it accepts, like Blender does
+def call_handler(handler, *args):
+    try:
+        count = len(inspect.signature(handler).parameters)
+    except (TypeError, ValueError):
+        count = len(args)
+
+    return handler(*args[:count])
+
+
+def escape_name(name):
+    return name.replace("\\", "\\\\").replace("\"", "\\\"")
+
+
+def unique_name(name, taken):
+    name = name[:63]
+
+    if name not in taken:
+        return name
+
+    base = name
+    parts = name.rsplit(".", 1)
+
+    if len(parts) == 2 and parts[1].isdigit():
+        base = parts[0]
+
+    index = 1
+
+    while True:
+        suffix = ".{:0>3}".format(index)
+        new_name = base[:63 - len(suffix)] + suffix
+
+        if new_name not in taken:
+            return new_name
+
+        index += 1
+
+
+# Properties
+#
+# The same class is used for the built-in properties of the fake types, and for
+# the properties which are created with bpy.props. Values are stored in the
+# `_values` dict of the struct, so `is_property_set` works for every property.
+class Property:
+    def __init__(self, kind, default=None, size=0, items=None, type=None, update=None, min=None, max=None, get=None, set=None, readonly=False, **keywords):
+        self.kind = kind
+        self.size = size
+        self.items = items
+        self.type = type
+        self.update = update
+        self.min = min
+        self.max = max
+        self.getter = get
+        self.setter = set
+        self.readonly = readonly
+        self.keywords = keywords
+        self.name = None
+        self.group = self.kind in ('POINTER', 'COLLECTION') and isinstance(type, builtins.type) and issubclass(type, PropertyGroup)
+
+        if size:
+            if default is None:
+                default = [self.zero()] * size
+
+            else:
+                default = list(default)
+
+            assert len(default) == size
+            self.default = [self.convert_item(x) for x in default]
+
+        elif default is None:
+            self.default = self.zero()
+
+        else:
+            self.default = self.convert_item(default)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __repr__(self):
+        return "<Property {} {}>".format(self.kind, self.name)
+
+    def zero(self):
+        if self.kind == 'BOOL':
+            return False
+        elif self.kind == 'INT':
+            return 0
+        elif self.kind == 'FLOAT':
+            return 0.0
+        elif self.kind == 'STRING':
+            return ""
+        elif self.kind == 'ENUM':
+            return self.enum_identifiers()[0] if self.enum_identifiers() else ""
+        else:
+            return None
+
+    def enum_identifiers(self):
+        if self.items is None or callable(self.items):
+            return None
+
+        else:
+            return [item[0] for item in self.items if item is not None]
+
+    def convert_item(self, value):
+        if self.kind == 'BOOL':
+            if not isinstance(value, (bool, int, np.bool_, np.integer)):
+                raise TypeError("{}: expected True/False or 0/1, not {}".format(self.name, type(value).__name__))
+            return bool(value)
+
+        elif self.kind == 'INT':
+            value = int(value)
+
+        elif self.kind == 'FLOAT':
+            value = float32(value)
+
+        elif self.kind == 'STRING':
+            if not isinstance(value, str):
+                raise TypeError("{}: expected a string, not {}".format(self.name, type(value).__name__))
+            return value
+
+        elif self.kind == 'ENUM':
+            identifiers = self.enum_identifiers()
+
+            if identifiers is not None and value not in identifiers:
+                raise TypeError("enum \"{}\" not found in {}".format(value, tuple(identifiers)))
+
+            return value
+
+        elif self.kind == 'POINTER':
+            if value is not None and self.type is not None and not isinstance(value, self.type):
+                raise TypeError("{}: expected a {} type, not {}".format(self.name, self.type.__name__, type(value).__name__))
+            return value
+
+        if self.min is not None and value < self.min:
+            value = type(value)(self.min)
+
+        if self.max is not None and value > self.max:
+            value = type(value)(self.max)
+
+        return value
+
+    def convert(self, value):
+        if self.size:
+            value = list(value)
+
+            if len(value) != self.size:
+                raise ValueError("{}: expected a sequence of {} items, not {}".format(self.name, self.size, len(value)))
+
+            return [self.convert_item(x) for x in value]
+
+        else:
+            return self.convert_item(value)
+
+    def raw(self, obj):
+        value = obj._values.get(self.name, self.default)
+
+        # Pointers to removed IDs are cleared, like Blender does
+        if isinstance(value, ID) and value._removed:
+            del obj._values[self.name]
+            return None
+
+        return value
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+
+        check_removed(obj)
+
+        if self.getter is not None:
+            return self.getter(obj)
+
+        if self.kind == 'POINTER' and self.group:
+            group = obj._groups.get(self.name)
+
+            if group is None:
+                group = self.type._new(obj, self.name)
+                obj._groups[self.name] = group
+
+            return group
+
+        elif self.kind == 'COLLECTION':
+            collection = obj._groups.get(self.name)
+
+            if collection is None:
+                collection = GroupCollection(obj, self.name, self.type)
+                obj._groups[self.name] = collection
+
+            return collection
+
+        elif self.size:
+            return PropArray(obj, self)
+
+        else:
+            return self.raw(obj)
+
+    def __set__(self, obj, value):
+        check_removed(obj)
+
+        if self.readonly or (self.kind == 'POINTER' and self.group) or self.kind == 'COLLECTION':
+            raise AttributeError("bpy_struct: attribute \"{}\" from \"{}\" is read-only".format(self.name, type(obj).__name__))
+
+        count("writes")
+
+        if self.setter is not None:
+            self.setter(obj, value)
+
+        else:
+            obj._values[self.name] = self.convert(value)
+
+        if self.update is not None:
+            self.update(obj, context)
+
+
+# This is returned when reading a vector property, writing to it writes to the property
+class PropArray:
+    def __init__(self, obj, prop):
+        self._obj = obj
+        self._prop = prop
+
+    def _list(self):
+        return self._prop.raw(self._obj)
+
+    def __len__(self):
+        return self._prop.size
+
+    def __iter__(self):
+        return iter(list(self._list()))
+
+    def __getitem__(self, index):
+        return self._list()[index]
+
+    def __setitem__(self, index, value):
+        values = list(self._list())
+        values[index] = value
+        self._prop.__set__(self._obj, values)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._list(), dtype=dtype)
+
+    def __eq__(self, other):
+        try:
+            return list(self._list()) == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __repr__(self):
+        return "bpy_prop_array({})".format(list(self._list()))
+
+    def to_tuple(self):
+        return tuple(self._list())
+
+
+def check_removed(obj):
+    if obj._removed:
+        raise ReferenceError("StructRNA of type {} has been removed".format(type(obj).__name__))
+
+
+class StructMeta(type):
+    # Blender allows adding properties to types after they are created, e.g.
+    # `bpy.types.Bone.foo = bpy.props.IntProperty()`
+    def __setattr__(cls, name, value):
+        if isinstance(value, Property):
+            value.name = name
+
+        super().__setattr__(name, value)
+
+
+class bpy_struct(metaclass=StructMeta):
+    # Python subclasses which can have arbitrary attributes (e.g. Operator)
+    _allow_attributes = False
+
+    def __init__(self, owner=None, path=None):
+        object.__setattr__(self, "_values", {})
+        object.__setattr__(self, "_groups", {})
+        object.__setattr__(self, "_owner", owner)
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_removed", False)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+            return
+
+        check_removed(self)
+
+        attribute = getattr(type(self), name, None)
+
+        if isinstance(attribute, (Property, property)) or self._allow_attributes:
+            object.__setattr__(self, name, value)
+
+        else:
+            raise AttributeError("bpy_struct: attribute \"{}\" from \"{}\" is read-only".format(name, type(self).__name__))
+
+    def _remove(self):
+        object.__setattr__(self, "_removed", True)
+
+        for child in self._groups.values():
+            child._remove()
+
+    def as_pointer(self):
+        check_removed(self)
+        return id(self)
+
+    def is_property_set(self, name):
+        check_removed(self)
+        return name in self._values
+
+    def property_unset(self, name):
+        check_removed(self)
+        self._values.pop(name, None)
+
+    def path_from_id(self, property=""):
+        check_removed(self)
+
+        parts = []
+        struct = self
+
+        while not isinstance(struct, ID):
+            path = struct._path
+
+            if path is None:
+                raise ValueError("{}.path_from_id() does not support path creation for this type".format(type(self).__name__))
+
+            if callable(path):
+                path = path()
+
+            parts.append(path)
+            struct = struct._owner
+
+        parts.reverse()
+
+        if property:
+            parts.append(property)
+
+        return ".".join(parts)
+
+    @property
+    def id_data(self):
+        struct = self
+
+        while struct is not None and not isinstance(struct, ID):
+            struct = struct._owner
+
+        return struct
+
+
+# Collections
+
+class bpy_prop_collection:
+    def __init__(self):
+        self._items = []
+        # Incremented whenever the collection changes, to detect changes during iteration
+        self._version = 0
+
+    def _changed(self):
+        self._version += 1
+
+    def _all(self):
+        return self._items
+
+    def __len__(self):
+        return len(self._all())
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        version = self._version
+
+        for item in list(self._all()):
+            # Blender doesn't support changing a collection while looping over it
+            if self._version != version:
+                raise RuntimeError("{} changed size during iteration".format(type(self).__name__))
+
+            yield item
+
+    def _find_name(self, name):
+        for item in self._all():
+            if item.name == name:
+                return item
+
+        return None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            item = self._find_name(key)
+
+            if item is None:
+                raise KeyError("bpy_prop_collection[key]: key \"{}\" not found".format(key))
+
+            return item
+
+        elif isinstance(key, slice):
+            return self._all()[key]
+
+        else:
+            items = self._all()
+
+            if key < -len(items) or key >= len(items):
+                raise IndexError("bpy_prop_collection[index]: index {} out of range, size {}".format(key, len(items)))
+
+            return items[key]
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self._find_name(key) is not None
+
+        else:
+            return key in self._all()
+
+    def get(self, key, default=None):
+        item = self._find_name(key)
+        return default if item is None else item
+
+    def find(self, key):
+        for i, item in enumerate(self._all()):
+            if item.name == key:
+                return i
+
+        return -1
+
+    def keys(self):
+        return [item.name for item in self._all()]
+
+    def values(self):
+        return list(self._all())
+
+    def items(self):
+        return [(item.name, item) for item in self._all()]
+
+    def foreach_get(self, attribute, sequence):
+        values = []
+
+        for item in self._all():
+            value = getattr(item, attribute)
+
+            if isinstance(value, Matrix):
+                # Blender matrices are column major
+                values.extend(np.asarray(value._matrix).T.ravel())
+
+            elif isinstance(value, (PropArray, list, tuple, np.ndarray, Vector)):
+                values.extend(value)
+
+            else:
+                values.append(value)
+
+        if len(values) != len(sequence):
+            raise RuntimeError("internal error setting the array")
+
+        sequence[:] = values
+
+    def foreach_set(self, attribute, sequence):
+        items = self._all()
+
+        if len(items) == 0:
+            return
+
+        count("foreach_set")
+
+        sequence = np.asarray(sequence).ravel()
+        size = len(sequence) // len(items)
+
+        for i, item in enumerate(items):
+            if size == 1:
+                setattr(item, attribute, sequence[i].item())
+
+            # Blender matrices are column major
+            elif size == 16 and isinstance(getattr(item, attribute), Matrix):
+                setattr(item, attribute, Matrix(sequence[i * size:(i + 1) * size].reshape(4, 4).T.tolist()))
+
+            else:
+                setattr(item, attribute, sequence[i * size:(i + 1) * size].tolist())
+
+
+# CollectionProperty
+class GroupCollection(bpy_prop_collection):
+    def __init__(self, owner, name, type):
+        super().__init__()
+        self._owner = owner
+        self._name = name
+        self._type = type
+        self._removed = False
+
+    def _remove(self):
+        self._removed = True
+
+        for item in self._items:
+            item._remove()
+
+    def _item_path(self, item):
+        return lambda: "{}[{}]".format(self._name, self._items.index(item))
+
+    def add(self):
+        check_removed(self._owner)
+        item = self._type._new(self._owner, None)
+        item._path = self._item_path(item)
+        self._items.append(item)
+        self._changed()
+        return item
+
+    def remove(self, index):
+        check_removed(self._owner)
+        item = self._items.pop(index)
+        item._remove()
+        self._changed()
+
+    def clear(self):
+        check_removed(self._owner)
+
+        for item in self._items:
+            item._remove()
+
+        self._items.clear()
+        self._changed()
+
+    def move(self, from_index, to_index):
+        check_removed(self._owner)
+        item = self._items.pop(from_index)
+        self._items.insert(to_index, item)
+        self._changed()
+
+
+# Structs which are defined in Python
+
+class PropertyGroup(bpy_struct):
+    @classmethod
+    def _new(cls, owner, path):
+        group = cls.__new__(cls)
+        bpy_struct.__init__(group, owner, path)
+        return group
+
+    name = Property('STRING')
+
+
+class Operator(bpy_struct):
+    _allow_attributes = True
+
+    bl_options = set()
+
+    def report(self, type, message):
+        print("{}: {}".format(", ".join(sorted(type)), message))
+
+
+class Panel(bpy_struct):
+    _allow_attributes = True
+
+
+class UIList(bpy_struct):
+    _allow_attributes = True
+
+
+class Menu(bpy_struct):
+    _allow_attributes = True
+
+    _draw_functions = None
+
+    @classmethod
+    def append(cls, draw):
+        if cls._draw_functions is None:
+            cls._draw_functions = []
+
+        cls._draw_functions.append(draw)
+
+    @classmethod
+    def prepend(cls, draw):
+        cls.append(draw)
+
+    @classmethod
+    def remove(cls, draw):
+        cls._draw_functions.remove(draw)
+
+
+class VIEW3D_MT_pose(Menu):
+    pass
+
+
+# Math
+
+# Based on vec_roll_to_mat3_normalized in source/blender/blenkernel/intern/armature.c
+def vec_roll_to_mat3(vector, roll):
+    nor = np.asarray(vector, dtype=np.float64)
+    length = np.linalg.norm(nor)
+
+    if length == 0.0:
+        nor = np.array([0.0, 1.0, 0.0])
+    else:
+        nor = nor / length
+
+    x, y, z = nor
+
+    theta = 1.0 + y
+    theta_alt = x * x + z * z
+
+    if theta > 6.1e-3 or theta_alt > 2.5e-4:
+        if theta <= 6.1e-3:
+            theta = theta_alt * 0.5 + theta_alt * theta_alt * 0.125
+
+        matrix = np.array([
+            [1.0 - x * x / theta, x, -x * z / theta],
+            [-x, y, -z],
+            [-x * z / theta, z, 1.0 - z * z / theta],
+        ])
+
+    else:
+        matrix = np.diag([-1.0, -1.0, 1.0])
+
+    # Rotation around the bone axis
+    c = cos(roll)
+    s = sin(roll)
+    t = 1.0 - c
+
+    roll_matrix = np.array([
+        [t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+        [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+        [t * x * z - s * y, t * y * z + s * x, t * z * z + c],
+    ])
+
+    return roll_matrix @ matrix
+
+
+# IDs
+
+class ID(bpy_struct):
+    def __init__(self, name):
+        super().__init__()
+        self._id_collection = None
+        self._name = name
+        self._users = 0
+
+    def _get_name(self):
+        return self._name
+
+    def _set_name(self, name):
+        if self._id_collection is not None:
+            self._id_collection._rename(self, name)
+        else:
+            self._name = name
+
+        publish(type(self), "name")
+
+    name = Property('STRING', get=_get_name, set=_set_name)
+
+    @property
+    def users(self):
+        check_removed(self)
+        return self._users
+
+    use_fake_user = Property('BOOL')
+
+    @property
+    def is_evaluated(self):
+        return False
+
+    @property
+    def name_full(self):
+        return self.name
+
+    # There is no depsgraph, so nothing needs to be tagged
+    def update_tag(self, refresh=set()):
+        check_removed(self)
+
+    def _release(self):
+        pass
+
+    def __repr__(self):
+        if self._removed:
+            return "<bpy_struct, {} invalid>".format(type(self).__name__)
+        return "bpy.data.{}[\"{}\"]".format(type(self).__name__.lower() + "s", self._name)
+
+
+class IDCollection(bpy_prop_collection):
+    def __init__(self, type):
+        super().__init__()
+        self._type = type
+        self._names = {}
+
+    def _all(self):
+        # Blender keeps the IDs sorted by name
+        return [self._names[name] for name in sorted(self._names)]
+
+    def _find_name(self, name):
+        return self._names.get(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _add(self, id):
+        id._name = unique_name(id._name, self._names)
+        id._id_collection = self
+        self._names[id._name] = id
+        self._changed()
+        count("ids_created")
+        return id
+
+    def _rename(self, id, name):
+        if name == id._name:
+            return
+
+        del self._names[id._name]
+        id._name = unique_name(name, self._names)
+        self._names[id._name] = id
+        self._changed()
+
+    def remove(self, id, do_unlink=True):
+        check_removed(id)
+
+        if self._names.get(id._name) is not id:
+            raise ReferenceError("{} is not in this collection".format(id))
+
+        id._release()
+
+        del self._names[id._name]
+        id._id_collection = None
+        id._remove()
+        self._changed()
+        count("ids_removed")
+
+
+class ObjectDisplay(bpy_struct):
+    show_shadows = Property('BOOL', default=True)
+
+
+COLLISION_SHAPES = [(x, x, "") for x in ('BOX', 'SPHERE', 'CAPSULE', 'CYLINDER', 'CONE', 'CONVEX_HULL', 'MESH', 'COMPOUND')]
+
+
+class RigidBodyObject(bpy_struct):
+    type = Property('ENUM', default='ACTIVE', items=[('ACTIVE', "", ""), ('PASSIVE', "", "")])
+    enabled = Property('BOOL', default=True)
+    kinematic = Property('BOOL')
+    mass = Property('FLOAT', default=1.0, min=0.001)
+    friction = Property('FLOAT', default=0.5, min=0.0)
+    restitution = Property('FLOAT', default=0.0, min=0.0)
+    linear_damping = Property('FLOAT', default=0.04, min=0.0, max=1.0)
+    angular_damping = Property('FLOAT', default=0.1, min=0.0, max=1.0)
+    use_margin = Property('BOOL')
+    collision_margin = Property('FLOAT', default=0.04, min=0.0, max=1.0)
+    collision_collections = Property('BOOL', size=20, default=[True] + [False] * 19)
+    collision_shape = Property('ENUM', default='CONVEX_HULL', items=COLLISION_SHAPES)
+    mesh_source = Property('ENUM', default='DEFORM', items=[('BASE', "", ""), ('DEFORM', "", ""), ('FINAL', "", "")])
+    use_deactivation = Property('BOOL')
+    use_start_deactivated = Property('BOOL')
+    deactivate_linear_velocity = Property('FLOAT', default=0.4, min=0.0)
+    deactivate_angular_velocity = Property('FLOAT', default=0.5, min=0.0)
+
+
+class RigidBodyConstraint(bpy_struct):
+    type = Property('ENUM', default='FIXED', items=[(x, x, "") for x in ('FIXED', 'POINT', 'HINGE', 'SLIDER', 'PISTON', 'GENERIC', 'GENERIC_SPRING', 'MOTOR')])
+    enabled = Property('BOOL', default=True)
+    disable_collisions = Property('BOOL', default=True)
+    use_breaking = Property('BOOL')
+    breaking_threshold = Property('FLOAT', default=10.0, min=0.0)
+    use_override_solver_iterations = Property('BOOL')
+    solver_iterations = Property('INT', default=10, min=1)
+    spring_type = Property('ENUM', default='SPRING2', items=[('SPRING1', "", ""), ('SPRING2', "", "")])
+    object1 = Property('POINTER')
+    object2 = Property('POINTER')
+
+
+for axis in "xyz":
+    for prefix in ("", "ang_"):
+        setattr(RigidBodyConstraint, "use_spring_" + prefix + axis, Property('BOOL'))
+        setattr(RigidBodyConstraint, "spring_stiffness_" + prefix + axis, Property('FLOAT', default=10.0, min=0.0))
+        setattr(RigidBodyConstraint, "spring_damping_" + prefix + axis, Property('FLOAT', default=0.5, min=0.0))
+
+    setattr(RigidBodyConstraint, "use_limit_lin_" + axis, Property('BOOL'))
+    setattr(RigidBodyConstraint, "use_limit_ang_" + axis, Property('BOOL'))
+    setattr(RigidBodyConstraint, "limit_lin_" + axis + "_lower", Property('FLOAT', default=-1.0))
+    setattr(RigidBodyConstraint, "limit_lin_" + axis + "_upper", Property('FLOAT', default=1.0))
+    setattr(RigidBodyConstraint, "limit_ang_" + axis + "_lower", Property('FLOAT', default=-0.785398))
+    setattr(RigidBodyConstraint, "limit_ang_" + axis + "_upper", Property('FLOAT', default=0.785398))
+
+
+class Object(ID):
+    def __init__(self, name, object_data):
+        super().__init__(name)
+        self._data = None
+        self._mode = 'OBJECT'
+        self._select = False
+        self._rigid_body = None
+        self._rigid_body_constraint = None
+        self._pose = None
+        self._animation_data = None
+        # Collections which contain this object
+        self._collections = []
+        self._display = ObjectDisplay(self, "display")
+        self._constraints = ObjectConstraints(self)
+        self.data = object_data
+
+    @property
+    def type(self):
+        check_removed(self)
+
+        if self._data is None:
+            return 'EMPTY'
+        elif isinstance(self._data, Mesh):
+            return 'MESH'
+        elif isinstance(self._data, Armature):
+            return 'ARMATURE'
+        else:
+            return 'EMPTY'
+
+    def _get_data(self):
+        return self._data
+
+    def _set_data(self, value):
+        if self._data is not None and self._data._removed:
+            self._data = None
+
+        if value is self._data:
+            return
+
+        if self._data is not None:
+            if isinstance(self._data, Armature):
+                raise TypeError("Cannot change the data of an armature object in the fake bpy")
+
+            self._data._users -= 1
+
+        if value is not None:
+            value._users += 1
+
+        self._data = value
+
+        if isinstance(value, Armature):
+            self._pose = Pose(self)
+            self._pose._rebuild()
+
+    data = Property('POINTER', get=_get_data, set=_set_data)
+
+    parent = Property('POINTER')
+    parent_type = Property('ENUM', default='OBJECT', items=[(x, x, "") for x in ('OBJECT', 'ARMATURE', 'LATTICE', 'VERTEX', 'VERTEX_3', 'BONE')])
+    parent_bone = Property('STRING')
+
+    location = Property('FLOAT', size=3)
+    rotation_euler = Property('FLOAT', size=3)
+    rotation_quaternion = Property('FLOAT', size=4, default=(1.0, 0.0, 0.0, 0.0))
+    rotation_mode = Property('ENUM', default='XYZ', items=[(x, x, "") for x in ('QUATERNION', 'XYZ', 'XZY', 'YXZ', 'YZX', 'ZXY', 'ZYX', 'AXIS_ANGLE')])
+    rotation_axis_angle = Property('FLOAT', size=4, default=(0.0, 0.0, 1.0, 0.0))
+    scale = Property('FLOAT', size=3, default=(1.0, 1.0, 1.0))
+
+    # The delta transforms are ignored by matrix_basis
+    delta_location = Property('FLOAT', size=3)
+    delta_rotation_euler = Property('FLOAT', size=3)
+    delta_rotation_quaternion = Property('FLOAT', size=4, default=(1.0, 0.0, 0.0, 0.0))
+    delta_scale = Property('FLOAT', size=3, default=(1.0, 1.0, 1.0))
+
+    # Ignored by matrix_world
+    matrix_parent_inverse = Property('FLOAT', size=16, default=np.identity(4).ravel().tolist())
+
+    hide_render = Property('BOOL')
+    hide_viewport = Property('BOOL')
+    hide_select = Property('BOOL')
+    show_in_front = Property('BOOL')
+    show_bounds = Property('BOOL')
+    display_type = Property('ENUM', default='TEXTURED', items=[(x, x, "") for x in ('BOUNDS', 'WIRE', 'SOLID', 'TEXTURED')])
+    display_bounds_type = Property('ENUM', default='BOX', items=[(x, x, "") for x in ('BOX', 'SPHERE', 'CYLINDER', 'CONE', 'CAPSULE')])
+    empty_display_type = Property('ENUM', default='PLAIN_AXES', items=[(x, x, "") for x in ('PLAIN_AXES', 'ARROWS', 'SINGLE_ARROW', 'CIRCLE', 'CUBE', 'SPHERE', 'CONE', 'IMAGE')])
+    empty_display_size = Property('FLOAT', default=1.0, min=0.0)
+
+    @property
+    def display(self):
+        check_removed(self)
+        return self._display
+
+    @property
+    def mode(self):
+        check_removed(self)
+        return self._mode
+
+    @property
+    def rigid_body(self):
+        check_removed(self)
+        return self._rigid_body
+
+    @property
+    def animation_data(self):
+        check_removed(self)
+        return self._animation_data
+
+    def animation_data_create(self):
+        check_removed(self)
+
+        if self._animation_data is None:
+            self._animation_data = AnimData(self)
+
+        return self._animation_data
+
+    def animation_data_clear(self):
+        check_removed(self)
+        self._animation_data = None
+
+    # Only POSE -> LOCAL is supported, the bones always use the default inheritance
+    def convert_space(self, pose_bone=None, matrix=None, from_space='WORLD', to_space='WORLD'):
+        check_removed(self)
+        assert pose_bone is not None and from_space == 'POSE' and to_space == 'LOCAL'
+
+        bone = pose_bone.bone
+        parent = bone._parent
+
+        if parent is None:
+            rest = bone.matrix_local
+        else:
+            rest = pose_bone.parent.matrix @ parent.matrix_local.inverted() @ bone.matrix_local
+
+        return rest.inverted() @ Matrix(matrix)
+
+    @property
+    def rigid_body_constraint(self):
+        check_removed(self)
+        return self._rigid_body_constraint
+
+    @property
+    def pose(self):
+        check_removed(self)
+        return self._pose
+
+    @property
+    def constraints(self):
+        check_removed(self)
+        return self._constraints
+
+    @property
+    def users_collection(self):
+        check_removed(self)
+        return list(self._collections)
+
+    @property
+    def children(self):
+        check_removed(self)
+        return [object for object in data.objects._names.values() if object.parent is self]
+
+    @property
+    def matrix_basis(self):
+        check_removed(self)
+        return Matrix.LocRotScale(Vector(self.location), euler_matrix(self.rotation_euler), Vector(self.scale))
+
+    @property
+    def matrix_world(self):
+        check_removed(self)
+
+        matrix = self.matrix_basis
+
+        parent = self.parent
+
+        if parent is not None:
+            if self.parent_type == 'BONE' and parent.pose is not None and self.parent_bone in parent.pose.bones:
+                pose_bone = parent.pose.bones[self.parent_bone]
+                tail = Matrix.Translation(Vector((0.0, pose_bone.bone.length, 0.0)))
+                matrix = parent.matrix_world @ pose_bone.matrix @ tail @ matrix
+
+            else:
+                matrix = parent.matrix_world @ matrix
+
+        return matrix
+
+    def select_set(self, state, view_layer=None):
+        check_removed(self)
+        self._select = bool(state)
+
+    def select_get(self, view_layer=None):
+        check_removed(self)
+        return self._select
+
+    def _release(self):
+        for collection in list(self._collections):
+            collection.objects.unlink(self)
+
+        if self._data is not None and not self._data._removed:
+            self._data._users -= 1
+
+        # Blender also has to search every object for references, so removing objects is O(n)
+        for object in data.objects._names.values():
+            if object._values.get("parent") is self:
+                del object._values["parent"]
+
+        for scene in data.scenes._names.values():
+            view_layer = scene._view_layer
+
+            if view_layer._active is self:
+                view_layer._active = None
+
+        if self._pose is not None:
+            self._pose._remove()
+
+
+def euler_matrix(euler):
+    x, y, z = euler
+
+    rx = np.array([[1.0, 0.0, 0.0], [0.0, cos(x), -sin(x)], [0.0, sin(x), cos(x)]])
+    ry = np.array([[cos(y), 0.0, sin(y)], [0.0, 1.0, 0.0], [-sin(y), 0.0, cos(y)]])
+    rz = np.array([[cos(z), -sin(z), 0.0], [sin(z), cos(z), 0.0], [0.0, 0.0, 1.0]])
+
+    return Matrix((rz @ ry @ rx).tolist())
+
+
+class ObjectConstraints(bpy_prop_collection):
+    def __init__(self, owner):
+        super().__init__()
+        self._owner = owner
+
+
+# Meshes
+
+class MeshVertex(bpy_struct):
+    def __init__(self, mesh, index):
+        super().__init__(mesh, "vertices[{}]".format(index))
+        self._mesh = mesh
+        self._index = index
+
+    def _get_co(self):
+        return Vector(self._mesh._co[self._index])
+
+    def _set_co(self, value):
+        self._mesh._co[self._index] = value
+
+    co = Property('FLOAT', size=3, get=_get_co, set=_set_co)
+
+
+class MeshVertices(bpy_prop_collection):
+    def __init__(self, mesh):
+        super().__init__()
+        self._mesh = mesh
+
+    def _all(self):
+        return [MeshVertex(self._mesh, i) for i in range(len(self._mesh._co))]
+
+    def __len__(self):
+        return len(self._mesh._co)
+
+    def foreach_get(self, attribute, sequence):
+        if attribute == "co":
+            sequence[:] = self._mesh._co.ravel()
+        else:
+            super().foreach_get(attribute, sequence)
+
+    def foreach_set(self, attribute, sequence):
+        if attribute == "co":
+            count("foreach_set")
+            self._mesh._co[:] = np.asarray(sequence, dtype=np.float32).reshape((-1, 3))
+        else:
+            super().foreach_set(attribute, sequence)
+
+
+class MeshItems(bpy_prop_collection):
+    def __init__(self, mesh, name):
+        super().__init__()
+        self._mesh = mesh
+        self._name = name
+
+    def _all(self):
+        return list(getattr(self._mesh, self._name))
+
+
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self._co = np.zeros((0, 3), dtype=np.float32)
+        self._edges = []
+        self._faces = []
+
+    @property
+    def vertices(self):
+        check_removed(self)
+        return MeshVertices(self)
+
+    @property
+    def edges(self):
+        check_removed(self)
+        return MeshItems(self, "_edges")
+
+    @property
+    def polygons(self):
+        check_removed(self)
+        return MeshItems(self, "_faces")
+
+    def from_pydata(self, vertices, edges, faces):
+        check_removed(self)
+        count("writes")
+        self._co = np.array(vertices, dtype=np.float32).reshape((-1, 3))
+        self._edges = [tuple(edge) for edge in edges]
+        self._faces = [tuple(face) for face in faces]
+
+    def clear_geometry(self):
+        check_removed(self)
+        count("writes")
+        self._co = np.zeros((0, 3), dtype=np.float32)
+        self._edges = []
+        self._faces = []
+
+    def update(self, calc_edges=False, calc_edges_loose=False):
+        check_removed(self)
+
+
+# Armatures
+
+class Bone(bpy_struct):
+    def __init__(self, armature, name, head, tail, roll, use_connect):
+        super().__init__(armature, lambda: "bones[\"{}\"]".format(escape_name(self._name)))
+        self._armature = armature
+        self._name = name
+        self._head = np.array(head, dtype=np.float32)
+        self._tail = np.array(tail, dtype=np.float32)
+        self._roll = roll
+        self._use_connect = use_connect
+        self._parent = None
+        self._children = []
+
+        # Bone matrix in armature space
+        matrix = np.identity(4)
+        matrix[:3, :3] = vec_roll_to_mat3(self._tail - self._head, roll)
+        matrix[:3, 3] = self._head
+        self._matrix = matrix
+
+    def _get_name(self):
+        return self._name
+
+    def _set_name(self, name):
+        self._armature._rename_bone(self, name)
+
+    name = Property('STRING', get=_get_name, set=_set_name)
+
+    hide = Property('BOOL')
+    hide_select = Property('BOOL')
+    select = Property('BOOL')
+
+    @property
+    def parent(self):
+        check_removed(self)
+        return self._parent
+
+    @property
+    def children(self):
+        check_removed(self)
+        return list(self._children)
+
+    @property
+    def use_connect(self):
+        check_removed(self)
+        return self._use_connect
+
+    # The pose matrices always use the default inheritance
+    @property
+    def use_inherit_rotation(self):
+        return True
+
+    @property
+    def inherit_scale(self):
+        return 'FULL'
+
+    @property
+    def use_local_location(self):
+        return True
+
+    @property
+    def head_local(self):
+        check_removed(self)
+        return Vector(self._head)
+
+    @property
+    def tail_local(self):
+        check_removed(self)
+        return Vector(self._tail)
+
+    @property
+    def length(self):
+        check_removed(self)
+        return float32(np.linalg.norm(self._tail - self._head))
+
+    @property
+    def matrix_local(self):
+        check_removed(self)
+        return Matrix(self._matrix.tolist())
+
+    def __repr__(self):
+        return "bpy.data.armatures[\"{}\"].bones[\"{}\"]".format(self._armature._name, self._name)
+
+
+class EditBone(bpy_struct):
+    def __init__(self, armature, name):
+        super().__init__(armature, lambda: "edit_bones[\"{}\"]".format(escape_name(self._name)))
+        self._armature = armature
+        self._name = name
+        self._parent = None
+        # Registered properties which are copied back to the Bone
+        self._bone_values = None
+
+    def _get_name(self):
+        return self._name
+
+    def _set_name(self, name):
+        self._armature._rename_edit_bone(self, name)
+
+    name = Property('STRING', get=_get_name, set=_set_name)
+
+    head = Property('FLOAT', size=3)
+    tail = Property('FLOAT', size=3, default=(0.0, 1.0, 0.0))
+    roll = Property('FLOAT')
+    hide = Property('BOOL')
+    select = Property('BOOL')
+
+    def _get_use_connect(self):
+        return self._values.get("use_connect", False)
+
+    def _set_use_connect(self, value):
+        self._values["use_connect"] = bool(value)
+
+        # Connected bones have their head at the parent's tail
+        if value and self._parent is not None:
+            self._values["head"] = list(self._parent._values.get("tail", EditBone.tail.default))
+
+    use_connect = Property('BOOL', get=_get_use_connect, set=_set_use_connect)
+
+    def _get_parent(self):
+        return self._parent
+
+    def _set_parent(self, value):
+        if value is not None:
+            check_removed(value)
+
+            ancestor = value
+
+            while ancestor is not None:
+                if ancestor is self:
+                    # Blender ignores cyclic parents
+                    return
+
+                ancestor = ancestor._parent
+
+        self._parent = value
+
+        if value is None:
+            self._values["use_connect"] = False
+
+    parent = Property('POINTER', get=_get_parent, set=_set_parent)
+
+    @property
+    def children(self):
+        check_removed(self)
+        return [bone for bone in self._armature._edit_bones if bone._parent is self]
+
+    @property
+    def length(self):
+        check_removed(self)
+        return float32(np.linalg.norm(np.asarray(self.tail) - np.asarray(self.head)))
+
+
+class ArmatureBones(bpy_prop_collection):
+    def __init__(self, armature):
+        super().__init__()
+        self._armature = armature
+
+    def _all(self):
+        return self._armature._bones
+
+    def __len__(self):
+        return len(self._armature._bones)
+
+    def _find_name(self, name):
+        return self._armature._bone_names.get(name)
+
+    def find(self, name):
+        bone = self._armature._bone_names.get(name)
+
+        if bone is None:
+            return -1
+        else:
+            return self._armature._bones.index(bone)
+
+    def _get_active(self):
+        bone = self._armature._active_bone
+
+        if bone is not None and bone._removed:
+            return self._armature._bone_names.get(bone._name)
+
+        return bone
+
+    def _set_active(self, bone):
+        self._armature._active_bone = bone
+
+    active = property(_get_active, _set_active)
+
+    def foreach_get(self, attribute, sequence):
+        bones = self._armature._bones
+
+        if attribute == "head_local":
+            sequence[:] = np.array([bone._head for bone in bones], dtype=np.float32).ravel()
+        elif attribute == "tail_local":
+            sequence[:] = np.array([bone._tail for bone in bones], dtype=np.float32).ravel()
+        elif attribute == "length":
+            sequence[:] = [bone.length for bone in bones]
+        elif attribute == "matrix_local":
+            # Blender matrices are column major
+            sequence[:] = np.array([bone._matrix.T for bone in bones], dtype=np.float32).ravel()
+        else:
+            super().foreach_get(attribute, sequence)
+
+
+class ArmatureEditBones(bpy_prop_collection):
+    def __init__(self, armature):
+        super().__init__()
+        self._armature = armature
+
+    def _all(self):
+        if self._armature._is_editmode:
+            return self._armature._edit_bones
+        else:
+            return []
+
+    def _find_name(self, name):
+        for bone in self._all():
+            if bone._name == name:
+                return bone
+
+        return None
+
+    def new(self, name):
+        armature = self._armature
+
+        if not armature._is_editmode:
+            raise RuntimeError("EditBones can only be created in Edit mode")
+
+        bone = EditBone(armature, unique_name(name, {bone._name for bone in armature._edit_bones}))
+        armature._edit_bones.append(bone)
+        self._changed()
+        return bone
+
+    def remove(self, bone):
+        armature = self._armature
+
+        for child in armature._edit_bones:
+            if child._parent is bone:
+                child._parent = bone._parent
+
+        armature._edit_bones.remove(bone)
+        bone._remove()
+        self._changed()
+
+    def _get_active(self):
+        return self._armature._active_edit_bone
+
+    def _set_active(self, bone):
+        self._armature._active_edit_bone = bone
+
+    active = property(_get_active, _set_active)
+
+
+class Armature(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self._bones = []
+        self._bone_names = {}
+        self._active_bone = None
+        self._is_editmode = False
+        self._edit_bones = []
+        self._active_edit_bone = None
+        self._bones_collection = ArmatureBones(self)
+        self._edit_bones_collection = ArmatureEditBones(self)
+
+    display_type = Property('ENUM', default='OCTAHEDRAL', items=[(x, x, "") for x in ('OCTAHEDRAL', 'STICK', 'BBONE', 'ENVELOPE', 'WIRE')])
+    pose_position = Property('ENUM', default='POSE', items=[('POSE', "", ""), ('REST', "", "")])
+
+    @property
+    def bones(self):
+        check_removed(self)
+        return self._bones_collection
+
+    @property
+    def edit_bones(self):
+        check_removed(self)
+        return self._edit_bones_collection
+
+    @property
+    def is_editmode(self):
+        check_removed(self)
+        return self._is_editmode
+
+    def _objects(self):
+        return [object for object in data.objects._names.values() if object._data is self]
+
+    def _rename_bone(self, bone, name):
+        if name == bone._name:
+            return
+
+        old_name = bone._name
+
+        del self._bone_names[old_name]
+        bone._name = unique_name(name, self._bone_names)
+        self._bone_names[bone._name] = bone
+
+        for object in self._objects():
+            object._pose._rename(old_name, bone._name)
+
+        publish(Bone, "name")
+
+    def _rename_edit_bone(self, bone, name):
+        if name != bone._name:
+            bone._name = unique_name(name, {other._name for other in self._edit_bones if other is not bone})
+
+    # This is the same as make_editbone in source/blender/editors/armature/armature_utils.c
+    def _enter_edit(self):
+        assert not self._is_editmode
+
+        edit_bones = {}
+
+        for bone in self._bones:
+            edit_bone = EditBone(self, bone._name)
+            edit_bone._values["head"] = bone._head.tolist()
+            edit_bone._values["tail"] = bone._tail.tolist()
+            edit_bone._values["roll"] = bone._roll
+            edit_bone._values["use_connect"] = bone._use_connect
+            edit_bone._values["hide"] = bone._values.get("hide", False)
+            edit_bone._values["select"] = bone._values.get("select", False)
+            edit_bone._bone_values = copy_struct(bone)
+            edit_bones[bone._name] = edit_bone
+
+        for bone in self._bones:
+            if bone._parent is not None:
+                edit_bones[bone._name]._parent = edit_bones[bone._parent._name]
+
+        self._edit_bones = list(edit_bones.values())
+
+        if self._active_bone is not None:
+            self._active_edit_bone = edit_bones.get(self._active_bone._name)
+
+        self._is_editmode = True
+
+    # This is the same as ED_armature_from_edit, it recreates all of the bones
+    def _exit_edit(self):
+        assert self._is_editmode
+
+        active_name = None
+
+        if self._active_edit_bone is not None and not self._active_edit_bone._removed:
+            active_name = self._active_edit_bone._name
+
+        for bone in self._bones:
+            bone._remove()
+
+        bones = []
+        names = {}
+
+        children = {}
+
+        for edit_bone in self._edit_bones:
+            children.setdefault(id(edit_bone._parent), []).append(edit_bone)
+
+        # Bones are stored in depth first order
+        stack = [(edit_bone, None) for edit_bone in reversed(children.get(id(None), []))]
+
+        while stack:
+            edit_bone, parent = stack.pop()
+
+            values = edit_bone._values
+            head = values.get("head", EditBone.head.default)
+            tail = values.get("tail", EditBone.tail.default)
+
+            bone = Bone(self, edit_bone._name, head, tail, values.get("roll", 0.0), values.get("use_connect", False))
+
+            if "hide" in values:
+                bone._values["hide"] = values["hide"]
+
+            if "select" in values:
+                bone._values["select"] = values["select"]
+
+            if edit_bone._bone_values is not None:
+                paste_struct(bone, edit_bone._bone_values)
+
+            bone._parent = parent
+
+            if parent is not None:
+                parent._children.append(bone)
+
+            bones.append(bone)
+            names[bone._name] = bone
+
+            for child in reversed(children.get(id(edit_bone), [])):
+                stack.append((child, bone))
+
+        for edit_bone in self._edit_bones:
+            edit_bone._remove()
+
+        self._bones = bones
+        self._bone_names = names
+        self._edit_bones = []
+        self._active_edit_bone = None
+        self._active_bone = names.get(active_name)
+        self._is_editmode = False
+        self._bones_collection._changed()
+
+        for object in self._objects():
+            object._pose._rebuild()
+
+
+# Copies the registered properties of a struct, like IDP_CopyProperty
+def copy_struct(struct):
+    groups = {}
+
+    for name, value in struct._groups.items():
+        if isinstance(value, GroupCollection):
+            groups[name] = [copy_struct(item) for item in value._items]
+        else:
+            groups[name] = copy_struct(value)
+
+    return (dict(struct._values), groups)
+
+
+def paste_struct(struct, copy):
+    values, groups = copy
+
+    struct._values.update(values)
+
+    for name, value in groups.items():
+        prop = getattr(type(struct), name)
+
+        if isinstance(value, list):
+            collection = prop.__get__(struct, type(struct))
+
+            for item_copy in value:
+                paste_struct(collection.add(), item_copy)
+
+        else:
+            paste_struct(prop.__get__(struct, type(struct)), value)
+
+
+class Constraint(bpy_struct):
+    def __init__(self, owner, type, name):
+        super().__init__(owner, lambda: "constraints[\"{}\"]".format(escape_name(self._values["name"])))
+        self._type = type
+        self._values["name"] = name
+
+    @property
+    def type(self):
+        check_removed(self)
+        return self._type
+
+    name = Property('STRING')
+    mute = Property('BOOL')
+    influence = Property('FLOAT', default=1.0, min=0.0, max=1.0)
+    target = Property('POINTER')
+    subtarget = Property('STRING')
+    set_inverse_pending = Property('BOOL')
+    inverse_matrix = Property('FLOAT', size=16, default=np.identity(4).ravel().tolist())
+
+
+CONSTRAINT_NAMES = {
+    'CHILD_OF': "Child Of",
+    'COPY_TRANSFORMS': "Copy Transforms",
+    'COPY_LOCATION': "Copy Location",
+    'COPY_ROTATION': "Copy Rotation",
+}
+
+
+class PoseBoneConstraints(bpy_prop_collection):
+    def __init__(self, pose_bone):
+        super().__init__()
+        self._pose_bone = pose_bone
+
+    def new(self, type):
+        check_removed(self._pose_bone)
+
+        if type not in CONSTRAINT_NAMES:
+            raise TypeError("enum \"{}\" not found in {}".format(type, tuple(CONSTRAINT_NAMES)))
+
+        name = unique_name(CONSTRAINT_NAMES[type], {constraint._values["name"] for constraint in self._items})
+        constraint = Constraint(self._pose_bone, type, name)
+        self._items.append(constraint)
+        self._changed()
+        count("writes")
+        return constraint
+
+    def remove(self, constraint):
+        check_removed(self._pose_bone)
+        self._items.remove(constraint)
+        constraint._remove()
+        self._changed()
+        count("writes")
+
+    def move(self, from_index, to_index):
+        check_removed(self._pose_bone)
+        constraint = self._items.pop(from_index)
+        self._items.insert(to_index, constraint)
+        self._changed()
+        count("writes")
+
+
+class PoseBone(bpy_struct):
+    def __init__(self, pose, bone):
+        super().__init__(pose._object, lambda: "pose.bones[\"{}\"]".format(escape_name(self._bone._name)))
+        self._pose = pose
+        self._bone = bone
+        self._constraints = PoseBoneConstraints(self)
+
+    @property
+    def name(self):
+        check_removed(self)
+        return self._bone._name
+
+    @property
+    def bone(self):
+        check_removed(self)
+        return self._bone
+
+    @property
+    def parent(self):
+        check_removed(self)
+        parent = self._bone._parent
+
+        if parent is None:
+            return None
+        else:
+            return self._pose._bones[parent._name]
+
+    @property
+    def constraints(self):
+        check_removed(self)
+        return self._constraints
+
+    location = Property('FLOAT', size=3)
+    rotation_quaternion = Property('FLOAT', size=4, default=(1.0, 0.0, 0.0, 0.0))
+    rotation_euler = Property('FLOAT', size=3)
+    rotation_mode = Property('ENUM', default='QUATERNION', items=[(x, x, "") for x in ('QUATERNION', 'XYZ', 'XZY', 'YXZ', 'YZX', 'ZXY', 'ZYX', 'AXIS_ANGLE')])
+    rotation_axis_angle = Property('FLOAT', size=4, default=(0.0, 0.0, 1.0, 0.0))
+    scale = Property('FLOAT', size=3, default=(1.0, 1.0, 1.0))
+
+    def _get_matrix_basis(self):
+        if self.rotation_mode == 'QUATERNION':
+            rotation = Quaternion(self.rotation_quaternion).to_matrix()
+        else:
+            rotation = euler_matrix(self.rotation_euler)
+
+        return Matrix.LocRotScale(Vector(self.location), rotation, Vector(self.scale))
+
+    def _set_matrix_basis(self, matrix):
+        location, rotation, scale = Matrix(matrix).decompose()
+        self._values["location"] = list(location)
+        self._values["rotation_quaternion"] = list(rotation)
+        self._values["rotation_euler"] = list(rotation.to_euler())
+        self._values["scale"] = list(scale)
+
+    matrix_basis = Property('FLOAT', size=16, get=_get_matrix_basis, set=_set_matrix_basis)
+
+    # The constraints are ignored, because there is no simulation
+    def _get_matrix(self):
+        bone = self._bone
+        parent = bone._parent
+
+        if parent is None:
+            return bone.matrix_local @ self.matrix_basis
+
+        else:
+            offset = parent.matrix_local.inverted() @ bone.matrix_local
+            return self.parent.matrix @ offset @ self.matrix_basis
+
+    def _set_matrix(self, matrix):
+        bone = self._bone
+        parent = bone._parent
+
+        if parent is None:
+            rest = bone.matrix_local
+        else:
+            rest = self.parent.matrix @ parent.matrix_local.inverted() @ bone.matrix_local
+
+        self._set_matrix_basis(rest.inverted() @ Matrix(matrix))
+
+    matrix = Property('FLOAT', size=16, get=_get_matrix, set=_set_matrix)
+
+
+class PoseBones(bpy_prop_collection):
+    def __init__(self, pose):
+        super().__init__()
+        self._pose = pose
+
+    def _all(self):
+        bones = self._pose._bones
+        return [bones[bone._name] for bone in self._pose._object._data._bones]
+
+    def __len__(self):
+        return len(self._pose._bones)
+
+    def _find_name(self, name):
+        return self._pose._bones.get(name)
+
+
+class Pose(bpy_struct):
+    def __init__(self, object):
+        super().__init__(object, "pose")
+        self._object = object
+        self._bones = {}
+        self._bones_collection = PoseBones(self)
+
+    @property
+    def bones(self):
+        check_removed(self)
+        return self._bones_collection
+
+    def _rename(self, old_name, new_name):
+        self._bones[new_name] = self._bones.pop(old_name)
+
+    def _remove(self):
+        super()._remove()
+
+        for pose_bone in self._bones.values():
+            pose_bone._remove()
+
+    # Pose channels are kept (with their constraints) as long as the bone exists
+    def _rebuild(self):
+        armature = self._object._data
+        old = self._bones
+        self._bones = {}
+
+        for bone in armature._bones:
+            pose_bone = old.pop(bone._name, None)
+
+            if pose_bone is None:
+                pose_bone = PoseBone(self, bone)
+            else:
+                pose_bone._bone = bone
+
+            self._bones[bone._name] = pose_bone
+
+        for pose_bone in old.values():
+            pose_bone._remove()
+
+        self._bones_collection._changed()
+
+
+# Animation
+
+KEYFRAME_INTERPOLATIONS = [(x, x, "") for x in ('CONSTANT', 'LINEAR', 'BEZIER', 'SINE', 'QUAD', 'CUBIC', 'QUART', 'QUINT', 'EXPO', 'CIRC', 'BACK', 'BOUNCE', 'ELASTIC')]
+
+
+KEYFRAME_HANDLE_TYPES = [(x, x, "") for x in ('FREE', 'ALIGNED', 'VECTOR', 'AUTO', 'AUTO_CLAMPED')]
+
+
+class Keyframe(bpy_struct):
+    co = Property('FLOAT', size=2)
+    handle_left = Property('FLOAT', size=2)
+    handle_right = Property('FLOAT', size=2)
+    handle_left_type = Property('ENUM', default='AUTO_CLAMPED', items=KEYFRAME_HANDLE_TYPES)
+    handle_right_type = Property('ENUM', default='AUTO_CLAMPED', items=KEYFRAME_HANDLE_TYPES)
+    interpolation = Property('ENUM', default='BEZIER', items=KEYFRAME_INTERPOLATIONS)
+    easing = Property('ENUM', default='AUTO', items=[(x, x, "") for x in ('AUTO', 'EASE_IN', 'EASE_OUT', 'EASE_IN_OUT')])
+    type = Property('ENUM', default='KEYFRAME', items=[(x, x, "") for x in ('KEYFRAME', 'BREAKDOWN', 'MOVING_HOLD', 'EXTREME', 'JITTER')])
+    select_control_point = Property('BOOL')
+
+
+class FCurveKeyframePoints(bpy_prop_collection):
+    def __init__(self, fcurve):
+        super().__init__()
+        self._fcurve = fcurve
+
+    def add(self, count_):
+        for _ in range(count_):
+            self._items.append(Keyframe(self._fcurve, "keyframe_points"))
+
+        self._changed()
+        count("keyframes", count_)
+
+    def remove(self, keyframe, fast=False):
+        check_removed(self._fcurve)
+        self._items.remove(keyframe)
+        keyframe._remove()
+        self._changed()
+
+    # Bulk writes are common for keyframes, so this is faster than the generic version
+    def foreach_set(self, attribute, sequence):
+        if attribute != "co":
+            return super().foreach_set(attribute, sequence)
+
+        count("foreach_set")
+
+        values = np.asarray(sequence, dtype=np.float32).reshape(-1, 2)
+
+        if len(values) != len(self._items):
+            raise RuntimeError("internal error setting the array")
+
+        for keyframe, co in zip(self._items, values.tolist()):
+            keyframe._values["co"] = co
+
+    def foreach_get(self, attribute, sequence):
+        if attribute != "co":
+            return super().foreach_get(attribute, sequence)
+
+        if len(sequence) != len(self._items) * 2:
+            raise RuntimeError("internal error setting the array")
+
+        sequence[:] = [value for keyframe in self._items for value in keyframe._values.get("co", [0.0, 0.0])]
+
+
+class ActionGroup(bpy_struct):
+    def __init__(self, name):
+        super().__init__()
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+
+class FModifier(bpy_struct):
+    def __init__(self, fcurve, type):
+        super().__init__(fcurve, "modifiers")
+        self._type = type
+
+    @property
+    def type(self):
+        return self._type
+
+    mute = Property('BOOL')
+
+
+class FCurveModifiers(bpy_prop_collection):
+    def __init__(self, fcurve):
+        super().__init__()
+        self._fcurve = fcurve
+
+    def new(self, type):
+        modifier = FModifier(self._fcurve, type)
+        self._items.append(modifier)
+        self._changed()
+        return modifier
+
+
+class FCurve(bpy_struct):
+    def __init__(self, action, data_path, index, group):
+        super().__init__(action, "fcurves")
+        self._data_path = data_path
+        self._index = index
+        self._group = group
+        self._keyframe_points = FCurveKeyframePoints(self)
+        self._modifiers = FCurveModifiers(self)
+
+    color_mode = Property('ENUM', default='AUTO_RAINBOW', items=[(x, x, "") for x in ('AUTO_RAINBOW', 'AUTO_RGB', 'AUTO_YRGB', 'CUSTOM')])
+    extrapolation = Property('ENUM', default='CONSTANT', items=[(x, x, "") for x in ('CONSTANT', 'LINEAR')])
+    lock = Property('BOOL')
+    hide = Property('BOOL')
+    mute = Property('BOOL')
+    select = Property('BOOL')
+
+    @property
+    def modifiers(self):
+        check_removed(self)
+        return self._modifiers
+
+    @property
+    def data_path(self):
+        return self._data_path
+
+    @property
+    def array_index(self):
+        return self._index
+
+    @property
+    def group(self):
+        if self._group == "":
+            return None
+        else:
+            return ActionGroup(self._group)
+
+    @property
+    def keyframe_points(self):
+        check_removed(self)
+        return self._keyframe_points
+
+    # Blender recalculates the handles here, there are no handles in the fake
+    def update(self):
+        check_removed(self)
+        self._keyframe_points._items.sort(key=lambda keyframe: keyframe._values.get("co", [0.0, 0.0])[0])
+
+    def evaluate(self, frame):
+        points = [keyframe.co for keyframe in self._keyframe_points]
+
+        if len(points) == 0:
+            return 0.0
+
+        frames = [point[0] for point in points]
+        values = [point[1] for point in points]
+
+        return float(np.interp(frame, frames, values))
+
+
+class ActionFCurves(bpy_prop_collection):
+    def __init__(self, action):
+        super().__init__()
+        self._action = action
+
+    def new(self, data_path, index=0, action_group=""):
+        check_removed(self._action)
+
+        if self.find(data_path, index=index) is not None:
+            raise RuntimeError("Error: F-Curve '{}[{}]' already exists in action '{}'".format(data_path, index, self._action.name))
+
+        fcurve = FCurve(self._action, data_path, index, action_group)
+        self._items.append(fcurve)
+        self._changed()
+        return fcurve
+
+    def find(self, data_path, index=0):
+        for fcurve in self._items:
+            if fcurve._data_path == data_path and fcurve._index == index:
+                return fcurve
+
+        return None
+
+    def remove(self, fcurve):
+        self._items.remove(fcurve)
+        fcurve._remove()
+        self._changed()
+
+
+class Action(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self._fcurves = ActionFCurves(self)
+
+    @property
+    def fcurves(self):
+        check_removed(self)
+        return self._fcurves
+
+    def copy(self):
+        check_removed(self)
+
+        action = data.actions.new(self._name)
+
+        for fcurve in self._fcurves:
+            copy = action.fcurves.new(fcurve._data_path, index=fcurve._index, action_group=fcurve._group)
+            copy.keyframe_points.add(len(fcurve.keyframe_points))
+            copy.keyframe_points.foreach_set("co", [keyframe.co for keyframe in fcurve.keyframe_points])
+
+        return action
+
+    # Only the actions of objects are modeled
+    def user_remap(self, new_id):
+        check_removed(self)
+
+        for object in data.objects:
+            animation_data = object._animation_data
+
+            if animation_data is not None and animation_data._action is self:
+                animation_data.action = new_id
+
+
+# The NLA and drivers are not evaluated, they are always empty
+class AnimData(bpy_struct):
+    def __init__(self, owner):
+        super().__init__(owner, "animation_data")
+        self._action = None
+        self._nla_tracks = bpy_prop_collection()
+        self._drivers = bpy_prop_collection()
+
+    use_nla = Property('BOOL', default=True)
+    action_blend_type = Property('ENUM', default='REPLACE', items=[(x, x, "") for x in ('REPLACE', 'COMBINE', 'ADD', 'SUBTRACT', 'MULTIPLY')])
+    action_influence = Property('FLOAT', default=1.0, min=0.0, max=1.0)
+    action_extrapolation = Property('ENUM', default='HOLD', items=[(x, x, "") for x in ('NOTHING', 'HOLD', 'HOLD_FORWARD')])
+
+    @property
+    def nla_tracks(self):
+        check_removed(self)
+        return self._nla_tracks
+
+    @property
+    def drivers(self):
+        check_removed(self)
+        return self._drivers
+
+    def _get_action(self):
+        if self._action is not None and self._action._removed:
+            self._action = None
+
+        return self._action
+
+    def _set_action(self, action):
+        if self._action is not None and not self._action._removed:
+            self._action._users -= 1
+
+        if action is not None:
+            action._users += 1
+
+        self._action = action
+
+    action = Property('POINTER', get=_get_action, set=_set_action)
+
+
+# Collections and scenes
+
+class CollectionObjects(bpy_prop_collection):
+    def __init__(self, collection):
+        super().__init__()
+        self._collection = collection
+        self._objects = {}
+
+    def _all(self):
+        return list(self._objects.values())
+
+    def __len__(self):
+        return len(self._objects)
+
+    def _find_name(self, name):
+        for object in self._objects.values():
+            if object._name == name:
+                return object
+
+        return None
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self._find_name(key) is not None
+        else:
+            return id(key) in self._objects
+
+    def link(self, object):
+        check_removed(self._collection)
+        check_removed(object)
+
+        if id(object) in self._objects:
+            raise RuntimeError("Object '{}' already in collection '{}'".format(object._name, self._collection._name))
+
+        self._objects[id(object)] = object
+        object._collections.append(self._collection)
+        object._users += 1
+        self._changed()
+        count("links")
+
+    def unlink(self, object):
+        check_removed(self._collection)
+
+        if id(object) not in self._objects:
+            raise RuntimeError("Object '{}' not in collection '{}'".format(object._name, self._collection._name))
+
+        del self._objects[id(object)]
+        object._collections.remove(self._collection)
+        object._users -= 1
+        self._changed()
+
+
+class CollectionChildren(bpy_prop_collection):
+    def __init__(self, collection):
+        super().__init__()
+        self._collection = collection
+
+    def link(self, child):
+        check_removed(self._collection)
+        check_removed(child)
+
+        if child in self._items:
+            raise RuntimeError("Collection '{}' already in collection '{}'".format(child._name, self._collection._name))
+
+        self._items.append(child)
+        child._parents.append(self._collection)
+        child._users += 1
+        self._changed()
+        count("links")
+
+    def unlink(self, child):
+        check_removed(self._collection)
+        self._items.remove(child)
+        child._parents.remove(self._collection)
+        child._users -= 1
+        self._changed()
+
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self._objects = CollectionObjects(self)
+        self._children = CollectionChildren(self)
+        self._parents = []
+
+    hide_render = Property('BOOL')
+    hide_viewport = Property('BOOL')
+    hide_select = Property('BOOL')
+
+    @property
+    def objects(self):
+        check_removed(self)
+        return self._objects
+
+    @property
+    def children(self):
+        check_removed(self)
+        return self._children
+
+    @property
+    def all_objects(self):
+        check_removed(self)
+
+        seen = {}
+
+        def add(collection):
+            for object in collection._objects._objects.values():
+                seen[id(object)] = object
+
+            for child in collection._children._items:
+                add(child)
+
+        add(self)
+        return list(seen.values())
+
+    def _release(self):
+        for parent in list(self._parents):
+            parent.children.unlink(self)
+
+        for child in list(self._children._items):
+            self._children.unlink(child)
+
+        for object in list(self._objects._objects.values()):
+            self._objects.unlink(object)
+
+
+class PointCache(bpy_struct):
+    frame_start = Property('INT', default=1)
+    frame_end = Property('INT', default=250)
+
+
+class EffectorWeights(bpy_struct):
+    collection = Property('POINTER')
+
+
+for name in ("all", "gravity", "force", "vortex", "magnetic", "wind", "curve_guide", "texture", "harmonic", "charge", "lennardjones", "turbulence", "drag", "boid", "smokeflow"):
+    setattr(EffectorWeights, name, Property('FLOAT', default=1.0))
+
+
+class RigidBodyWorld(bpy_struct):
+    def __init__(self, scene):
+        super().__init__(scene, "rigidbody_world")
+        self._point_cache = PointCache(self, "point_cache")
+        self._effector_weights = EffectorWeights(self, "effector_weights")
+
+    enabled = Property('BOOL', default=True)
+    time_scale = Property('FLOAT', default=1.0)
+    substeps_per_frame = Property('INT', default=10)
+    solver_iterations = Property('INT', default=10)
+    use_split_impulse = Property('BOOL')
+
+    @property
+    def point_cache(self):
+        check_removed(self)
+        return self._point_cache
+
+    @property
+    def effector_weights(self):
+        check_removed(self)
+        return self._effector_weights
+
+    # Assigning the collection validates the world, like BKE_rigidbody_validate_sim_world
+    def _get_collection(self):
+        return self.__class__.collection_property.raw(self)
+
+    def _set_collection(self, collection):
+        self._values["collection"] = collection
+
+        if collection is not None:
+            for object in collection.all_objects:
+                if object._rigid_body is None:
+                    object._rigid_body = RigidBodyObject(object, "rigid_body")
+                    count("rigid_bodies_created")
+
+    def _get_constraints(self):
+        return self.__class__.constraints_property.raw(self)
+
+    def _set_constraints(self, collection):
+        self._values["constraints"] = collection
+
+        if collection is not None:
+            for object in collection.all_objects:
+                if object._rigid_body_constraint is None:
+                    object._rigid_body_constraint = RigidBodyConstraint(object, "rigid_body_constraint")
+                    count("rigid_bodies_created")
+
+    collection_property = Property('POINTER', type=Collection)
+    constraints_property = Property('POINTER', type=Collection)
+
+    collection = Property('POINTER', type=Collection, get=_get_collection, set=_set_collection)
+    constraints = Property('POINTER', type=Collection, get=_get_constraints, set=_set_constraints)
+
+
+RigidBodyWorld.collection_property.name = "collection"
+RigidBodyWorld.constraints_property.name = "constraints"
+
+
+class ViewLayerObjects(bpy_prop_collection):
+    def __init__(self, view_layer):
+        super().__init__()
+        self._view_layer = view_layer
+
+    def _all(self):
+        return self._view_layer._scene._collection.all_objects
+
+    def _find_name(self, name):
+        for object in self._all():
+            if object._name == name:
+                return object
+
+        return None
+
+    def _get_active(self):
+        active = self._view_layer._active
+
+        if active is not None and active._removed:
+            self._view_layer._active = None
+            return None
+
+        return active
+
+    def _set_active(self, object):
+        if object is not None:
+            check_removed(object)
+
+        self._view_layer._active = object
+
+    active = property(_get_active, _set_active)
+
+    @property
+    def selected(self):
+        return [object for object in self._all() if object._select]
+
+
+class ViewLayer(bpy_struct):
+    def __init__(self, scene):
+        super().__init__(scene, "view_layers[\"ViewLayer\"]")
+        self._scene = scene
+        self._active = None
+        self._objects = ViewLayerObjects(self)
+
+    name = Property('STRING', default="ViewLayer")
+
+    @property
+    def objects(self):
+        check_removed(self)
+        return self._objects
+
+    def update(self):
+        pass
+
+
+class SceneRender(bpy_struct):
+    fps = Property('INT', default=24)
+    fps_base = Property('FLOAT', default=1.0)
+
+
+class Scene(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        # The master collection isn't in bpy.data.collections
+        self._collection = Collection("Scene Collection")
+        self._collection._users = 1
+        self._view_layer = ViewLayer(self)
+        self._rigidbody_world = None
+        self._render = SceneRender(self, "render")
+        self._values["frame_current"] = 1
+
+    frame_current = Property('INT', default=1)
+    frame_start = Property('INT', default=1)
+    frame_end = Property('INT', default=250)
+
+    use_gravity = Property('BOOL', default=True)
+    gravity = Property('FLOAT', size=3, default=(0.0, 0.0, -9.81))
+
+    @property
+    def collection(self):
+        check_removed(self)
+        return self._collection
+
+    @property
+    def objects(self):
+        check_removed(self)
+        return self._collection.all_objects
+
+    @property
+    def view_layers(self):
+        check_removed(self)
+        return [self._view_layer]
+
+    @property
+    def render(self):
+        check_removed(self)
+        return self._render
+
+    @property
+    def rigidbody_world(self):
+        check_removed(self)
+        return self._rigidbody_world
+
+    def frame_set(self, frame, subframe=0.0):
+        check_removed(self)
+        from bpy.app import handlers
+
+        count("frame_changes")
+
+        # Blender changes the frame before running the handlers
+        self._values["frame_current"] = int(frame)
+
+        for handler in list(handlers.frame_change_pre):
+            call_handler(handler, self, None)
+
+        for handler in list(handlers.frame_change_post):
+            call_handler(handler, self, None)
+
+
+class WindowManager(bpy_struct):
+    def __init__(self):
+        super().__init__()
+        self._progress = None
+
+    @property
+    def windows(self):
+        return []
+
+    def progress_begin(self, min, max):
+        self._progress = (min, max, min)
+
+    def progress_update(self, value):
+        if self._progress is not None:
+            self._progress = (self._progress[0], self._progress[1], value)
+
+    def progress_end(self):
+        self._progress = None
+
+    def fileselect_add(self, operator):
+        pass
+
+
+# Keys which can be overridden by passing a dict to an operator
+OVERRIDE_KEYS = ("active_object", "object", "selected_objects", "selected_editable_objects", "edit_object")
+
+
+class Context:
+    def __init__(self):
+        self.window_manager = WindowManager()
+        self.scene = None
+        self.screen = None
+        self.area = None
+        self.region = None
+        self.window = None
+
+        # Stack of context overrides, for operators which are called with a dict
+        self._overrides = []
+
+    def _get(self, key, default):
+        for override in reversed(self._overrides):
+            if key in override:
+                return override[key]
+
+        return default()
+
+    def copy(self):
+        output = {
+            "window_manager": self.window_manager,
+            "scene": self.scene,
+            "view_layer": self.view_layer,
+        }
+
+        for key in OVERRIDE_KEYS:
+            output[key] = getattr(self, key)
+
+        return output
+
+    @property
+    def view_layer(self):
+        return self.scene._view_layer
+
+    @property
+    def active_object(self):
+        return self._get("active_object", lambda: self.view_layer.objects.active)
+
+    @property
+    def object(self):
+        return self._get("object", lambda: self.active_object)
+
+    @property
+    def selected_objects(self):
+        return self._get("selected_objects", lambda: self.view_layer.objects.selected)
+
+    @property
+    def selected_editable_objects(self):
+        return self._get("selected_editable_objects", lambda: self.selected_objects)
+
+    @property
+    def edit_object(self):
+        def default():
+            object = self.active_object
+
+            if object is not None and object._mode == 'EDIT':
+                return object
+
+            else:
+                return None
+
+        return self._get("edit_object", default)
+
+    @property
+    def mode(self):
+        object = self.active_object
+
+        if object is None:
+            return 'OBJECT'
+
+        elif object._mode == 'EDIT':
+            return 'EDIT_' + object.type
+
+        else:
+            return object._mode
+
+    @property
+    def selected_pose_bones_from_active_object(self):
+        object = self.active_object
+
+        if object is None or object.type != 'ARMATURE' or object._mode != 'POSE':
+            return []
+
+        return [pose_bone for pose_bone in object.pose.bones if pose_bone.bone.select]
+
+    @property
+    def active_bone(self):
+        object = self.active_object
+
+        if object is None or object.type != 'ARMATURE':
+            return None
+
+        return object.data.bones.active
+
+    @property
+    def active_pose_bone(self):
+        bone = self.active_bone
+
+        if bone is None:
+            return None
+
+        return self.active_object.pose.bones.get(bone.name)
+
+
+class BlendData:
+    def __init__(self):
+        self.objects = IDCollection(Object)
+        self.meshes = IDCollection(Mesh)
+        self.armatures = IDCollection(Armature)
+        self.collections = IDCollection(Collection)
+        self.scenes = IDCollection(Scene)
+        self.actions = IDCollection(Action)
+        self.filepath = ""
+        self.is_dirty = False
+
+        self.objects.new = lambda name, object_data: self.objects._add(Object(name, object_data))
+        self.meshes.new = lambda name: self.meshes._add(Mesh(name))
+        self.armatures.new = lambda name: self.armatures._add(Armature(name))
+        self.collections.new = lambda name: self.collections._add(Collection(name))
+        self.scenes.new = lambda name: self.scenes._add(Scene(name))
+        self.actions.new = lambda name: self.actions._add(Action(name))
+
+
+# Blender only runs the depsgraph handlers when something changed, this always
+# runs them. There is no depsgraph, so the handlers get None instead.
+def evaluate_depsgraph():
+    from bpy.app import handlers
+
+    scene = context.scene
+
+    for handler in list(handlers.depsgraph_update_pre):
+        call_handler(handler, scene, None)
+
+    for handler in list(handlers.depsgraph_update_post):
+        call_handler(handler, scene, None)
+
+
+# Message bus, the notifications are delivered by bpy.process_events
+def publish(type, name):
+    from bpy import msgbus
+    msgbus.publish_rna(key=(type, name))
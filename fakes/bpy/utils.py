@@ -0,0 +1,42 @@
+from . import types
+from . import ops
+
+
+# Python classes can declare properties with annotations, including in mixin classes
+def class_annotations(cls):
+    annotations = {}
+
+    for base in reversed(cls.__mro__):
+        for name, value in base.__dict__.get("__annotations__", {}).items():
+            if isinstance(value, types.Property):
+                annotations[name] = value
+
+    return annotations
+
+
+def register_class(cls):
+    for name, prop in class_annotations(cls).items():
+        setattr(cls, name, prop)
+
+    idname = getattr(cls, "bl_idname", None)
+
+    if issubclass(cls, types.Operator):
+        ops.operators[idname] = cls
+
+    if hasattr(cls, "register"):
+        cls.register()
+
+    # Menus can be extended by other classes
+    if issubclass(cls, types.Menu) and idname is not None:
+        setattr(types, idname, cls)
+
+
+def unregister_class(cls):
+    if hasattr(cls, "unregister"):
+        cls.unregister()
+
+    if issubclass(cls, types.Operator):
+        ops.operators.pop(cls.bl_idname, None)
+
+    if issubclass(cls, types.Menu) and getattr(types, cls.bl_idname, None) is cls:
+        delattr(types, cls.bl_idname)
@@ -0,0 +1,282 @@
+# Minimal stand-in for Blender's mathutils module, backed by numpy.
+import numpy as np
+from math import cos, sin, atan2, sqrt
+
+
+class Vector:
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._values = np.array(values, dtype=np.float64)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values.tolist())
+
+    def __getitem__(self, index):
+        return float(self._values[index])
+
+    def __setitem__(self, index, value):
+        self._values[index] = value
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._values, dtype=dtype)
+
+    def __eq__(self, other):
+        try:
+            return np.array_equal(self._values, np.asarray(other, dtype=np.float64))
+        except (TypeError, ValueError):
+            return False
+
+    def __add__(self, other):
+        return Vector(self._values + np.asarray(other))
+
+    def __sub__(self, other):
+        return Vector(self._values - np.asarray(other))
+
+    def __mul__(self, scalar):
+        return Vector(self._values * scalar)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vector(-self._values)
+
+    def __repr__(self):
+        return "Vector({})".format(tuple(self._values.tolist()))
+
+    def _get(index):
+        return property(lambda self: float(self._values[index]), lambda self, value: self._values.__setitem__(index, value))
+
+    x = _get(0)
+    y = _get(1)
+    z = _get(2)
+    w = _get(3)
+
+    del _get
+
+    @property
+    def length(self):
+        return float(np.linalg.norm(self._values))
+
+    def normalized(self):
+        length = self.length
+        return Vector(self._values / length if length != 0.0 else self._values)
+
+    def dot(self, other):
+        return float(np.dot(self._values, np.asarray(other)))
+
+    def cross(self, other):
+        return Vector(np.cross(self._values, np.asarray(other)))
+
+    def copy(self):
+        return Vector(self._values)
+
+    def to_tuple(self):
+        return tuple(self._values.tolist())
+
+
+class Matrix:
+    def __init__(self, rows=None):
+        if rows is None:
+            self._matrix = np.identity(4)
+        else:
+            self._matrix = np.array(rows, dtype=np.float64)
+
+    def __len__(self):
+        return len(self._matrix)
+
+    def __iter__(self):
+        return (Vector(row) for row in self._matrix)
+
+    def __getitem__(self, index):
+        return Vector(self._matrix[index])
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._matrix, dtype=dtype)
+
+    def __eq__(self, other):
+        try:
+            return np.array_equal(self._matrix, np.asarray(other, dtype=np.float64))
+        except (TypeError, ValueError):
+            return False
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(self._matrix @ other._matrix)
+
+        vector = np.asarray(other, dtype=np.float64)
+
+        # Vectors are treated as points
+        if len(vector) == 3 and len(self._matrix) == 4:
+            return Vector((self._matrix @ np.append(vector, 1.0))[:3])
+
+        else:
+            return Vector(self._matrix @ vector)
+
+    def __repr__(self):
+        return "Matrix({})".format(tuple(tuple(row) for row in self._matrix.tolist()))
+
+    @classmethod
+    def Identity(cls, size):
+        return cls(np.identity(size))
+
+    @classmethod
+    def Translation(cls, vector):
+        matrix = np.identity(4)
+        matrix[:3, 3] = np.asarray(vector)
+        return cls(matrix)
+
+    @classmethod
+    def LocRotScale(cls, location, rotation, scale):
+        matrix = np.identity(4)
+
+        if rotation is not None:
+            if isinstance(rotation, (Euler, Quaternion)):
+                rotation = rotation.to_matrix()
+
+            matrix[:3, :3] = np.asarray(rotation)[:3, :3]
+
+        if scale is not None:
+            matrix[:3, :3] = matrix[:3, :3] * np.asarray(scale)
+
+        if location is not None:
+            matrix[:3, 3] = np.asarray(location)
+
+        return cls(matrix)
+
+    @property
+    def translation(self):
+        return Vector(self._matrix[:3, 3])
+
+    def inverted(self):
+        return Matrix(np.linalg.inv(self._matrix))
+
+    def transposed(self):
+        return Matrix(self._matrix.T)
+
+    def copy(self):
+        return Matrix(self._matrix)
+
+    def to_3x3(self):
+        return Matrix(self._matrix[:3, :3])
+
+    def to_4x4(self):
+        matrix = np.identity(4)
+        size = len(self._matrix)
+        matrix[:size, :size] = self._matrix
+        return Matrix(matrix)
+
+    def to_scale(self):
+        return Vector(np.linalg.norm(self._matrix[:3, :3], axis=0))
+
+    def to_euler(self):
+        return self.to_quaternion().to_euler()
+
+    # Based on mat3_normalized_to_quat in source/blender/blenlib/intern/math_rotation.c
+    def to_quaternion(self):
+        matrix = self._matrix[:3, :3] / self.to_scale()._values
+        trace = np.trace(matrix)
+
+        if trace > 0.0:
+            s = sqrt(trace + 1.0) * 2.0
+            w = 0.25 * s
+            x = (matrix[2, 1] - matrix[1, 2]) / s
+            y = (matrix[0, 2] - matrix[2, 0]) / s
+            z = (matrix[1, 0] - matrix[0, 1]) / s
+
+        elif matrix[0, 0] > matrix[1, 1] and matrix[0, 0] > matrix[2, 2]:
+            s = sqrt(1.0 + matrix[0, 0] - matrix[1, 1] - matrix[2, 2]) * 2.0
+            w = (matrix[2, 1] - matrix[1, 2]) / s
+            x = 0.25 * s
+            y = (matrix[0, 1] + matrix[1, 0]) / s
+            z = (matrix[0, 2] + matrix[2, 0]) / s
+
+        elif matrix[1, 1] > matrix[2, 2]:
+            s = sqrt(1.0 + matrix[1, 1] - matrix[0, 0] - matrix[2, 2]) * 2.0
+            w = (matrix[0, 2] - matrix[2, 0]) / s
+            x = (matrix[0, 1] + matrix[1, 0]) / s
+            y = 0.25 * s
+            z = (matrix[1, 2] + matrix[2, 1]) / s
+
+        else:
+            s = sqrt(1.0 + matrix[2, 2] - matrix[0, 0] - matrix[1, 1]) * 2.0
+            w = (matrix[1, 0] - matrix[0, 1]) / s
+            x = (matrix[0, 2] + matrix[2, 0]) / s
+            y = (matrix[1, 2] + matrix[2, 1]) / s
+            z = 0.25 * s
+
+        return Quaternion((w, x, y, z))
+
+    def decompose(self):
+        return (self.translation, self.to_quaternion(), self.to_scale())
+
+
+class Euler:
+    def __init__(self, angles=(0.0, 0.0, 0.0), order='XYZ'):
+        assert order == 'XYZ'
+        self._values = np.array(angles, dtype=np.float64)
+        self.order = order
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        return iter(self._values.tolist())
+
+    def __getitem__(self, index):
+        return float(self._values[index])
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._values, dtype=dtype)
+
+    def __repr__(self):
+        return "Euler({}, '{}')".format(tuple(self._values.tolist()), self.order)
+
+    def to_matrix(self):
+        x, y, z = self._values
+
+        rx = np.array([[1.0, 0.0, 0.0], [0.0, cos(x), -sin(x)], [0.0, sin(x), cos(x)]])
+        ry = np.array([[cos(y), 0.0, sin(y)], [0.0, 1.0, 0.0], [-sin(y), 0.0, cos(y)]])
+        rz = np.array([[cos(z), -sin(z), 0.0], [sin(z), cos(z), 0.0], [0.0, 0.0, 1.0]])
+
+        return Matrix(rz @ ry @ rx)
+
+
+class Quaternion:
+    def __init__(self, values=(1.0, 0.0, 0.0, 0.0)):
+        self._values = np.array(values, dtype=np.float64)
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        return iter(self._values.tolist())
+
+    def __getitem__(self, index):
+        return float(self._values[index])
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._values, dtype=dtype)
+
+    def __repr__(self):
+        return "Quaternion({})".format(tuple(self._values.tolist()))
+
+    def to_matrix(self):
+        w, x, y, z = self._values / np.linalg.norm(self._values)
+
+        return Matrix([
+            [1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - w * z), 2.0 * (x * z + w * y)],
+            [2.0 * (x * y + w * z), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - w * x)],
+            [2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)],
+        ])
+
+    def to_euler(self):
+        matrix = self.to_matrix()._matrix
+        cy = np.hypot(matrix[0, 0], matrix[1, 0])
+
+        if cy > 16.0 * np.finfo(np.float32).eps:
+            return Euler((atan2(matrix[2, 1], matrix[2, 2]), atan2(-matrix[2, 0], cy), atan2(matrix[1, 0], matrix[0, 0])))
+
+        else:
+            return Euler((atan2(-matrix[1, 2], matrix[1, 1]), atan2(-matrix[2, 0], cy), 0.0))
@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+import unittest
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, os.path.join(repo_path, "benchmarks"))
+
+# This also adds the fakes folder to the path
+import benchmark
+
+import bpy
+
+
+class BakeActionTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        self.armature = benchmark.make_rig(bpy.context, "chain", 5)
+        benchmark.configure_rig(self.addon, self.armature, "chain")
+        benchmark.flush(self.addon)
+
+        self.source = bpy.data.actions.new("Source")
+        self.armature.animation_data_create().action = self.source
+
+
+    def bake(self):
+        bpy.context.view_layer.objects.active = self.armature
+        result = bpy.ops.rigid_body_bones.bake(frame_start=1, frame_end=5, disable=False, use_cache=False)
+        self.assertEqual(result, {'FINISHED'})
+        return self.armature.animation_data.action
+
+
+    def test_bake_again(self):
+        self.bake()
+        second = self.bake()
+
+        name = "{} Baked".format(self.armature.name)
+
+        self.assertEqual(second.name, name)
+        self.assertIs(second.rigid_body_bones.source, self.source)
+        self.assertEqual([action for action in bpy.data.actions if action.name.startswith(name)], [second])
+
+
+    def test_keep_physics(self):
+        self.bake()
+
+        # The physics is enabled again after the keyframes are written
+        self.assertTrue(self.armature.data.rigid_body_bones.enabled)
+        self.assertIsNone(self.armature.data.bones[1].parent)
+
+
+class BakeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        self.armature = benchmark.make_rig(bpy.context, "chain", 5)
+        benchmark.configure_rig(self.addon, self.armature, "chain")
+        benchmark.flush(self.addon)
+
+        self.directory = tempfile.TemporaryDirectory()
+        os.environ["RIGID_BODY_BONES_CACHE"] = self.directory.name
+
+
+    def tearDown(self):
+        del os.environ["RIGID_BODY_BONES_CACHE"]
+        self.directory.cleanup()
+
+
+    def bake(self):
+        # The baked action changes the animation, so it's removed before baking again
+        self.armature.animation_data_create().action = None
+
+        bpy.context.view_layer.objects.active = self.armature
+        result = bpy.ops.rigid_body_bones.bake(frame_start=1, frame_end=5, disable=False, use_cache=True)
+        self.assertEqual(result, {'FINISHED'})
+
+        return self.addon.utils.armature_key(self.armature) in self.addon.cache.cached_bakes
+
+
+    def test_cache_hit(self):
+        self.assertFalse(self.bake())
+        self.assertTrue(self.bake())
+
+
+if __name__ == "__main__":
+    unittest.main()
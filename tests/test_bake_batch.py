@@ -0,0 +1,34 @@
+import os
+import sys
+import unittest
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, repo_path)
+
+import bake_batch
+
+
+class OutputPathsTest(unittest.TestCase):
+    def test_same_name(self):
+        first = os.path.join(repo_path, "shots", "sh010", "anim.blend")
+        second = os.path.join(repo_path, "shots", "sh020", "anim.blend")
+
+        outputs = bake_batch.output_paths([first, second], "baked")
+        output_dir = os.path.abspath("baked")
+
+        self.assertEqual(outputs[first], os.path.join(output_dir, "sh010", "anim.blend"))
+        self.assertEqual(outputs[second], os.path.join(output_dir, "sh020", "anim.blend"))
+        self.assertEqual(bake_batch.output_collisions(outputs), [])
+
+
+    def test_collision(self):
+        outputs = {"a.blend": "baked/anim.blend", "b.blend": "baked/anim.blend"}
+
+        self.assertEqual(bake_batch.output_collisions(outputs), [["a.blend", "b.blend"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
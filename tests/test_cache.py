@@ -0,0 +1,131 @@
+import os
+import sys
+import tempfile
+import unittest
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, os.path.join(repo_path, "benchmarks"))
+
+# This also adds the fakes folder to the path
+import benchmark
+
+import bpy
+
+
+class SettingsHashTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        self.armature = benchmark.make_rig(bpy.context, "chain", 5)
+        benchmark.configure_rig(self.addon, self.armature, "chain")
+        benchmark.flush(self.addon)
+
+        self.scene = bpy.context.scene
+
+
+    def settings_hash(self):
+        return self.addon.cache.settings_hash(self.scene, self.armature, 1, 20)
+
+
+    def assertChanges(self, change):
+        before = self.settings_hash()
+        change()
+        self.assertNotEqual(self.settings_hash(), before)
+
+
+    def test_armature_transform(self):
+        self.assertChanges(lambda: setattr(self.armature, "location", (1.0, 0.0, 0.0)))
+
+
+    def test_world_settings(self):
+        world = self.scene.rigidbody_world
+
+        self.assertChanges(lambda: setattr(world, "use_split_impulse", True))
+        self.assertChanges(lambda: setattr(world.effector_weights, "gravity", 0.5))
+
+
+    def test_other_rigid_bodies(self):
+        collider = bpy.data.objects.new("Collider", bpy.data.meshes.new("Collider"))
+        world = self.scene.rigidbody_world
+
+        def add():
+            world.collection.objects.link(collider)
+            world.collection = world.collection
+
+        self.assertChanges(add)
+        self.assertChanges(lambda: setattr(collider, "location", (0.0, 0.0, -1.0)))
+        self.assertChanges(lambda: setattr(collider.rigid_body, "friction", 0.9))
+
+
+    def test_animation(self):
+        action = bpy.data.actions.new("Animation")
+        self.armature.animation_data_create().action = action
+
+        name = self.armature.data.bones[0].name
+        data_path = self.armature.pose.bones[name].path_from_id("location")
+
+        self.addon.keyframes.write_fcurve(action, data_path, 0, name, [1.0, 10.0], [0.0, 1.0])
+
+        before = self.settings_hash()
+
+        # The animation is hashed over the frame range, not at the current frame
+        self.scene.frame_set(5)
+        self.armature.pose.bones[name].location = (0.5, 0.0, 0.0)
+        self.assertEqual(self.settings_hash(), before)
+
+        self.assertChanges(lambda: action.fcurves[0].keyframe_points[1].co.__setitem__(1, 2.0))
+
+
+    def test_disabled_physics(self):
+        before = self.settings_hash()
+
+        # The hitboxes and constraints of the armature don't exist while playing from the cache
+        self.armature.data.rigid_body_bones.enabled = False
+        benchmark.flush(self.addon)
+
+        self.assertEqual(self.settings_hash(), before)
+
+
+class PlayerTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        self.armature = benchmark.make_rig(bpy.context, "chain", 5)
+        benchmark.configure_rig(self.addon, self.armature, "chain")
+        benchmark.flush(self.addon)
+
+        self.directory = tempfile.TemporaryDirectory()
+        bpy.data.filepath = os.path.join(self.directory.name, "scene.blend")
+
+        bpy.context.view_layer.objects.active = self.armature
+        self.assertEqual(bpy.ops.rigid_body_bones.cache_simulation(frame_start=1, frame_end=10), {'FINISHED'})
+        benchmark.flush(self.addon)
+
+
+    def tearDown(self):
+        bpy.data.filepath = ""
+        bpy.app.background = True
+        self.directory.cleanup()
+
+
+    def test_check_outside_of_playback(self):
+        cache = self.addon.cache
+        scene = bpy.context.scene
+
+        bpy.app.background = False
+
+        key = self.addon.utils.armature_key(self.armature)
+
+        cache.forget(self.armature)
+
+        # The frame change handler doesn't calculate the hash
+        scene.frame_set(2)
+        self.assertNotIn(key, cache.players)
+
+        bpy.app.timers.run_pending(0.0)
+        self.assertIsNotNone(cache.players.get(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
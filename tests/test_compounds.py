@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, os.path.join(repo_path, "benchmarks"))
+
+# This also adds the fakes folder to the path
+import benchmark
+
+import bpy
+
+
+class RemoveCompoundTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        self.armature = benchmark.make_rig(bpy.context, "mixed", 10)
+        benchmark.configure_rig(self.addon, self.armature, "mixed")
+        benchmark.flush(self.addon)
+
+
+    def test_remove_compound(self):
+        armature = self.armature
+        bone = armature.data.bones["Branch 0"]
+        data = bone.rigid_body_bones
+
+        removed = data.compounds[0].hitbox
+        kept = data.compounds[1].hitbox
+
+        bpy.context.view_layer.objects.active = armature
+        bpy.ops.object.mode_set(mode='POSE')
+        armature.data.bones.active = bone
+        data.active_compound_index = 0
+
+        self.assertEqual(bpy.ops.rigid_body_bones.remove_compound(), {'FINISHED'})
+        benchmark.flush(self.addon)
+
+        # Only this bone is updated, so the hitbox must be removed by the operator
+        world = bpy.context.scene.rigidbody_world.collection.objects
+        self.assertNotIn(removed, list(world))
+        self.assertIn(kept, list(world))
+        self.assertNotIn(removed, list(armature.data.rigid_body_bones.compounds.objects))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# Runs with a normal Python, using the in-memory bpy from the fakes folder:
+#
+#     python -m pytest tests
+import os
+import sys
+import unittest
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, os.path.join(repo_path, "benchmarks"))
+
+# This also adds the fakes folder to the path
+import benchmark
+
+import bpy
+
+
+class DirtyArmatureTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        self.armature = benchmark.make_rig(bpy.context, "tree", 20)
+        benchmark.configure_rig(self.addon, self.armature, "mixed")
+        benchmark.flush(self.addon)
+
+
+    def test_rename_while_dirty(self):
+        events = self.addon.events
+        armature = self.armature
+
+        armature.data.bones["Branch 1"].rigid_body_bones.type = 'PASSIVE'
+        self.assertTrue(events.is_dirty(armature))
+
+        armature.name = "Renamed while dirty"
+        benchmark.flush(self.addon)
+
+        self.assertFalse(events.is_dirty(armature))
+        self.assertFalse(events.is_pending(armature))
+
+        # Leaving Edit mode recreates the bones, so they are looked up again
+        data = armature.data.bones["Branch 1"].rigid_body_bones
+        top = armature.data.rigid_body_bones
+
+        self.assertEqual(top.updated_generation, top.generation)
+        self.assertTrue(data.passive)
+        self.assertFalse(data.active)
+
+
+    def test_rename_while_queued(self):
+        armature = self.armature
+        bpy.context.view_layer.objects.active = armature
+
+        data = armature.data.bones["Branch 1"].rigid_body_bones
+        data.collision_margin = 0.2
+
+        armature.name = "Renamed while queued"
+        benchmark.flush(self.addon)
+
+        hitbox = data.active or data.passive
+        self.assertAlmostEqual(hitbox.rigid_body.collision_margin, 0.2, places=5)
+        self.assertEqual(self.addon.events.queued_events, {})
+
+
+    def test_rename_inactive(self):
+        armature = self.armature
+        bpy.context.view_layer.objects.active = None
+
+        armature.data.bones["Branch 1"].name = "Renamed bone"
+
+        # This is called by the message bus, which doesn't run in background mode
+        self.addon.events.rename_switch()
+        benchmark.flush(self.addon)
+
+        bone = armature.data.bones["Renamed bone"]
+        data = bone.rigid_body_bones
+        bones = self.addon.bones
+
+        if data.active:
+            self.assertEqual(data.active.name, bones.active_name(bone))
+
+        else:
+            self.assertEqual(data.passive.name, bones.passive_name(bone))
+
+        top = armature.data.rigid_body_bones
+        self.assertEqual(top.updated_generation, top.generation)
+
+
+    def test_delete_while_dirty(self):
+        events = self.addon.events
+        armature = self.armature
+
+        armature.data.bones["Branch 1"].rigid_body_bones.type = 'PASSIVE'
+        key = self.addon.utils.armature_key(armature)
+
+        bpy.data.objects.remove(armature)
+        benchmark.flush(self.addon)
+
+        self.assertNotIn(key, events.dirty_armatures)
+        self.assertNotIn(key, events.dirty_bones)
+
+
+if __name__ == "__main__":
+    unittest.main()
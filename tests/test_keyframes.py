@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, os.path.join(repo_path, "benchmarks"))
+
+# This also adds the fakes folder to the path
+import benchmark
+
+import bpy
+
+
+class ReduceActionTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+
+        self.action = bpy.data.actions.new("Reduce")
+        self.frames = np.arange(1, 101, dtype=np.float32)
+
+        self.fcurve = self.action.fcurves.new('pose.bones["Bone"].location', index=0, action_group="Bone")
+
+        # Linear from frame 1 to 50, then a curve
+        values = np.where(self.frames <= 50, self.frames * 0.01, 0.5 + np.sin((self.frames - 50) * 0.2))
+
+        self.addon.keyframes.write_fcurve(self.action, self.fcurve.data_path, 0, "Bone", self.frames, values)
+
+
+    def test_keeps_settings(self):
+        fcurve = self.fcurve
+        modifier = fcurve.modifiers.new('NOISE')
+        fcurve.color_mode = 'AUTO_RGB'
+        fcurve.lock = True
+
+        points = fcurve.keyframe_points
+        points[99].handle_left_type = 'VECTOR'
+        points[99].interpolation = 'CONSTANT'
+
+        self.addon.keyframes.reduce_action(self.action, (0.001, 0.001, 0.001))
+
+        # The F-Curve isn't replaced
+        self.assertIs(self.action.fcurves.find(fcurve.data_path, index=0), fcurve)
+        self.assertEqual(list(fcurve.modifiers), [modifier])
+        self.assertEqual(fcurve.color_mode, 'AUTO_RGB')
+        self.assertTrue(fcurve.lock)
+
+        points = fcurve.keyframe_points
+        self.assertLess(len(points), 100)
+
+        # The first and last keyframes are always kept
+        self.assertEqual(points[0].co[0], 1.0)
+        self.assertEqual(points[len(points) - 1].handle_left_type, 'VECTOR')
+        self.assertEqual(points[len(points) - 1].interpolation, 'CONSTANT')
+
+        # The linear part only needs its first and last keyframes
+        self.assertEqual(points[0].interpolation, 'LINEAR')
+        self.assertEqual(points[1].co[0], 50.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, os.path.join(repo_path, "benchmarks"))
+
+# This also adds the fakes folder to the path
+import benchmark
+
+import bpy
+
+
+class SharedMeshTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        self.armature = benchmark.make_rig(bpy.context, "chain", 10)
+
+
+    def test_no_temporary_meshes(self):
+        benchmark.configure_rig(self.addon, self.armature, "chain")
+        self.armature.data.rigid_body_bones.share_meshes = True
+        benchmark.flush(self.addon)
+
+        counters = self.addon.profiler.last(self.armature.name).to_dict()["counters"]
+
+        # Every bone has the same dimensions, so they use one shared mesh
+        self.assertLessEqual(counters.get("meshes_created", 0), 1)
+        self.assertEqual(counters.get("meshes_removed", 0), 0)
+
+        for bone in self.armature.data.bones:
+            data = bone.rigid_body_bones
+            hitbox = data.active or data.passive
+            self.assertTrue(self.addon.utils.is_shared_mesh(hitbox.data))
+
+
+    def test_remove_unused(self):
+        benchmark.configure_rig(self.addon, self.armature, "chain")
+        self.armature.data.rigid_body_bones.share_meshes = True
+
+        # The other tests don't use this mesh
+        self.armature.data.bones[0].rigid_body_bones.scale = (0.123, 0.456, 0.789)
+        benchmark.flush(self.addon)
+
+        name = self.armature.data.bones[0].rigid_body_bones.passive.data.name
+
+        self.armature.data.rigid_body_bones.share_meshes = False
+        benchmark.flush(self.addon)
+
+        self.assertIsNone(bpy.data.meshes.get(name))
+        self.assertNotIn(name, self.addon.utils.shared_meshes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+repo_path = os.path.dirname(dir_path)
+
+sys.path.insert(0, os.path.join(repo_path, "benchmarks"))
+
+# This also adds the fakes folder to the path
+import benchmark
+
+import bpy
+
+
+class PoolTest(unittest.TestCase):
+    def setUp(self):
+        self.addon = benchmark.load_addon()
+        # The other tests don't use these bone names, so the hitbox names are free
+        self.armature = benchmark.make_rig(bpy.context, "fan", 10)
+        benchmark.configure_rig(self.addon, self.armature, "mixed")
+        benchmark.flush(self.addon)
+
+
+    def set_enabled(self, name, enabled):
+        self.armature.data.bones[name].rigid_body_bones.enabled = enabled
+        benchmark.flush(self.addon)
+
+
+    def test_reused_names(self):
+        # Both hitboxes are pooled, and the last one is reused first
+        self.set_enabled("Strand 0 4", False)
+        self.set_enabled("Strand 0 1", False)
+        self.set_enabled("Strand 0 4", True)
+
+        # Leaving Edit mode recreates the bones, so they are looked up again
+        bone = self.armature.data.bones["Strand 0 4"]
+
+        self.assertEqual(bone.rigid_body_bones.active.name, self.addon.bones.active_name(bone))
+
+        for item in self.armature.data.rigid_body_bones.pool.actives:
+            self.assertTrue(item.object.name.startswith(self.addon.pool.POOL_NAME))
+
+
+if __name__ == "__main__":
+    unittest.main()